@@ -0,0 +1,3 @@
+"""
+Benchmarks for the Mastodon filters API client.
+"""
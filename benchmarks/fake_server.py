@@ -0,0 +1,449 @@
+"""
+Local stand-in for the Mastodon `/api/v2/filters` API,
+and the `filters_changed` events of the user stream.
+
+Run standalone:
+
+    $ python -m benchmarks.fake_server --port 8080 --latency 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Mastodon clients send every keyword attribute in the query string,
+# large filters easily exceed the 64 KiB request line http.server allows.
+MAX_REQUEST_LINE = 64 * 1024 * 1024
+
+TRUE_VALUES = ("1", "true", "True", "on")
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class FakeMastodonState:
+    """
+    In-memory filters store shared by all request handlers.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # Notified, with `version` bumped, whenever filters change.
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.filters: dict[str, dict] = {}
+        self.next_filter_id = 1
+        self.next_keyword_id = 1
+        self.requests = 0
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+
+    def _filter_id(self) -> str:
+        filter_id = str(self.next_filter_id)
+        self.next_filter_id += 1
+        return filter_id
+
+    def _bump(self) -> None:
+        self.version += 1
+        self.changed.notify_all()
+
+    def _keyword_id(self) -> str:
+        keyword_id = str(self.next_keyword_id)
+        self.next_keyword_id += 1
+        return keyword_id
+
+    def seed(self, count: int, keywords: int) -> None:
+        """
+        Pre-populate the store with `count` filters of `keywords` keywords each.
+        """
+        for i in range(count):
+            self.create(
+                {
+                    "title": [f"seed-{i}"],
+                    "context[]": ["home"],
+                    "filter_action": ["warn"],
+                },
+                [{"keyword": f"seed-{i}-{j}"} for j in range(keywords)],
+            )
+
+    def create(self, params: dict, keywords: list[dict]) -> dict:
+        """
+        Create a filter.
+        """
+        with self.lock:
+            filter_item = {
+                "id": self._filter_id(),
+                "title": params.get("title", [""])[0],
+                "context": params.get("context[]", []),
+                "expires_at": None,
+                "filter_action": params.get("filter_action", ["warn"])[0],
+                "keywords": [],
+                "statuses": [],
+            }
+            self._apply(filter_item, params, keywords)
+            self.filters[filter_item["id"]] = filter_item
+            self._bump()
+            return filter_item
+
+    def update(self, filter_id: str, params: dict, keywords: list[dict]) -> dict:
+        """
+        Update a filter.
+        """
+        with self.lock:
+            filter_item = self.filters[filter_id]
+            if "title" in params:
+                filter_item["title"] = params["title"][0]
+            if "context[]" in params:
+                filter_item["context"] = params["context[]"]
+            if "filter_action" in params:
+                filter_item["filter_action"] = params["filter_action"][0]
+            self._apply(filter_item, params, keywords)
+            self._bump()
+            return filter_item
+
+    def _apply(self, filter_item: dict, params: dict, keywords: list[dict]) -> None:
+        if "expires_in" in params:
+            expires_in = params["expires_in"][0]
+            filter_item["expires_at"] = (
+                _iso(datetime.now(timezone.utc) + timedelta(seconds=int(expires_in)))
+                if expires_in
+                else None
+            )
+        by_id = {keyword["id"]: keyword for keyword in filter_item["keywords"]}
+        for attributes in keywords:
+            keyword_id = attributes.get("id")
+            if keyword_id:
+                if keyword_id not in by_id:
+                    continue
+                if attributes.get("_destroy", "") in TRUE_VALUES:
+                    del by_id[keyword_id]
+                    continue
+                keyword = by_id[keyword_id]
+                keyword["keyword"] = attributes.get("keyword", keyword["keyword"])
+                if "whole_word" in attributes:
+                    keyword["whole_word"] = attributes["whole_word"] in TRUE_VALUES
+                continue
+            keyword = {
+                "id": self._keyword_id(),
+                "keyword": attributes.get("keyword", ""),
+                "whole_word": attributes.get("whole_word", "True") in TRUE_VALUES,
+            }
+            by_id[keyword["id"]] = keyword
+        filter_item["keywords"] = list(by_id.values())
+
+    def delete(self, filter_id: str) -> None:
+        """
+        Delete a filter.
+        """
+        with self.lock:
+            del self.filters[filter_id]
+            self._bump()
+
+
+class FakeMastodonServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding the fake API state and its settings.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency: float = 0.0,
+        rate_limit: int = 0,
+        rate_window: float = 300.0,
+        state: Optional[FakeMastodonState] = None,
+        heartbeat: float = 15.0,
+        stream_lifetime: float = 0.0,
+    ) -> None:
+        super().__init__(address, FakeMastodonHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.heartbeat = heartbeat
+        self.stream_lifetime = stream_lifetime
+        self.state = state or FakeMastodonState()
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL to configure the client with.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeMastodonHandler(BaseHTTPRequestHandler):
+    """
+    Request handler implementing the subset of the filters API the client uses.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: FakeMastodonServer
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def handle_one_request(self):
+        # Same as BaseHTTPRequestHandler.handle_one_request,
+        # with a larger request line limit.
+        try:
+            self.raw_requestline = self.rfile.readline(MAX_REQUEST_LINE + 1)
+            if len(self.raw_requestline) > MAX_REQUEST_LINE:
+                self.requestline = ""
+                self.request_version = ""
+                self.command = ""
+                self.send_error(414)
+                return
+            if not self.raw_requestline:
+                self.close_connection = True
+                return
+            if not self.parse_request():
+                return
+            method = getattr(self, "do_" + self.command, None)
+            if method is None:
+                self.send_error(501, f"Unsupported method ({self.command!r})")
+                return
+            method()
+            self.wfile.flush()
+        except TimeoutError as error:
+            self.log_error("Request timed out: %r", error)
+            self.close_connection = True
+
+    def _rate_limit_headers(self) -> tuple[dict, bool]:
+        server = self.server
+        state = server.state
+        with state.lock:
+            state.requests += 1
+            now = time.monotonic()
+            if now - state.window_start >= server.rate_window:
+                state.window_start = now
+                state.window_requests = 0
+            state.window_requests += 1
+            used = state.window_requests
+            reset_in = server.rate_window - (now - state.window_start)
+        if not server.rate_limit:
+            return {}, False
+        reset_at = datetime.now(timezone.utc) + timedelta(seconds=reset_in)
+        headers = {
+            "X-RateLimit-Limit": str(server.rate_limit),
+            "X-RateLimit-Remaining": str(max(server.rate_limit - used, 0)),
+            "X-RateLimit-Reset": _iso(reset_at),
+        }
+        return headers, used > server.rate_limit
+
+    def _params(self) -> tuple[dict, list[dict]]:
+        params = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith(
+                "application/x-www-form-urlencoded"
+            ):
+                for key, values in parse_qs(body, keep_blank_values=True).items():
+                    params.setdefault(key, []).extend(values)
+        keywords: dict[int, dict] = {}
+        for key, values in params.items():
+            if not key.startswith("keywords_attributes["):
+                continue
+            index, _, field = key[len("keywords_attributes[") :].partition("][")
+            keywords.setdefault(int(index), {})[field.rstrip("]")] = values[0]
+        return params, [keywords[index] for index in sorted(keywords)]
+
+    def _send(self, status: int, body, headers: Optional[dict] = None) -> None:
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self) -> tuple[Optional[str], Optional[str]]:
+        parts = urlsplit(self.path).path.rstrip("/").split("/")
+        if parts == ["", "api", "v1", "streaming", "user"]:
+            return "stream", None
+        if parts == ["", "api", "v2", "instance"]:
+            return "instance", None
+        if parts[:4] != ["", "api", "v2", "filters"] or len(parts) > 5:
+            return None, None
+        return "filters", (parts[4] if len(parts) == 5 else None)
+
+    def _stream(self) -> None:
+        """
+        Server-sent events until the client disconnects,
+        or for `stream_lifetime` seconds if set.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        state = self.server.state
+        lifetime = self.server.stream_lifetime
+        deadline = time.monotonic() + lifetime if lifetime else None
+        with state.lock:
+            seen = state.version
+        try:
+            self.wfile.flush()
+            while deadline is None or time.monotonic() < deadline:
+                timeout = self.server.heartbeat
+                if deadline is not None:
+                    timeout = min(timeout, max(deadline - time.monotonic(), 0))
+                with state.changed:
+                    state.changed.wait_for(lambda: state.version != seen, timeout)
+                    version = state.version
+                if version == seen:
+                    self.wfile.write(b":thump\n\n")
+                else:
+                    seen = version
+                    self.wfile.write(b"event: filters_changed\ndata: undefined\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _handle(self) -> None:
+        params, keywords = self._params()
+        headers, exceeded = self._rate_limit_headers()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if exceeded:
+            self._send(429, {"error": "Too many requests"}, headers)
+            return
+        if self.headers.get("Authorization", "") in ("", "Bearer "):
+            self._send(401, {"error": "The access token is invalid"}, headers)
+            return
+        resource, filter_id = self._route()
+        if resource is None:
+            self._send(404, {"error": "Record not found"}, headers)
+            return
+        if resource == "stream" and self.command == "GET":
+            self._stream()
+            return
+        if resource == "instance" and self.command == "GET":
+            streaming = self.server.url.replace("http://", "ws://", 1)
+            self._send(200, {"configuration": {"urls": {"streaming": streaming}}})
+            return
+        state = self.server.state
+        if filter_id is not None and filter_id not in state.filters:
+            self._send(404, {"error": "Record not found"}, headers)
+            return
+        if self.command == "GET" and filter_id is None:
+            with state.lock:
+                payload = json.dumps(list(state.filters.values())).encode("utf-8")
+            self._send(200, payload, headers)
+        elif self.command == "GET":
+            with state.lock:
+                payload = json.dumps(state.filters[filter_id]).encode("utf-8")
+            self._send(200, payload, headers)
+        elif self.command == "POST" and filter_id is None:
+            filter_item = state.create(params, keywords)
+            with state.lock:
+                payload = json.dumps(filter_item).encode("utf-8")
+            self._send(200, payload, headers)
+        elif self.command == "PUT" and filter_id is not None:
+            filter_item = state.update(filter_id, params, keywords)
+            with state.lock:
+                payload = json.dumps(filter_item).encode("utf-8")
+            self._send(200, payload, headers)
+        elif self.command == "DELETE" and filter_id is not None:
+            state.delete(filter_id)
+            self._send(200, {}, headers)
+        else:
+            self._send(405, {"error": "Method not allowed"}, headers)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    rate_limit: int = 0,
+    rate_window: float = 300.0,
+    seed_filters: int = 0,
+    seed_keywords: int = 0,
+    heartbeat: float = 15.0,
+    stream_lifetime: float = 0.0,
+    ready=None,
+) -> None:
+    """
+    Run the fake server until interrupted.
+    `ready`, if given, is a connection that receives the server URL once bound.
+    """
+    state = FakeMastodonState()
+    state.seed(seed_filters, seed_keywords)
+    server = FakeMastodonServer(
+        (host, port),
+        latency=latency,
+        rate_limit=rate_limit,
+        rate_window=rate_window,
+        state=state,
+        heartbeat=heartbeat,
+        stream_lifetime=stream_lifetime,
+    )
+    if ready is not None:
+        ready.send(server.url)
+        ready.close()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main() -> None:
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response."
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=0, help="Requests per window, 0 disables."
+    )
+    parser.add_argument(
+        "--rate-window", type=float, default=300.0, help="Rate limit window, seconds."
+    )
+    parser.add_argument("--seed-filters", type=int, default=0)
+    parser.add_argument("--seed-keywords", type=int, default=0)
+    parser.add_argument(
+        "--heartbeat", type=float, default=15.0, help="Stream heartbeat, seconds."
+    )
+    parser.add_argument(
+        "--stream-lifetime",
+        type=float,
+        default=0.0,
+        help="Close streams after this many seconds, 0 keeps them open.",
+    )
+    args = parser.parse_args()
+    print(f"Serving fake Mastodon filters API on http://{args.host}:{args.port}")
+    serve(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        seed_filters=args.seed_filters,
+        seed_keywords=args.seed_keywords,
+        heartbeat=args.heartbeat,
+        stream_lifetime=args.stream_lifetime,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Benchmark the Mastodon filters API client against a local fake server.
+
+    $ python -m benchmarks.run
+    $ python -m benchmarks.run --sizes 100,10000 --repeat 10 --latency 0.02
+    $ python -m benchmarks.run --json > bench.json
+"""
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from benchmarks.fake_server import serve
+from mastodon_filter.api import MastodonFilters
+from mastodon_filter.config import Config
+from mastodon_filter.ratelimit import RateLimiter
+from mastodon_filter.validate import validate_keywords
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+OPERATIONS = ("validate", "create", "filter", "sync", "export")
+
+
+@dataclass
+class Result:
+    """
+    Measurements for one operation at one wordlist size.
+    """
+
+    operation: str
+    size: int
+    runs: int
+    ops_per_second: float
+    keywords_per_second: float
+    p50_ms: float
+    p99_ms: float
+    peak_memory_kb: float
+
+
+def make_wordlist(size: int, prefix: str = "keyword") -> list[str]:
+    """
+    Deterministic wordlist mixing single words, phrases and hashtags.
+    """
+    words = []
+    for i in range(size):
+        if i % 10 == 0:
+            words.append(f"#{prefix}{i}")
+        elif i % 5 == 0:
+            words.append(f"{prefix} phrase {i}")
+        else:
+            words.append(f"{prefix}-{i}")
+    return words
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+@contextmanager
+def fake_server(**options) -> Iterator[str]:
+    """
+    Run the fake server in a separate process, so that it does not
+    count towards the client's memory and CPU time.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=serve, kwargs=dict(options, ready=sender), daemon=True
+    )
+    process.start()
+    sender.close()
+    try:
+        yield receiver.recv()
+    finally:
+        process.terminate()
+        process.join()
+
+
+def measure(
+    operation: str,
+    size: int,
+    runs: int,
+    func: Callable[[int], None],
+) -> Result:
+    """
+    Time `func(run)` over `runs` runs, then trace one extra run for peak memory.
+    Tracing is kept out of the timed runs as it slows allocations down.
+    """
+    timings = []
+    for run in range(runs):
+        gc.collect()
+        started = time.perf_counter()
+        func(run)
+        timings.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(runs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    total = sum(timings)
+    return Result(
+        operation=operation,
+        size=size,
+        runs=runs,
+        ops_per_second=runs / total,
+        keywords_per_second=size * runs / total,
+        p50_ms=statistics.median(timings) * 1000,
+        p99_ms=percentile(timings, 0.99) * 1000,
+        peak_memory_kb=peak / 1024,
+    )
+
+
+def bench_size(
+    url: str, size: int, runs: int, operations: tuple[str, ...], workdir: Path
+) -> Iterator[Result]:
+    """
+    Run every selected operation for one wordlist size.
+    """
+    # Rate limit state goes to the working directory, not the user's one.
+    filters = MastodonFilters(
+        Config(url, "benchmark-token"),
+        rate_limiter=RateLimiter("benchmark", workdir / "ratelimit.json"),
+    )
+    words = make_wordlist(size)
+
+    def create_title(run: int) -> str:
+        return f"bench-{size}-{run}"
+
+    def create(run: int) -> None:
+        filters.create(
+            title=create_title(run),
+            context=["home", "public"],
+            action="warn",
+            keywords=words,
+        )
+
+    # Every other operation works on a filter that already exists.
+    if operations != ("validate",):
+        filters.create(
+            title=f"bench-{size}",
+            context=["home", "public"],
+            action="warn",
+            keywords=words,
+        )
+
+    # Alternate between two wordlists that differ in 1% of their keywords.
+    changed = max(1, size // 100)
+    edited = words[changed:] + make_wordlist(changed, prefix="edited")
+
+    for operation in operations:
+        if operation == "validate":
+            yield measure(operation, size, runs, lambda run: validate_keywords(words))
+        elif operation == "create":
+            yield measure(operation, size, runs, create)
+        elif operation == "filter":
+            yield measure(
+                operation, size, runs, lambda run: filters.filter(f"bench-{size}")
+            )
+        elif operation == "sync":
+            yield measure(
+                operation,
+                size,
+                runs,
+                lambda run: filters.sync(
+                    f"bench-{size}", edited if run % 2 == 0 else words
+                ),
+            )
+        elif operation == "export":
+            yield measure(
+                operation,
+                size,
+                runs,
+                lambda run: filters.export(workdir / f"export-{size}.ndjson"),
+            )
+
+
+def format_table(results: list[Result]) -> str:
+    """
+    Render results as a fixed-width table.
+    """
+    header = (
+        f"{'operation':<10} {'size':>8} {'runs':>5} {'ops/s':>10} "
+        f"{'keywords/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.operation:<10} {result.size:>8} {result.runs:>5} "
+            f"{result.ops_per_second:>10.2f} {result.keywords_per_second:>12.0f} "
+            f"{result.p50_ms:>10.2f} {result.p99_ms:>10.2f} "
+            f"{result.peak_memory_kb:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma separated keyword counts.",
+    )
+    parser.add_argument(
+        "--operations",
+        default=",".join(OPERATIONS),
+        help="Comma separated subset of: " + ", ".join(OPERATIONS),
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per operation.")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Fake server latency, seconds."
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=0, help="Fake server requests per window."
+    )
+    parser.add_argument(
+        "--rate-window", type=float, default=300.0, help="Rate limit window, seconds."
+    )
+    parser.add_argument(
+        "--seed-filters",
+        type=int,
+        default=0,
+        help="Unrelated filters the fake server starts with.",
+    )
+    parser.add_argument(
+        "--seed-keywords", type=int, default=0, help="Keywords per seeded filter."
+    )
+    parser.add_argument("--json", action="store_true", help="Output JSON lines.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    operations = tuple(op.strip() for op in args.operations.split(","))
+    for operation in operations:
+        if operation not in OPERATIONS:
+            parser.error(f"Unknown operation: {operation}")
+
+    # The client logs every response body at debug level.
+    logging.getLogger("mastodon_filter.api").setLevel(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            with fake_server(
+                latency=args.latency,
+                rate_limit=args.rate_limit,
+                rate_window=args.rate_window,
+                seed_filters=args.seed_filters,
+                seed_keywords=args.seed_keywords,
+            ) as url:
+                for result in bench_size(
+                    url, size, args.repeat, operations, Path(workdir)
+                ):
+                    results.append(result)
+                    if args.json:
+                        print(json.dumps(asdict(result)), flush=True)
+                    else:
+                        print(
+                            f"{result.operation} @ {result.size}: "
+                            f"p50 {result.p50_ms:.2f} ms",
+                            file=sys.stderr,
+                        )
+    if not args.json:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,32 @@
 """
 Mastodon filters API client.
 """
-import json
+import math
+import threading
+import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, Union
+from typing import Callable, Iterator, Optional, Union
 
 import requests
 
+from mastodon_filter.backup import read_backup, remaining_seconds, write_backup
 from mastodon_filter.config import Config
 from mastodon_filter.logging import get_logger
-from mastodon_filter.schema import Keyword
+from mastodon_filter.progress import (
+    APPLY,
+    DIFF,
+    FETCH,
+    ROLLBACK,
+    WRITE,
+    CancelToken,
+    OperationCancelled,
+    OperationEvent,
+    Progress,
+)
+from mastodon_filter.ratelimit import RateLimiter
+from mastodon_filter.schema import Keyword, KeywordSet
 from mastodon_filter.validate import (
     validate_action,
     validate_context,
@@ -21,14 +37,179 @@ from mastodon_filter.validate import (
 
 logger = get_logger(__name__)
 
+# Keywords are sent in the query string, keep requests well under
+# the usual 8 KiB request line limit of reverse proxies.
+KEYWORD_BATCH_SIZE = 50
+# Retries of a request answered with 429 Too Many Requests.
+RATE_LIMIT_RETRIES = 2
+# Seconds after a write of this client during which `filters_changed`
+# events may be caused by it, and are checked against the server.
+OWN_WRITE_WINDOW = 3.0
+# Longest wait for writes in flight before checking an event.
+OWN_WRITE_WAIT = 10.0
+
+
+def _keyword_ids(filter_item: dict) -> dict[str, str]:
+    return {keyword["keyword"]: keyword["id"] for keyword in filter_item["keywords"]}
+
+
+def _by_id(filters: list[dict]) -> dict[str, dict]:
+    return {filter_item["id"]: filter_item for filter_item in filters}
+
+
+def _batches(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
 
 class MastodonFilters:
     """
     Mastodon filters API client.
     """
 
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        cache: bool = False,
+        cache_ttl: Optional[float] = None,
+        on_write: Optional[Callable[[str, Optional[dict]], None]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        """
+        With `cache`, `filters()` is fetched once and then kept up to date
+        from the responses of writes, until it is older than `cache_ttl`
+        seconds or `invalidate()` is called.
+        `on_write(filter_id, filter_item)` is called after every write,
+        with None for deleted filters.
+        Requests draw from the account's `rate_limiter`, by default the
+        budget shared by all processes on this machine.
+        Without `cache`, the last filters seen are still kept to tell
+        changes made elsewhere from echoes of this client's writes.
+        """
         self.config = config
+        self.on_write = on_write
+        self.rate_limiter = rate_limiter or RateLimiter.for_config(config)
+        self.session = requests.Session()
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._cached_filters: Optional[list[dict]] = None
+        self._cached_at = 0.0
+        self._cache_lock = threading.Lock()
+        self._writes_done = threading.Condition(self._cache_lock)
+        # Filter id, "filters" for new ones -> monotonic time of the last
+        # write to it, infinite while in flight.
+        self._own_writes: dict[str, float] = {}
+        self._write_count = 0
+
+    def invalidate(self) -> None:
+        """
+        Drop cached filters.
+        """
+        with self._cache_lock:
+            self._cached_filters = None
+
+    def own_change(self) -> bool:
+        """
+        Whether a `filters_changed` event received now is likely caused
+        by a recent write of this client, already reflected in its cache.
+        """
+        now = time.monotonic()
+        with self._cache_lock:
+            self._own_writes = {
+                filter_id: written
+                for filter_id, written in self._own_writes.items()
+                if now - written <= OWN_WRITE_WINDOW
+            }
+            recent = list(self._own_writes)
+        if recent:
+            logger.debug("Filters changed by writes to: %s", ", ".join(recent))
+        return bool(recent)
+
+    def external_change(self) -> bool:
+        """
+        Whether a `filters_changed` event received now shows changes made
+        elsewhere, dropping the cache if so. Events do not say what
+        changed, so one close to a write of this client is checked: once
+        writes in flight are done, filters are fetched again and compared
+        with the cached ones.
+        """
+        if not self.own_change():
+            self.invalidate()
+            return True
+        with self._writes_done:
+            self._writes_done.wait_for(
+                lambda: math.inf not in self._own_writes.values(), OWN_WRITE_WAIT
+            )
+            write_count = self._write_count
+            in_flight = math.inf in self._own_writes.values()
+        if in_flight:
+            self.invalidate()
+            return True
+        try:
+            fresh = self._call_api("get", "/api/v2/filters")
+        except (requests.RequestException, ValueError) as error:
+            logger.warning("Could not check filters changes: %s", error)
+            self.invalidate()
+            return True
+        with self._cache_lock:
+            # The cache misses writes done meanwhile, which `fresh` may have.
+            if self._cached_filters is None or self._write_count != write_count:
+                changed = True
+            else:
+                changed = _by_id(fresh) != _by_id(self._cached_filters)
+            self._cached_filters = None if changed else fresh
+            self._cached_at = time.monotonic()
+        logger.debug("Filters changed elsewhere: %s", changed)
+        return changed
+
+    def filters_changed(self) -> None:
+        """
+        Handle a `filters_changed` event: drop the cache if filters were
+        changed elsewhere.
+        """
+        self.external_change()
+
+    def _cache_valid(self) -> bool:
+        if self._cached_filters is None:
+            return False
+        if self.cache_ttl is None:
+            return True
+        return time.monotonic() - self._cached_at < self.cache_ttl
+
+    def _written(self, filter_id: str, filter_item: Optional[dict]) -> None:
+        if self.on_write is None:
+            return
+        try:
+            self.on_write(filter_id, filter_item)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.error("Write hook failed: %s", error)
+
+    def _remember(self, filter_item: dict) -> None:
+        """
+        Add or replace a filter in the cache.
+        """
+        self._written(filter_item["id"], filter_item)
+        with self._cache_lock:
+            if self._cached_filters is None:
+                return
+            self._cached_filters = [
+                cached
+                for cached in self._cached_filters
+                if cached["id"] != filter_item["id"]
+            ]
+            self._cached_filters.append(filter_item)
+
+    def _forget(self, filter_id: str) -> None:
+        """
+        Remove a filter from the cache.
+        """
+        self._written(filter_id, None)
+        with self._cache_lock:
+            if self._cached_filters is None:
+                return
+            self._cached_filters = [
+                cached for cached in self._cached_filters if cached["id"] != filter_id
+            ]
 
     def _build_keyword_params(self, keywords: list[Keyword]) -> dict:
         """
@@ -50,27 +231,64 @@ class MastodonFilters:
         path: str,
         data: Optional[dict] = None,
         params: Optional[OrderedDict] = None,
+        progress: Optional[Progress] = None,
+        cancellable: bool = True,
     ) -> dict:
         """
         Call API method.
+        Unless `cancellable`, waiting for rate limit budget is not
+        interrupted by cancellation, as needed to roll back.
         """
         if not self.config.api_base_url or not self.config.access_token:
             logger.error("API base URL or access token not set.")
             raise ValueError("API base URL or access token not set.")
 
         logger.debug("Calling API method: %s %s with params: %s", method, path, params)
-        response = requests.request(
-            method=method,
-            url=f"{self.config.api_base_url}{path}",
-            headers={
-                "Authorization": f"Bearer {self.config.access_token}",
-                "Content-Type": "application/json",
-            },
-            data=data,
-            params=params,
-            timeout=10,
-        )
+        if method == "get":
+            return self._request(method, path, data, params, progress, cancellable)
+        # The server may push the change before responding, a write counts
+        # as recent from when it is sent until the window after it ends.
+        written = path.rstrip("/").rsplit("/", 1)[-1]
+        with self._cache_lock:
+            self._own_writes[written] = math.inf
+        try:
+            return self._request(method, path, data, params, progress, cancellable)
+        finally:
+            with self._writes_done:
+                self._own_writes[written] = time.monotonic()
+                self._write_count += 1
+                self._writes_done.notify_all()
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        data: Optional[dict],
+        params: Optional[OrderedDict],
+        progress: Optional[Progress],
+        cancellable: bool,
+    ) -> dict:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            check = progress.check if progress and cancellable else None
+            self.rate_limiter.acquire(check=check)
+            response = self.session.request(
+                method=method,
+                url=f"{self.config.api_base_url}{path}",
+                headers={
+                    "Authorization": f"Bearer {self.config.access_token}",
+                    "Content-Type": "application/json",
+                },
+                data=data,
+                params=params,
+                timeout=10,
+            )
+            self.rate_limiter.update(response.headers, response.status_code)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                break
+            logger.warning("Rate limited, retrying: %s %s", method, path)
         logger.debug("Server response: %s", response.text)
+        if progress is not None:
+            progress.add_bytes(len(response.request.url) + len(response.content))
         response.raise_for_status()
         return response.json()
 
@@ -78,7 +296,14 @@ class MastodonFilters:
         """
         Get filters.
         """
-        return self._call_api("get", "/api/v2/filters")
+        with self._cache_lock:
+            if self.cache and self._cache_valid():
+                return list(self._cached_filters)
+        filters = self._call_api("get", "/api/v2/filters")
+        with self._cache_lock:
+            self._cached_filters = filters
+            self._cached_at = time.monotonic()
+        return list(filters)
 
     def filter(self, title: str) -> dict:
         """
@@ -97,11 +322,15 @@ class MastodonFilters:
         title: str,
         context: str,
         action: str,
-        keywords: Union[str, list[str]],
+        keywords: Union[str, list[Union[str, Keyword]], KeywordSet],
         expires_in: int = None,
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
     ) -> dict:
         """
         Create filter.
+        Keywords beyond the first batch are added with follow-up updates.
+        If cancelled or failing between them, the filter is deleted again.
         """
         title = validate_title(title)
         context = validate_context(context)
@@ -116,51 +345,274 @@ class MastodonFilters:
                 "filter_action": action,
             }
         )
-        params.update(self._build_keyword_params(keywords))
-        return self._call_api("post", "/api/v2/filters", params=params)
+        progress = Progress("create", on_event, cancel, title=title)
+        progress.phase(APPLY, total=len(keywords))
+        progress.check()
+        first = keywords[:KEYWORD_BATCH_SIZE].to_keywords()
+        params.update(self._build_keyword_params(first))
+        response = self._call_api(
+            "post", "/api/v2/filters", params=params, progress=progress
+        )
+        progress.advance(len(first))
+        if len(keywords) > KEYWORD_BATCH_SIZE:
+            try:
+                response = self._apply_keywords(
+                    response["id"],
+                    OrderedDict(),
+                    keywords[KEYWORD_BATCH_SIZE:].to_keywords(),
+                    progress,
+                    rollback=False,
+                )
+            except Exception:
+                progress.phase(ROLLBACK, total=1)
+                try:
+                    self._call_api("delete", f"/api/v2/filters/{response['id']}")
+                except requests.RequestException as error:
+                    logger.error("Could not delete partly created filter: %s", error)
+                progress.advance()
+                raise
+        self._remember(response)
+        progress.finish()
+        return response
 
-    def sync(self, title: str, keywords: Union[str, list[str]]) -> dict:
+    def sync(
+        self,
+        title: str,
+        keywords: Union[str, list[str], KeywordSet],
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> dict:
         """
         Sync filter.
         """
         title = validate_title(title)
         keywords = validate_keywords(keywords)
+        progress = Progress("sync", on_event, cancel, title=title)
+        progress.phase(FETCH)
         filter_item = self.filter(title)
-        remote_keywords = filter_item["keywords"]
-        remote_keywords = [Keyword(**keyword) for keyword in remote_keywords]
+        progress.phase(DIFF)
+        remote_keywords = KeywordSet(filter_item["keywords"])
+        add_keywords = (keywords - remote_keywords).to_keywords()
+        delete_keywords = (remote_keywords - keywords).to_keywords(
+            delete=True, ids=_keyword_ids(filter_item)
+        )
 
-        add_keywords = []
-        delete_keywords = []
-        for keyword in keywords:
-            if keyword in remote_keywords:
-                continue
-            add_keywords.append(keyword)
-        for keyword in remote_keywords:
-            if keyword in keywords:
-                continue
-            keyword_to_delete = Keyword(
-                keyword=keyword.keyword, id=keyword.id, delete=True
+        logger.debug("Add keywords: %s", add_keywords)
+        logger.debug("Delete keywords: %s", delete_keywords)
+
+        if add_keywords or delete_keywords:
+            changes = add_keywords + delete_keywords
+            progress.phase(APPLY, total=len(changes))
+            filter_item = self._apply_keywords(
+                filter_item["id"], OrderedDict(), changes, progress
             )
-            delete_keywords.append(keyword_to_delete)
+            self._remember(filter_item)
+        progress.finish()
+        # Copy, the filter may be shared with the cache.
+        response = dict(filter_item)
+        response["added"] = add_keywords
+        response["deleted"] = delete_keywords
+        return response
+
+    def merge(
+        self,
+        title: str,
+        keywords: Union[str, list[str], KeywordSet],
+        base: Optional[dict[str, bool]] = None,
+        base_filter_id: Optional[str] = None,
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> dict:
+        """
+        Three-way sync of filter.
+
+        `base` maps the keywords last synced from the wordlist to their
+        whole_word flag. Keywords added or removed locally since then are
+        sent, keywords added or removed remotely are left as they are.
+        The same goes for whole_word flags, changed locally they are
+        updated, changed remotely they are kept. Keywords removed locally
+        but changed remotely, and keywords added on both sides with
+        different flags, are reported as conflicts and left as they are
+        remotely. Without a base, or if the filter was replaced since
+        (`base_filter_id` differs), nothing remote is deleted.
+        """
+        title = validate_title(title)
+        keywords = validate_keywords(keywords)
+        progress = Progress("merge", on_event, cancel, title=title)
+        progress.phase(FETCH)
+        filter_item = self.filter(title)
+        progress.phase(DIFF)
+        if base_filter_id is not None and base_filter_id != filter_item["id"]:
+            base = None
+        remote = KeywordSet(filter_item["keywords"])
+        base = KeywordSet(base.items()) if base else KeywordSet()
+        ids = _keyword_ids(filter_item)
+
+        add_keywords = (keywords - base - remote).to_keywords()
+        removed = (base - keywords) & remote
+        conflicts = [
+            {"keyword": text, "reason": "removed locally, changed remotely"}
+            for text, whole_word in removed.items()
+            if remote.whole_word(text) != whole_word
+        ]
+        removed -= KeywordSet(conflict["keyword"] for conflict in conflicts)
+        delete_keywords = (remote & removed).to_keywords(delete=True, ids=ids)
+        # Flags of keywords on both sides, changed locally only, or
+        # differing without a common base.
+        changed = []
+        for text, whole_word in (keywords & remote).items():
+            if remote.whole_word(text) == whole_word:
+                continue
+            if text not in base:
+                conflicts.append(
+                    {
+                        "keyword": text,
+                        "reason": "whole_word differs, added on both sides",
+                    }
+                )
+            elif base.whole_word(text) != whole_word:
+                changed.append((text, whole_word))
+        update_keywords = KeywordSet(changed).to_keywords(ids=ids)
+        # Remote keywords the wordlist never had, added elsewhere.
+        kept = list(remote - base - keywords)
 
         logger.debug("Add keywords: %s", add_keywords)
+        logger.debug("Update keywords: %s", update_keywords)
         logger.debug("Delete keywords: %s", delete_keywords)
+        logger.debug("Conflicts: %s", conflicts)
 
-        params = OrderedDict(
-            {
-                "title": title,
-                "context[]": filter_item["context"],
-                "filter_action": filter_item["filter_action"],
-            }
-        )
-        params.update(self._build_keyword_params(add_keywords + delete_keywords))
-        response = self._call_api(
-            "put", f"/api/v2/filters/{filter_item['id']}", params=params
-        )
+        changes = add_keywords + update_keywords + delete_keywords
+        if changes:
+            progress.phase(APPLY, total=len(changes))
+            filter_item = self._apply_keywords(
+                filter_item["id"], OrderedDict(), changes, progress
+            )
+            self._remember(filter_item)
+        progress.finish()
+        response = dict(filter_item)
         response["added"] = add_keywords
+        response["updated"] = update_keywords
         response["deleted"] = delete_keywords
+        response["kept"] = kept
+        response["conflicts"] = conflicts
+        return response
+
+    def update(
+        self,
+        filter_id: str,
+        title: Optional[str] = None,
+        context: Optional[Union[str, list[str]]] = None,
+        action: Optional[str] = None,
+        expires_in: Optional[int] = None,
+        keywords: Optional[list[Keyword]] = None,
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> dict:
+        """
+        Update filter by id, sending only the given attributes.
+        Keywords with an id are updated, or deleted if flagged,
+        keywords without an id are added. Keywords are sent in batches,
+        if cancelled or failing between them the keywords already sent are
+        reverted.
+        """
+        if not filter_id:
+            raise ValueError("Filter id must not be empty.")
+        params = OrderedDict()
+        if title is not None:
+            params["title"] = validate_title(title)
+        if context is not None:
+            params["context[]"] = validate_context(context)
+        if action is not None:
+            params["filter_action"] = validate_action(action)
+        if expires_in is not None:
+            params["expires_in"] = validate_expires_in(expires_in)
+        keywords = keywords or []
+        progress = Progress("update", on_event, cancel)
+        progress.phase(APPLY, total=len(keywords))
+        response = self._apply_keywords(filter_id, params, keywords, progress)
+        self._remember(response)
+        progress.finish()
         return response
 
+    def _apply_keywords(
+        self,
+        filter_id: str,
+        params: OrderedDict,
+        keywords: list[Keyword],
+        progress: Progress,
+        rollback: bool = True,
+    ) -> dict:
+        """
+        Send keyword changes in batches, `params` along with the first one.
+        Cancellation is checked before every batch. With `rollback`,
+        keyword changes already sent are reverted before re-raising a
+        cancellation or a failed request.
+        """
+        response = None
+        applied: list[Keyword] = []
+        for batch in _batches(keywords, KEYWORD_BATCH_SIZE) if keywords else [[]]:
+            batch_params = params if response is None else OrderedDict()
+            batch_params.update(self._build_keyword_params(batch))
+            try:
+                progress.check()
+                # Also raises if cancelled while waiting for rate limit budget.
+                response = self._call_api(
+                    "put",
+                    f"/api/v2/filters/{filter_id}",
+                    params=batch_params,
+                    progress=progress,
+                )
+            except Exception:
+                if rollback and response is not None:
+                    try:
+                        self._revert_keywords(filter_id, applied, response, progress)
+                    except requests.RequestException as error:
+                        logger.error("Could not revert keywords: %s", error)
+                raise
+            applied.extend(batch)
+            progress.advance(len(batch))
+        return response
+
+    def _revert_keywords(
+        self,
+        filter_id: str,
+        applied: list[Keyword],
+        response: dict,
+        progress: Progress,
+    ) -> None:
+        """
+        Delete keywords that were added, add back keywords that were
+        deleted and flip back whole_word flags that were updated. Other
+        attributes are left as sent.
+        """
+        added = {keyword.keyword for keyword in applied if not keyword.id}
+        undo = [
+            Keyword(keyword["keyword"], id=keyword["id"], delete=True)
+            for keyword in response["keywords"]
+            if keyword["keyword"] in added
+        ]
+        undo += [
+            Keyword(keyword.keyword, whole_word=keyword.whole_word)
+            for keyword in applied
+            if keyword.delete
+        ]
+        undo += [
+            Keyword(keyword.keyword, whole_word=not keyword.whole_word, id=keyword.id)
+            for keyword in applied
+            if keyword.id and not keyword.delete
+        ]
+        progress.phase(ROLLBACK, total=len(undo))
+        for batch in _batches(undo, KEYWORD_BATCH_SIZE):
+            response = self._call_api(
+                "put",
+                f"/api/v2/filters/{filter_id}",
+                params=self._build_keyword_params(batch),
+                progress=progress,
+                cancellable=False,
+            )
+            progress.advance(len(batch))
+        self._remember(response)
+
     def delete(self, title: str) -> dict:
         """
         Delete filter.
@@ -168,14 +620,86 @@ class MastodonFilters:
         if not title:
             raise ValueError("Title must not be empty.")
         filter_item = self.filter(title)
-        return self._call_api("delete", f"/api/v2/filters/{filter_item['id']}")
+        return self.delete_by_id(filter_item["id"])
 
-    def export(self, path: Path) -> dict:
+    def delete_by_id(self, filter_id: str) -> dict:
         """
-        Export filters.
+        Delete filter by id, without looking it up first.
+        """
+        if not filter_id:
+            raise ValueError("Filter id must not be empty.")
+        response = self._call_api("delete", f"/api/v2/filters/{filter_id}")
+        self._forget(filter_id)
+        return response
+
+    def export(
+        self,
+        path: Path,
+        incremental: bool = False,
+        compress: bool = False,
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> dict:
+        """
+        Export filters as newline-delimited JSON.
+        Filters are fetched in one listing, then written one per line.
+        Incremental exports append only filters changed since the last export.
+        A cancelled export leaves the file as it was.
         """
         if not path:
             raise ValueError("Path must not be empty.")
+        progress = Progress("export", on_event, cancel)
+        progress.phase(FETCH)
         filters = self.filters()
-        path.write_text(json.dumps(filters), encoding="utf-8")
-        return filters
+        progress.phase(WRITE, total=len(filters))
+        summary = write_backup(
+            filters,
+            path,
+            incremental=incremental,
+            compress=compress,
+            progress=progress,
+        )
+        progress.finish()
+        return summary
+
+    def restore(self, filter_item: dict) -> dict:
+        """
+        Recreate one exported filter.
+        """
+        expires_in = remaining_seconds(filter_item.get("expires_at"))
+        if expires_in is not None and expires_in <= 0:
+            raise ValueError(f"Filter has expired: {filter_item['title']}")
+        return self.create(
+            title=filter_item["title"],
+            context=filter_item["context"],
+            action=filter_item["filter_action"],
+            keywords=KeywordSet(filter_item["keywords"]),
+            expires_in=expires_in,
+        )
+
+    def import_filters(
+        self, path: Path, compress: bool = False, max_workers: int = 4
+    ) -> Iterator[dict]:
+        """
+        Recreate filters from an export, several at a time.
+        Filters whose title already exists are skipped.
+        Yields one result per filter as it finishes.
+        """
+        if not path:
+            raise ValueError("Path must not be empty.")
+        existing = {filter_item["title"] for filter_item in self.filters()}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for filter_item in read_backup(path, compress).values():
+                if filter_item["title"] in existing:
+                    yield {"title": filter_item["title"], "status": "skipped"}
+                    continue
+                futures[executor.submit(self.restore, filter_item)] = filter_item
+            for future in as_completed(futures):
+                title = futures[future]["title"]
+                try:
+                    future.result()
+                except Exception as error:  # pylint: disable=broad-except
+                    yield {"title": title, "status": "failed", "error": error}
+                    continue
+                yield {"title": title, "status": "created"}
@@ -0,0 +1,139 @@
+"""
+Filter backups as newline-delimited JSON.
+
+Each line holds one filter as returned by the API. Incremental exports
+append only filters that changed since the previous export, and a
+`{"id": ..., "deleted": true}` line for each filter that was removed,
+so the last line for an id holds its current state.
+"""
+import gzip
+import hashlib
+import json
+import lzma
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+
+from mastodon_filter.progress import Progress
+
+COMPRESSORS = {".gz": gzip.open, ".xz": lzma.open}
+
+
+def open_backup(path: Path, mode: str, compress: bool = False) -> IO[str]:
+    """
+    Open a backup file in text mode, compressed according to its suffix.
+    `compress` forces gzip for paths without a known suffix.
+    """
+    opener = COMPRESSORS.get(path.suffix)
+    if opener is None and compress:
+        opener = gzip.open
+    if opener is None:
+        return path.open(mode, encoding="utf-8")
+    return opener(path, mode + "t", encoding="utf-8")
+
+
+def filter_digest(filter_item: dict) -> str:
+    """
+    Content hash of a filter, independent of key order.
+    """
+    canonical = json.dumps(filter_item, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def iter_records(path: Path, compress: bool = False) -> Iterator[dict]:
+    """
+    Stream the records of a backup, including deletion markers.
+    """
+    with open_backup(path, "r", compress) as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_backup(path: Path, compress: bool = False) -> dict[str, dict]:
+    """
+    Current state of every filter in a backup, by id.
+    """
+    filters: dict[str, dict] = {}
+    for record in iter_records(path, compress):
+        if record.get("deleted"):
+            filters.pop(record["id"], None)
+        else:
+            filters[record["id"]] = record
+    return filters
+
+
+def write_backup(
+    filters: Iterable[dict],
+    path: Path,
+    incremental: bool = False,
+    compress: bool = False,
+    progress: Optional[Progress] = None,
+) -> dict:
+    """
+    Write filters to a backup.
+
+    A full export replaces the file atomically. An incremental export
+    appends only what changed since the state recorded in the file, in
+    one write once all changes are known. Either way, cancelling through
+    `progress` leaves the file untouched.
+    Returns counts of filters seen, written and removed.
+    """
+    progress = progress or Progress("export")
+    previous: Optional[dict[str, str]] = None
+    if incremental and path.exists():
+        previous = {
+            filter_id: filter_digest(filter_item)
+            for filter_id, filter_item in read_backup(path, compress).items()
+        }
+
+    summary = {"filters": 0, "written": 0, "removed": 0}
+    if previous is not None:
+        lines = []
+        seen = set()
+        for filter_item in filters:
+            progress.check()
+            summary["filters"] += 1
+            seen.add(filter_item["id"])
+            if previous.get(filter_item["id"]) != filter_digest(filter_item):
+                lines.append(json.dumps(filter_item, separators=(",", ":")) + "\n")
+                summary["written"] += 1
+            progress.advance()
+        for filter_id in previous.keys() - seen:
+            lines.append(json.dumps({"id": filter_id, "deleted": True}) + "\n")
+            summary["removed"] += 1
+        progress.check()
+        with open_backup(path, "a", compress) as file:
+            file.writelines(lines)
+        progress.add_bytes(sum(len(line) for line in lines))
+        return summary
+
+    # Same suffix as the real path, so compression is chosen the same way.
+    target = path.with_name(".tmp-" + path.name)
+    try:
+        with open_backup(target, "w", compress) as file:
+            for filter_item in filters:
+                progress.check()
+                line = json.dumps(filter_item, separators=(",", ":")) + "\n"
+                file.write(line)
+                summary["filters"] += 1
+                summary["written"] += 1
+                progress.add_bytes(len(line))
+                progress.advance()
+        os.replace(target, path)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return summary
+
+
+def remaining_seconds(expires_at: Optional[str]) -> Optional[int]:
+    """
+    Seconds until an API `expires_at` timestamp, None if it never expires.
+    """
+    if not expires_at:
+        return None
+    expires = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+    return int((expires - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,184 @@
+"""
+Run many filter operations from one stream of JSON lines.
+
+Each line is one operation:
+
+    {"op": "create", "title": "News", "path": "news.txt", "action": "hide"}
+    {"op": "sync", "title": "News", "keywords": ["election", "poll"]}
+    {"op": "show", "title": "News"}
+    {"op": "delete", "title": "Old"}
+
+Operations on the same title run in input order, operations on
+different titles run in parallel. Consecutive syncs of a title are
+merged into the last one, as only its keywords end up on the server,
+and a sync right after a create is folded into the create.
+"""
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Union
+
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.validate import validate_context_string
+from mastodon_filter.wordlist import read_wordlist
+
+OPERATIONS = ("create", "sync", "delete", "show")
+
+
+def parse_operations(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Parse JSON lines into operations, numbered by input line.
+    Lines that are not valid operations carry an `error`.
+    """
+    for index, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError("Operation must be a JSON object.")
+            if operation.get("op") not in OPERATIONS:
+                raise ValueError(
+                    f"Invalid op: {operation.get('op')}, "
+                    f"must be one of: {', '.join(OPERATIONS)}"
+                )
+            if not operation.get("title"):
+                raise ValueError("Title must not be empty.")
+        except ValueError as error:
+            yield {"index": index, "error": str(error)}
+            continue
+        operation["index"] = index
+        yield operation
+
+
+def operation_keywords(operation: dict) -> Union[list[str], KeywordSet]:
+    """
+    Keywords of a create or sync operation, inline or from a wordlist path.
+    """
+    if "keywords" in operation:
+        keywords = operation["keywords"]
+        return keywords.splitlines() if isinstance(keywords, str) else keywords
+    if "path" in operation:
+        return read_wordlist(Path(operation["path"]))
+    raise ValueError("Operation needs either keywords or a path.")
+
+
+def plan(operations: list[dict]) -> dict[str, list[dict]]:
+    """
+    Group operations by title.
+    A sync following another sync replaces it, a sync following a create
+    becomes the created keywords. Operations merged away are listed in the
+    surviving operation's `merged`.
+    """
+    chains: dict[str, list[dict]] = {}
+    for operation in operations:
+        chain = chains.setdefault(operation["title"], [])
+        previous = chain[-1] if chain else None
+        if previous and operation["op"] == "sync":
+            if previous["op"] == "sync":
+                chain.pop()
+                operation["merged"] = previous.pop("merged", []) + [previous]
+            elif previous["op"] == "create":
+                previous.pop("keywords", None)
+                previous.pop("path", None)
+                for source in ("keywords", "path"):
+                    if source in operation:
+                        previous[source] = operation[source]
+                previous.setdefault("merged", []).append(operation)
+                continue
+        chain.append(operation)
+    return chains
+
+
+def run_operation(client, operation: dict) -> dict:
+    """
+    Run one operation, returning its result line.
+    """
+    result = {"index": operation["index"], "op": operation["op"]}
+    result["title"] = title = operation["title"]
+    if operation["op"] == "create":
+        keywords = operation_keywords(operation)
+        for filter_item in client.filters():
+            if filter_item["title"] == title:
+                raise ValueError(f"Filter already exists: {title}")
+        context = operation.get("context", "home,public,thread")
+        if isinstance(context, str):
+            context = validate_context_string(context)
+        response = client.create(
+            title=title,
+            context=context,
+            action=operation.get("action", "warn"),
+            keywords=keywords,
+            expires_in=operation.get("expires_in"),
+        )
+        result["id"] = response["id"]
+        result["keywords"] = len(response["keywords"])
+    elif operation["op"] == "sync":
+        response = client.sync(title, operation_keywords(operation))
+        result["added"] = [keyword.keyword for keyword in response["added"]]
+        result["deleted"] = [keyword.keyword for keyword in response["deleted"]]
+    elif operation["op"] == "delete":
+        client.delete(title)
+    elif operation["op"] == "show":
+        filter_item = client.filter(title)
+        result["keywords"] = [keyword["keyword"] for keyword in filter_item["keywords"]]
+    result["ok"] = True
+    return result
+
+
+def run_chain(client, chain: list[dict], emit: Callable[[dict], None]) -> None:
+    """
+    Run the operations of one title in order, emitting each result.
+    """
+    for operation in chain:
+        try:
+            result = run_operation(client, operation)
+        except Exception as error:  # pylint: disable=broad-except
+            result = {
+                "index": operation["index"],
+                "op": operation["op"],
+                "title": operation["title"],
+                "ok": False,
+                "error": str(error),
+            }
+        for merged in operation.get("merged", []):
+            emit(
+                {
+                    "index": merged["index"],
+                    "op": merged["op"],
+                    "title": merged["title"],
+                    "ok": result["ok"],
+                    "merged_into": operation["index"],
+                }
+            )
+        emit(result)
+
+
+def run_batch(
+    client, operations: Iterable[dict], max_workers: int = 4
+) -> Iterator[dict]:
+    """
+    Run operations, yielding one result line per operation as it finishes.
+    Filters are fetched once, the client should be created with `cache=True`.
+    """
+    valid = []
+    for operation in operations:
+        if "error" in operation:
+            yield {
+                "index": operation["index"],
+                "ok": False,
+                "error": operation["error"],
+            }
+            continue
+        valid.append(operation)
+    if not valid:
+        return
+    client.filters()
+    results: queue.Queue = queue.Queue()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chain in plan(valid).values():
+            executor.submit(run_chain, client, chain, results.put)
+        for _ in range(len(valid)):
+            yield results.get()
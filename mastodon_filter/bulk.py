@@ -0,0 +1,98 @@
+"""
+Apply one operation to many filters at once.
+
+Filters are selected by title, with a glob pattern or a regular
+expression, from a single fetch of all filters. The operation then runs
+for each of them in parallel, with at most `max_workers` requests in
+flight.
+"""
+import fnmatch
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+MAX_WORKERS = 4
+
+
+def match_filters(
+    filters: Iterable[dict], pattern: str, regex: bool = False
+) -> list[dict]:
+    """
+    Filters whose title matches a glob pattern, or a regular expression
+    searched anywhere in the title.
+    """
+    if not pattern:
+        raise ValueError("Pattern must not be empty.")
+    if regex:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as error:
+            raise ValueError(f"Invalid regular expression: {pattern}: {error}")
+        return [item for item in filters if compiled.search(item["title"])]
+    return [item for item in filters if fnmatch.fnmatchcase(item["title"], pattern)]
+
+
+def run_concurrently(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = MAX_WORKERS,
+) -> Iterator[tuple[Any, Optional[Any], Optional[Exception]]]:
+    """
+    Call `func` for every item, several at a time.
+    Yields `(item, result, error)` as each call finishes, one failing
+    call does not stop the others.
+    """
+    if max_workers < 1:
+        raise ValueError("Jobs must be at least 1.")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                yield futures[future], None, error
+                continue
+            yield futures[future], result, None
+
+
+def delete_filters(
+    client, filters: Iterable[dict], max_workers: int = MAX_WORKERS
+) -> Iterator[dict]:
+    """
+    Delete filters by id. Yields one result per filter as it finishes.
+    """
+
+    def delete(filter_item: dict) -> dict:
+        return client.delete_by_id(filter_item["id"])
+
+    for filter_item, _, error in run_concurrently(delete, filters, max_workers):
+        if error is not None:
+            yield {"title": filter_item["title"], "status": "failed", "error": error}
+            continue
+        yield {"title": filter_item["title"], "status": "deleted"}
+
+
+def update_filters(
+    client,
+    filters: Iterable[dict],
+    max_workers: int = MAX_WORKERS,
+    **attributes,
+) -> Iterator[dict]:
+    """
+    Set context, action or expires_in of filters, leaving their keywords
+    as they are. Yields one result per filter as it finishes.
+    """
+    attributes = {
+        name: value for name, value in attributes.items() if value is not None
+    }
+    if not attributes:
+        raise ValueError("Nothing to update.")
+
+    def update(filter_item: dict) -> dict:
+        return client.update(filter_item["id"], **attributes)
+
+    for filter_item, response, error in run_concurrently(update, filters, max_workers):
+        if error is not None:
+            yield {"title": filter_item["title"], "status": "failed", "error": error}
+            continue
+        yield {"title": filter_item["title"], "status": "updated", "filter": response}
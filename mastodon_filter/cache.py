@@ -0,0 +1,36 @@
+"""
+Local cache of filters fetched from the server.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from mastodon_filter.config import APP_DIR
+
+FILTERS_CACHE = APP_DIR / "filters.json"
+
+
+def read_filters_cache(path: Path = FILTERS_CACHE) -> Optional[list[dict]]:
+    """
+    Read cached filters, None if there is no usable cache.
+    """
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            filters = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(filters, list):
+        return None
+    return filters
+
+
+def write_filters_cache(filters: list[dict], path: Path = FILTERS_CACHE) -> None:
+    """
+    Write filters to cache.
+    Writes to a temporary file first, so readers never see a partial cache.
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(filters, file)
+    os.replace(temp_path, path)
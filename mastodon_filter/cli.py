@@ -1,16 +1,61 @@
 """
 Command-line interface.
 """
+import json
+import signal
+import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, Optional
 
 import click
 from click_default_group import DefaultGroup
 
-from mastodon_filter.api import MastodonFilters
+from mastodon_filter.backup import remaining_seconds
+from mastodon_filter.batch import parse_operations, run_batch
+from mastodon_filter.bulk import (
+    MAX_WORKERS,
+    delete_filters,
+    match_filters,
+    update_filters,
+)
+from mastodon_filter.cache import read_filters_cache, write_filters_cache
 from mastodon_filter.config import Config, ensure_config_exists, get_config, save_config
+from mastodon_filter.daemon import (
+    DaemonClient,
+    record_direct_write,
+    run_daemon,
+    stop_daemon,
+)
 from mastodon_filter.errors import extract_error_message
-from mastodon_filter.templates import list_templates, load_template
+from mastodon_filter.expiry import (
+    by_time_left,
+    expiring_within,
+    format_duration,
+    parse_duration,
+    renew_filters,
+    time_left,
+)
+from mastodon_filter.gitsync import repo_path, sync_repo, sync_since
+from mastodon_filter.keyindex import (
+    index_key,
+    open_template_index,
+    open_wordlist_index,
+)
+from mastodon_filter.progress import (
+    DONE,
+    CancelToken,
+    OperationCancelled,
+    OperationEvent,
+    describe,
+)
+from mastodon_filter.search import MATCH_MODES, SearchIndex
+from mastodon_filter.state import filter_state, record_sync
+from mastodon_filter.templates import get_registry
 from mastodon_filter.validate import validate_context_string, FILTER_ACTIONS
+from mastodon_filter.watch import DEBOUNCE, watch_wordlists
+from mastodon_filter.wordlist import load_wordlist
 
 
 @click.group(cls=DefaultGroup, default="gui", default_if_no_args=True)
@@ -20,6 +65,144 @@ def main() -> None:
     """
 
 
+def get_client(use_daemon: bool = True):
+    """
+    API client: the resident daemon if one is running, else a new client.
+    """
+    client = DaemonClient.connect() if use_daemon else None
+    if client is not None:
+        return client
+    return new_client()
+
+
+def new_client(cache: bool = False):
+    """
+    New API client, bypassing any running daemon. Its writes keep the
+    search index up to date and drop the daemon's cache.
+    """
+    ensure_config_exists()
+    # pylint: disable=import-outside-toplevel
+    from mastodon_filter.api import MastodonFilters
+
+    return MastodonFilters(get_config(), cache=cache, on_write=record_direct_write)
+
+
+PROGRESS_MODES = ("bar", "json", "none")
+PROGRESS_BAR_WIDTH = 30
+
+progress_option = click.option(
+    "--progress",
+    "-p",
+    "progress_mode",
+    type=click.Choice(PROGRESS_MODES),
+    default=None,
+    help="Report progress on stderr. Defaults to a bar on a terminal.",
+)
+
+
+def parse_duration_option(ctx, param, value) -> Optional[int]:
+    """
+    Parse a duration option into seconds.
+    """
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+regex_option = click.option(
+    "--regex",
+    "-r",
+    is_flag=True,
+    help="PATTERN is a regular expression searched in titles, not a glob.",
+)
+yes_option = click.option(
+    "--yes", "-y", is_flag=True, help="Do not ask for confirmation."
+)
+jobs_option = click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=MAX_WORKERS,
+    show_default=True,
+    help="Filters at once.",
+)
+within_option = click.option(
+    "--within",
+    "-w",
+    callback=parse_duration_option,
+    help="Only filters expiring within this duration, e.g. 12h.",
+)
+every_option = click.option(
+    "--every",
+    callback=parse_duration_option,
+    help="Repeat at this interval until interrupted, e.g. 10m.",
+)
+
+
+def echo_progress_bar(event: OperationEvent) -> None:
+    """
+    Redraw a progress bar on stderr.
+    """
+    filled = 0
+    if event.phase == DONE:
+        filled = PROGRESS_BAR_WIDTH
+    elif event.total:
+        filled = PROGRESS_BAR_WIDTH * event.done // event.total
+    progress_bar = "#" * filled + "-" * (PROGRESS_BAR_WIDTH - filled)
+    end = "\n" if event.phase == DONE else ""
+    click.echo(f"\r[{progress_bar}] {describe(event)}\033[K{end}", err=True, nl=False)
+
+
+def echo_progress_json(event: OperationEvent) -> None:
+    """
+    Print an event as a JSON line on stderr.
+    """
+    click.echo(json.dumps(event.as_dict()), err=True)
+
+
+def progress_client(progress_mode: Optional[str]) -> tuple:
+    """
+    API client and the progress arguments for its operations.
+    Progress is reported in this process, so asking for it bypasses the daemon.
+    """
+    if progress_mode is None:
+        client = DaemonClient.connect()
+        if client is not None:
+            return client, {}
+        progress_mode = "bar" if sys.stderr.isatty() else "none"
+    options = {"cancel": CancelToken()}
+    if progress_mode == "bar":
+        options["on_event"] = echo_progress_bar
+    elif progress_mode == "json":
+        options["on_event"] = echo_progress_json
+    return new_client(), options
+
+
+@contextmanager
+def cancel_on_interrupt(cancel: Optional[CancelToken]):
+    """
+    Turn the first Ctrl-C into a cancellation, the second aborts.
+    """
+    if cancel is None:
+        yield
+        return
+
+    def interrupted(signum, frame):  # pylint: disable=unused-argument
+        if cancel.cancelled:
+            raise KeyboardInterrupt
+        cancel.cancel()
+        click.echo("\nCancelling, press Ctrl-C again to abort.", err=True)
+
+    previous = signal.signal(signal.SIGINT, interrupted)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
 @main.command("gui")
 def main_gui() -> None:
     """
@@ -30,6 +213,31 @@ def main_gui() -> None:
     run_gui()
 
 
+@main.command("daemon")
+@click.option("--stop", is_flag=True, help="Stop the running daemon.")
+@click.option(
+    "--stream/--no-stream",
+    default=True,
+    help="Keep the cache until the server reports filter changes.",
+)
+def main_daemon(stop: bool, stream: bool) -> None:
+    """
+    Run a resident daemon that other commands forward requests to.
+    """
+    if stop:
+        if stop_daemon():
+            click.echo("Daemon stopped.")
+        else:
+            click.echo("Daemon is not running.")
+        return
+    ensure_config_exists()
+    try:
+        run_daemon(stream=stream)
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not start daemon: {error_message}")
+
+
 @main.command("config")
 def main_config() -> None:
     """
@@ -49,10 +257,8 @@ def main_list() -> None:
     """
     List filters.
     """
-    ensure_config_exists()
-    config = get_config()
+    filters = get_client()
     try:
-        filters = MastodonFilters(config)
         for filter_item in filters.filters():
             click.echo(f"{filter_item['title']}: {len(filter_item['keywords'])}")
     except Exception as error:
@@ -66,9 +272,7 @@ def main_show(title: str) -> None:
     """
     Show filter.
     """
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
+    filters = get_client()
     try:
         filter_item = filters.filter(title)
         for keyword in filter_item["keywords"]:
@@ -91,36 +295,40 @@ def main_show(title: str) -> None:
     "--action", "-a", default="warn", prompt=True, type=click.Choice(FILTER_ACTIONS)
 )
 @click.option("--expires-in", "-e", type=int)
+@progress_option
 def main_create(
     title: str,
     wordlist: click.File,
     context: list[str],
     action: str,
     expires_in: int,
+    progress_mode: Optional[str],
 ) -> None:
     """
     Create filter.
     """
     context = validate_context_string(context)
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
-    keywords = wordlist.read().decode("utf-8").splitlines()
+    filters, options = progress_client(progress_mode)
     try:
+        keywords = load_wordlist(wordlist)
         for filter_item in filters.filters():
             if filter_item["title"] == title:
                 raise ValueError(f"Filter already exists: {title}")
 
-        response = filters.create(
-            title=title,
-            context=context,
-            action=action,
-            keywords=keywords,
-            expires_in=expires_in,
-        )
+        with cancel_on_interrupt(options.get("cancel")):
+            response = filters.create(
+                title=title,
+                context=context,
+                action=action,
+                keywords=keywords,
+                expires_in=expires_in,
+                **options,
+            )
         click.echo(
             f"Filter created: {response['title']} with {len(keywords)} keywords."
         )
+    except OperationCancelled:
+        click.echo(f"Create cancelled: {title}. The filter was not kept.")
     except Exception as error:
         error_message = extract_error_message(error)
         click.echo(f"Could not create filter: {title}, got response: {error_message}")
@@ -129,33 +337,97 @@ def main_create(
 @main.command("sync")
 @click.argument("title")
 @click.argument("wordlist", type=click.File("rb", encoding="utf-8"))
+@click.option(
+    "--merge",
+    "-m",
+    is_flag=True,
+    help="Keep keywords changed on the server since the last sync.",
+)
+@click.option(
+    "--since",
+    "-s",
+    metavar="REVISION",
+    help="Only send the wordlist's changes in git since this revision.",
+)
+@progress_option
 def main_sync(
     title: str,
     wordlist: click.File,
+    merge: bool,
+    since: Optional[str],
+    progress_mode: Optional[str],
 ) -> None:
     """
     Sync filter.
     """
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
-    keywords = wordlist.read().decode("utf-8").splitlines()
+    filters, options = progress_client(progress_mode)
+    revision = None
     try:
-        response = filters.sync(title, keywords)
+        if since and merge:
+            raise ValueError("Use either --since or --merge.")
+        if since and not Path(wordlist.name).is_file():
+            raise ValueError("--since needs a wordlist file in a git repository.")
+        with cancel_on_interrupt(options.get("cancel")):
+            if since:
+                repo, path = repo_path(Path(wordlist.name))
+                response, keywords = sync_since(
+                    filters, title, repo, path, since, **options
+                )
+                revision = response["revision"]
+            elif merge:
+                keywords = load_wordlist(wordlist)
+                state = filter_state(title) or {}
+                response = filters.merge(
+                    title,
+                    keywords,
+                    base=state.get("base"),
+                    base_filter_id=state.get("filter_id"),
+                    **options,
+                )
+            else:
+                keywords = load_wordlist(wordlist)
+                response = filters.sync(title, keywords, **options)
+        record_sync(title, keywords, response, revision=revision)
         added = len(response["added"])
+        updated = len(response.get("updated", []))
         deleted = len(response["deleted"])
-        if added == 0 and deleted == 0:
-            click.echo(f"Filter synced: {title}. No changes.")
-            return
+        kept = len(response.get("kept", []))
+        conflicts = response.get("conflicts", [])
         if added > 0:
             click.echo("Added:")
             click.echo("  " + "\n  ".join(kw.keyword for kw in response["added"]))
+        if updated > 0:
+            click.echo("Updated whole_word:")
+            click.echo(
+                "  "
+                + "\n  ".join(
+                    f"{kw.keyword} ({kw.whole_word})" for kw in response["updated"]
+                )
+            )
         if deleted > 0:
             click.echo("Deleted:")
             click.echo("  " + "\n  ".join([kw.keyword for kw in response["deleted"]]))
-        click.echo(
-            f"Filter synced: {title}. Added {added}, deleted {deleted} keywords."
-        )
+        if kept > 0:
+            click.echo("Kept remote keywords:")
+            click.echo("  " + "\n  ".join(response["kept"]))
+        if conflicts:
+            click.echo("Conflicts:")
+            for conflict in conflicts:
+                click.echo(f"  {conflict['keyword']}: {conflict['reason']}")
+        if merge:
+            click.echo(
+                f"Filter merged: {title}. Added {added}, updated {updated}, "
+                f"deleted {deleted}, "
+                f"kept {kept} remote keywords, {len(conflicts)} conflicts."
+            )
+        elif added == 0 and deleted == 0:
+            click.echo(f"Filter synced: {title}. No changes.")
+        else:
+            click.echo(
+                f"Filter synced: {title}. Added {added}, deleted {deleted} keywords."
+            )
+    except OperationCancelled:
+        click.echo(f"Sync cancelled: {title}. Changes already sent were reverted.")
     except Exception as error:
         error_message = extract_error_message(error)
         click.echo(f"Could not sync filter: {title}, got response: {error_message}")
@@ -163,27 +435,121 @@ def main_sync(
 
 @main.command("export")
 @click.argument("path", type=click.Path(exists=False))
-def main_export(path) -> None:
+@click.option(
+    "--incremental",
+    "-i",
+    is_flag=True,
+    help="Append only filters changed since the previous export to PATH.",
+)
+@click.option(
+    "--compress",
+    "-z",
+    is_flag=True,
+    help="Compress, with gzip unless the suffix is .xz. Implied by .gz or .xz.",
+)
+@progress_option
+def main_export(
+    path, incremental: bool, compress: bool, progress_mode: Optional[str]
+) -> None:
     """
-    Export all filters.
+    Export all filters as newline-delimited JSON.
     """
     path = Path(path)
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
+    filters, options = progress_client(progress_mode)
     path.parent.mkdir(parents=True, exist_ok=True)
-    filters.cache(path)
+    try:
+        with cancel_on_interrupt(options.get("cancel")):
+            summary = filters.export(
+                path, incremental=incremental, compress=compress, **options
+            )
+        click.echo(
+            f"Exported {summary['filters']} filters to {path}: "
+            f"{summary['written']} written, {summary['removed']} removed."
+        )
+    except OperationCancelled:
+        click.echo(f"Export cancelled: {path} was left unchanged.")
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not export filters, got response: {error_message}")
+
+
+@main.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--compress",
+    "-z",
+    is_flag=True,
+    help="Read a compressed export, gzip unless the suffix is .xz.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Filters created at once.",
+)
+def main_import(path, compress: bool, jobs: int) -> None:
+    """
+    Recreate filters from an export.
+    Filters with a title that already exists are skipped.
+    """
+    path = Path(path)
+    # Imports stream results as they finish, which the daemon does not forward.
+    filters = get_client(use_daemon=False)
+    counts = {"created": 0, "skipped": 0, "failed": 0}
+    try:
+        for result in filters.import_filters(path, compress=compress, max_workers=jobs):
+            counts[result["status"]] += 1
+            title = result["title"]
+            if result["status"] == "created":
+                click.echo(f"Filter created: {title}")
+            elif result["status"] == "skipped":
+                click.echo(f"Filter already exists: {title}")
+            else:
+                error_message = extract_error_message(result["error"])
+                click.echo(
+                    f"Could not create filter: {title}, got response: {error_message}"
+                )
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not import filters, got response: {error_message}")
+        return
+    click.echo(
+        f"Imported {counts['created']} filters, "
+        f"skipped {counts['skipped']}, failed {counts['failed']}."
+    )
 
 
 @main.command("delete")
-@click.argument("title")
-def main_delete(title: str) -> None:
+@click.argument("title", required=False)
+@click.option(
+    "--match",
+    "-m",
+    "pattern",
+    metavar="PATTERN",
+    help="Delete every filter with a title matching a glob pattern.",
+)
+@regex_option
+@yes_option
+@jobs_option
+def main_delete(
+    title: Optional[str], pattern: Optional[str], regex: bool, yes: bool, jobs: int
+) -> None:
     """
-    Delete filter.
+    Delete filter, or all filters matching --match.
     """
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
+    if (title is None) == (pattern is None):
+        raise click.UsageError("Give either TITLE or --match PATTERN.")
+    if pattern is not None:
+        filters = new_client(cache=True)
+        matched = confirm_matching(filters, pattern, regex, "delete", yes)
+        if matched:
+            echo_bulk_results(
+                delete_filters(filters, matched, max_workers=jobs), "delete", "deleted"
+            )
+        return
+    filters = get_client()
     try:
         filters.delete(title)
         click.echo(f"Filter deleted: {title}")
@@ -192,6 +558,278 @@ def main_delete(title: str) -> None:
         click.echo(f"Could not delete filter: {title}, got response: {error_message}")
 
 
+@main.command("update")
+@click.argument("pattern")
+@click.option("--context", "-c", help="New contexts, comma separated.")
+@click.option("--action", "-a", type=click.Choice(FILTER_ACTIONS), help="New action.")
+@click.option(
+    "--expires-in",
+    "-e",
+    callback=parse_duration_option,
+    help="New time left, from now, e.g. 1d.",
+)
+@regex_option
+@yes_option
+@jobs_option
+def main_update(
+    pattern: str,
+    context: Optional[str],
+    action: Optional[str],
+    expires_in: Optional[int],
+    regex: bool,
+    yes: bool,
+    jobs: int,
+) -> None:
+    """
+    Set the context, action or expiry of all filters with a title
+    matching PATTERN. Keywords are left as they are.
+    """
+    if context is None and action is None and expires_in is None:
+        raise click.UsageError("Give --context, --action or --expires-in.")
+    if context is not None:
+        try:
+            context = validate_context_string(context)
+        except ValueError as error:
+            raise click.BadParameter(str(error), param_hint="--context")
+    filters = new_client(cache=True)
+    matched = confirm_matching(filters, pattern, regex, "update", yes)
+    if matched:
+        results = update_filters(
+            filters,
+            matched,
+            max_workers=jobs,
+            context=context,
+            action=action,
+            expires_in=expires_in,
+        )
+        echo_bulk_results(results, "update", "updated")
+
+
+def confirm_matching(
+    filters, pattern: str, regex: bool, operation: str, yes: bool
+) -> list[dict]:
+    """
+    Filters with a title matching a pattern, from a single listing.
+    Unless `yes`, they are listed and the operation is confirmed first.
+    """
+    try:
+        matched = match_filters(filters.filters(), pattern, regex=regex)
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not {operation} filters, got response: {error_message}")
+        return []
+    if not matched:
+        click.echo(f"No filters match: {pattern}")
+        return []
+    if yes:
+        return matched
+    click.echo(f"Filters to {operation}:")
+    for filter_item in sorted(matched, key=lambda item: item["title"].casefold()):
+        click.echo(f"  {filter_item['title']}: {len(filter_item['keywords'])} keywords")
+    if not click.confirm(f"{operation.capitalize()} {len(matched)} filters?"):
+        click.echo("No filters changed.")
+        return []
+    return matched
+
+
+def echo_bulk_results(results: Iterator[dict], operation: str, done: str) -> None:
+    """
+    Print a line per filter as it finishes, then the totals.
+    """
+    counts = {done: 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+        title = result["title"]
+        if result["status"] == "failed":
+            error_message = extract_error_message(result["error"])
+            click.echo(
+                f"Could not {operation} filter: {title}, got response: {error_message}"
+            )
+        else:
+            click.echo(f"Filter {done}: {title}")
+    click.echo(
+        f"{done.capitalize()} {counts[done]} filters, failed {counts['failed']}."
+    )
+
+
+@main.command("batch")
+@click.argument("operations", type=click.File("r", encoding="utf-8"), default="-")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Titles processed at once.",
+)
+def main_batch(operations, jobs: int) -> None:
+    """
+    Run JSON lines operations (create, sync, delete, show) from stdin.
+    Prints one JSON result line per operation as it finishes.
+    """
+    filters = new_client(cache=True)
+    try:
+        for result in run_batch(
+            filters, parse_operations(operations), max_workers=jobs
+        ):
+            click.echo(json.dumps(result))
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(json.dumps({"ok": False, "error": error_message}))
+
+
+def parse_mapping(ctx, param, values) -> dict[str, Path]:
+    """
+    Parse TITLE=WORDLIST arguments.
+    """
+    mappings = {}
+    for value in values:
+        title, sep, path = value.partition("=")
+        if not sep or not title or not path:
+            raise click.BadParameter(f"Expected TITLE=WORDLIST, got: {value}")
+        if not Path(path).is_file():
+            raise click.BadParameter(f"Wordlist not found: {path}")
+        mappings[title] = Path(path)
+    return mappings
+
+
+@main.command("watch")
+@click.argument("mappings", nargs=-1, required=True, callback=parse_mapping)
+@click.option(
+    "--debounce",
+    "-d",
+    default=DEBOUNCE,
+    show_default=True,
+    help="Seconds to wait for more edits before syncing.",
+)
+@click.option(
+    "--stream/--no-stream",
+    default=True,
+    help="Pick up filter edits made elsewhere as the server reports them.",
+)
+def main_watch(mappings: dict[str, Path], debounce: float, stream: bool) -> None:
+    """
+    Sync filters whenever their wordlists change.
+    Takes TITLE=WORDLIST pairs and runs until interrupted.
+    """
+    filters = new_client(cache=True)
+    try:
+        watch_wordlists(
+            filters, mappings, debounce=debounce, report=click.echo, stream=stream
+        )
+    except KeyboardInterrupt:
+        pass
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not watch wordlists, got response: {error_message}")
+
+
+@main.command("search")
+@click.argument("term")
+@click.option(
+    "--match",
+    "-m",
+    "mode",
+    default="prefix",
+    show_default=True,
+    type=click.Choice(MATCH_MODES),
+    help="How keywords must match TERM.",
+)
+@click.option(
+    "--refresh", "-r", is_flag=True, help="Fetch filters from the server first."
+)
+def main_search(term: str, mode: str, refresh: bool) -> None:
+    """
+    Find filters and templates with keywords matching TERM.
+    """
+    index = SearchIndex().load()
+    try:
+        if refresh or not index.has_filters:
+            filters = read_filters_cache() if not refresh else None
+            if filters is None:
+                filters = get_client().filters()
+                write_filters_cache(filters)
+            index.update_filters(filters)
+        index.update_templates(get_registry())
+        index.save()
+        results = index.search(term, mode)
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not search: {term}, got response: {error_message}")
+        return
+    for result in results:
+        click.echo(f"{result['kind']} {result['name']}: {result['keyword']}")
+    if not results:
+        click.echo(f"No keywords match: {term}")
+
+
+@main.command("check")
+@click.argument("terms", nargs=-1)
+@click.option(
+    "--wordlist",
+    "-w",
+    "wordlists",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Wordlist to check against, may be repeated.",
+)
+@click.option(
+    "--template",
+    "-t",
+    "templates",
+    multiple=True,
+    help="Template to check against, may be repeated.",
+)
+@click.option(
+    "--exact", "-x", is_flag=True, help="Only keywords equal to a term count."
+)
+def main_check(
+    terms: tuple[str, ...],
+    wordlists: tuple[Path, ...],
+    templates: tuple[str, ...],
+    exact: bool,
+) -> None:
+    """
+    Check whether wordlists or templates already cover TERMS, one per
+    line on stdin if none are given. A term is covered by a keyword
+    that would match text containing it. Exits with 1 if any term is
+    not covered.
+    """
+    if not wordlists and not templates:
+        raise click.UsageError("Give at least one --wordlist or --template.")
+    if not terms:
+        terms = tuple(line for line in click.get_text_stream("stdin") if line.strip())
+    indexes = []
+    try:
+        for path in wordlists:
+            indexes.append((f"wordlist {path}", open_wordlist_index(path)))
+        for name in templates:
+            indexes.append((f"template {name}", open_template_index(name)))
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not read keywords, got response: {error_message}")
+        sys.exit(2)
+    uncovered = 0
+    for term in terms:
+        term = term.strip()
+        covered = False
+        for source, index in indexes:
+            if exact:
+                matches = [index_key(term)] if term in index else []
+            else:
+                matches = index.matches(term)
+            for keyword in matches:
+                click.echo(f"{term}: covered by {source}: {keyword}")
+                covered = True
+        if not covered:
+            click.echo(f"{term}: not covered")
+            uncovered += 1
+    for _, index in indexes:
+        index.close()
+    if uncovered:
+        sys.exit(1)
+
+
 @main.group()
 def template() -> None:
     """
@@ -202,25 +840,35 @@ def template() -> None:
 @template.command("list")
 def template_list() -> None:
     """
-    List templates.
+    List templates and their keyword counts.
     """
-    for template in list_templates():
-        click.echo(template)
+    registry = get_registry()
+    for name in registry.names():
+        try:
+            click.echo(f"{name}: {registry.info(name)['count']}")
+        except Exception as error:
+            error_message = extract_error_message(error)
+            click.echo(f"{name}: {error_message}")
 
 
 @template.command("show")
 @click.argument("name")
 def template_show(name: str) -> None:
     """
-    Show template.
+    Show template, with included templates resolved.
     """
-    keywords = load_template(name)
+    try:
+        keywords = get_registry().keywords(name)
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not show template: {name}: {error_message}")
+        return
     for keyword in keywords:
         click.echo(keyword)
 
 
 @template.command("use")
-@click.argument("name")
+@click.argument("names", nargs=-1, required=True)
 @click.argument("title")
 @click.option(
     "--context",
@@ -232,36 +880,228 @@ def template_show(name: str) -> None:
     "--action", "-a", default="warn", prompt=True, type=click.Choice(FILTER_ACTIONS)
 )
 @click.option("--expires-in", "-e", type=int)
+@progress_option
 def main_use(
-    name: str,
+    names: tuple[str, ...],
     title: str,
     context: list[str],
     action: str,
     expires_in: int,
+    progress_mode: Optional[str],
 ) -> None:
     """
-    Use template to create a new filter.
+    Use one or more templates to create a new filter.
     """
-    ensure_config_exists()
-    config = get_config()
-    filters = MastodonFilters(config)
     context = validate_context_string(context)
-    keywords = load_template(name)
+    try:
+        keywords = get_registry().compose(list(names))
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not use templates: {error_message}")
+        return
+    filters, options = progress_client(progress_mode)
     try:
         for filter_item in filters.filters():
             if filter_item["title"] == title:
                 raise ValueError(f"Filter already exists: {title}")
 
-        response = filters.create(
-            title=title,
-            context=context,
-            action=action,
-            keywords=keywords,
-            expires_in=expires_in,
-        )
+        with cancel_on_interrupt(options.get("cancel")):
+            response = filters.create(
+                title=title,
+                context=context,
+                action=action,
+                keywords=keywords,
+                expires_in=expires_in,
+                **options,
+            )
         click.echo(
             f"Filter created: {response['title']} with {len(keywords)} keywords."
         )
+    except OperationCancelled:
+        click.echo(f"Create cancelled: {title}. The filter was not kept.")
     except Exception as error:
         error_message = extract_error_message(error)
         click.echo(f"Could not create filter: {title}, got response: {error_message}")
+
+
+@main.group()
+def expiry() -> None:
+    """
+    Filter expiry.
+    """
+
+
+@expiry.command("list")
+@within_option
+def expiry_list(within: Optional[int]) -> None:
+    """
+    List filters by time left, expiring soonest first.
+    """
+    filters = get_client()
+    try:
+        filter_items = filters.filters()
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not list filters, got response: {error_message}")
+        return
+    if within is not None:
+        filter_items = expiring_within(filter_items, within)
+    for filter_item in by_time_left(filter_items):
+        left = format_duration(time_left(filter_item))
+        click.echo(f"{filter_item['title']}: {left}")
+
+
+@expiry.command("renew")
+@click.argument("pattern")
+@click.option(
+    "--expires-in",
+    "-e",
+    required=True,
+    callback=parse_duration_option,
+    help="New time left, from now, e.g. 1d.",
+)
+@regex_option
+@within_option
+@every_option
+@jobs_option
+def expiry_renew(
+    pattern: str,
+    expires_in: int,
+    regex: bool,
+    within: Optional[int],
+    every: Optional[int],
+    jobs: int,
+) -> None:
+    """
+    Set filters with a title matching PATTERN to expire later.
+    Only the expiry is sent, keywords are left as they are.
+    """
+    renew_matching(pattern, regex, within, every, jobs, expires_in=expires_in)
+
+
+@expiry.command("extend")
+@click.argument("pattern")
+@click.option(
+    "--by",
+    "-b",
+    "extend_by",
+    required=True,
+    callback=parse_duration_option,
+    help="Time added to the current expiry, e.g. 6h.",
+)
+@regex_option
+@within_option
+@every_option
+@jobs_option
+def expiry_extend(
+    pattern: str,
+    extend_by: int,
+    regex: bool,
+    within: Optional[int],
+    every: Optional[int],
+    jobs: int,
+) -> None:
+    """
+    Push back the expiry of filters with a title matching PATTERN.
+    Filters that never expire are skipped.
+    """
+    renew_matching(pattern, regex, within, every, jobs, extend_by=extend_by)
+
+
+def renew_matching(
+    pattern: str,
+    regex: bool,
+    within: Optional[int],
+    every: Optional[int],
+    jobs: int,
+    **renewal,
+) -> None:
+    """
+    Renew matching filters once, or at every interval until interrupted.
+    Each round fetches all filters once.
+    """
+    filters = new_client(cache=True)
+    try:
+        while True:
+            renew_round(filters, pattern, regex, within, jobs, **renewal)
+            if every is None:
+                return
+            time.sleep(every)
+            filters.invalidate()
+    except KeyboardInterrupt:
+        pass
+
+
+def renew_round(
+    filters, pattern: str, regex: bool, within: Optional[int], jobs: int, **renewal
+) -> None:
+    """
+    Renew the filters matching a pattern, in parallel.
+    """
+    try:
+        matched = match_filters(filters.filters(), pattern, regex=regex)
+    except Exception as error:
+        error_message = extract_error_message(error)
+        click.echo(f"Could not renew filters, got response: {error_message}")
+        return
+    if within is not None:
+        matched = expiring_within(matched, within)
+    if not matched:
+        click.echo(f"No filters to renew: {pattern}")
+        return
+    counts = {"renewed": 0, "skipped": 0, "failed": 0}
+    for result in renew_filters(filters, matched, max_workers=jobs, **renewal):
+        counts[result["status"]] += 1
+        title = result["title"]
+        if result["status"] == "renewed":
+            left = format_duration(remaining_seconds(result["expires_at"]))
+            click.echo(f"Filter renewed: {title}, expires in {left}.")
+        elif result["status"] == "skipped":
+            click.echo(f"Filter never expires: {title}")
+        else:
+            error_message = extract_error_message(result["error"])
+            click.echo(
+                f"Could not renew filter: {title}, got response: {error_message}"
+            )
+    click.echo(
+        f"Renewed {counts['renewed']} filters, "
+        f"skipped {counts['skipped']}, failed {counts['failed']}."
+    )
+
+
+@main.command("sync-repo")
+@click.argument("mappings", nargs=-1, required=True, callback=parse_mapping)
+@click.option(
+    "--since",
+    "-s",
+    metavar="REVISION",
+    help="Revision to read changes from, instead of the last one synced.",
+)
+@jobs_option
+def main_sync_repo(mappings: dict[str, Path], since: Optional[str], jobs: int) -> None:
+    """
+    Sync filters with wordlists in git repositories, sending only what
+    changed since the revision last synced to each filter.
+    Takes TITLE=WORDLIST pairs.
+    """
+    filters = new_client(cache=True)
+    counts = {"synced": 0, "unchanged": 0, "failed": 0}
+    for result in sync_repo(filters, mappings, since=since, max_workers=jobs):
+        counts[result["status"]] += 1
+        title = result["title"]
+        if result["status"] == "synced":
+            response = result["response"]
+            click.echo(
+                f"Filter synced: {title} at {response['revision'][:12]}. "
+                f"Added {len(response['added'])}, "
+                f"deleted {len(response['deleted'])} keywords."
+            )
+        elif result["status"] == "unchanged":
+            click.echo(f"Filter synced: {title}. No changes.")
+        else:
+            error_message = extract_error_message(result["error"])
+            click.echo(f"Could not sync filter: {title}, got response: {error_message}")
+    click.echo(
+        f"Synced {counts['synced']} filters, "
+        f"{counts['unchanged']} unchanged, failed {counts['failed']}."
+    )
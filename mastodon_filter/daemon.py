@@ -0,0 +1,339 @@
+"""
+Resident daemon keeping an API client and its filters cache warm.
+
+The daemon listens on a Unix socket in APP_DIR. Requests and responses
+are single JSON lines: `{"method": ..., "args": [...], "kwargs": {...}}`
+is answered with `{"result": ...}` or `{"error": ..., "type": ...}`.
+
+Commands that write without the daemon, to run writes in parallel or
+stream their results, and the GUI make it drop its cache after every
+write through `record_direct_write`, so it never serves filters as they
+were.
+
+While the daemon is connected to the user stream, cached filters are
+refreshed when a `filters_changed` event shows changes made elsewhere,
+and otherwise expire after STREAM_CACHE_TTL in case an event was missed.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from mastodon_filter.config import APP_DIR, CONFIG_FILE, get_config
+from mastodon_filter.logging import get_logger
+from mastodon_filter.schema import Keyword, KeywordSet
+from mastodon_filter.search import record_write
+from mastodon_filter.stream import FiltersStream
+
+logger = get_logger(__name__)
+
+SOCKET_PATH = APP_DIR / "daemon.sock"
+NO_DAEMON_ENV = "MASTODON_FILTER_NO_DAEMON"
+CACHE_TTL = 60.0
+STREAM_CACHE_TTL = 900.0
+
+# Client methods the daemon runs on behalf of the CLI.
+METHODS = (
+    "filters",
+    "filter",
+    "create",
+    "sync",
+    "merge",
+    "update",
+    "delete",
+    "delete_by_id",
+    "export",
+    "invalidate",
+)
+
+
+def _encode(value):
+    if isinstance(value, Keyword):
+        return asdict(value)
+    if isinstance(value, KeywordSet):
+        return [asdict(keyword) for keyword in value.to_keywords()]
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _decode_keywords(value):
+    if isinstance(value, list):
+        return [Keyword(**item) if isinstance(item, dict) else item for item in value]
+    return value
+
+
+class DaemonClient:
+    """
+    Forwards MastodonFilters calls to a running daemon.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.reader = sock.makefile("r", encoding="utf-8")
+
+    @classmethod
+    def connect(cls, path: Path = SOCKET_PATH) -> Optional["DaemonClient"]:
+        """
+        Connect to the daemon, None if it is not running or disabled.
+        """
+        if os.environ.get(NO_DAEMON_ENV):
+            return None
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: Path = SOCKET_PATH) -> Optional["DaemonClient"]:
+        """
+        Connect to the daemon, None if it is not running.
+        """
+        if not path.exists():
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def close(self) -> None:
+        """
+        Close the connection.
+        """
+        self.reader.close()
+        self.sock.close()
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Run a client method in the daemon.
+        """
+        request = {"method": method, "args": args, "kwargs": kwargs}
+        line = json.dumps(request, default=_encode) + "\n"
+        self.sock.sendall(line.encode("utf-8"))
+        response = self.reader.readline()
+        if not response:
+            raise ConnectionError("Daemon closed the connection.")
+        response = json.loads(response)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def __getattr__(self, method: str):
+        if method not in METHODS:
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self.call(method, *args, **kwargs)
+
+    def sync(self, *args, **kwargs) -> dict:
+        """
+        Sync filter, with added and deleted keywords as Keyword instances.
+        """
+        response = self.call("sync", *args, **kwargs)
+        for key in ("added", "deleted"):
+            response[key] = _decode_keywords(response[key])
+        return response
+
+    def merge(self, *args, **kwargs) -> dict:
+        """
+        Merge-sync filter, with added, updated and deleted keywords as
+        Keyword instances. Kept keywords stay strings, conflicts dicts.
+        """
+        response = self.call("merge", *args, **kwargs)
+        for key in ("added", "updated", "deleted"):
+            response[key] = _decode_keywords(response[key])
+        return response
+
+    def update(self, filter_id: str, **kwargs) -> dict:
+        """
+        Update filter by id.
+        """
+        if "keywords" in kwargs:
+            kwargs["keywords"] = [asdict(keyword) for keyword in kwargs["keywords"]]
+        return self.call("update", filter_id, **kwargs)
+
+    def export(self, path: Path, **kwargs) -> dict:
+        """
+        Export filters. The daemon may run in another directory.
+        """
+        return self.call("export", str(Path(path).resolve()), **kwargs)
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix socket server holding the shared API client.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, stream: bool = True) -> None:
+        self.path = path
+        self.stream = stream
+        self.listener: Optional[FiltersStream] = None
+        self.client = None
+        self.config_mtime = None
+        self.client_lock = threading.Lock()
+        super().__init__(str(path), DaemonHandler)
+
+    def server_bind(self) -> None:
+        # Only the owner may talk to a daemon holding their access token.
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+    @staticmethod
+    def config_stat() -> Optional[int]:
+        """
+        Modification time of the config file, None if there is none.
+        """
+        try:
+            return CONFIG_FILE.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def get_client(self):
+        """
+        Shared client, rebuilt when the config file changes.
+        """
+        # pylint: disable=import-outside-toplevel
+        from mastodon_filter.api import MastodonFilters
+
+        mtime = self.config_stat()
+        with self.client_lock:
+            if self.client is None or mtime != self.config_mtime:
+                logger.info("Loading config.")
+                self.client = MastodonFilters(
+                    get_config(),
+                    cache=True,
+                    cache_ttl=CACHE_TTL,
+                    on_write=record_write,
+                )
+                self.config_mtime = mtime
+                if self.stream:
+                    self.listen(self.client)
+            return self.client
+
+    def listen(self, client) -> None:
+        """
+        Invalidate the client's cache on filter changes pushed by the
+        server, other than those caused by the client itself.
+        """
+        if self.listener is not None:
+            self.listener.stop()
+
+        def status(connected: bool) -> None:
+            client.cache_ttl = STREAM_CACHE_TTL if connected else CACHE_TTL
+
+        self.listener = FiltersStream(
+            client.config,
+            on_change=client.filters_changed,
+            on_status=status,
+            on_reconnect=client.invalidate,
+        ).start()
+
+    def server_close(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+        super().server_close()
+
+    def dispatch(self, request: dict):
+        """
+        Run one request against the shared client.
+        """
+        method = request.get("method")
+        if method == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return None
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        args = list(request.get("args", []))
+        kwargs = request.get("kwargs", {})
+        if method == "export":
+            args[0] = Path(args[0])
+        if method == "update" and "keywords" in kwargs:
+            kwargs["keywords"] = _decode_keywords(kwargs["keywords"])
+        return getattr(self.get_client(), method)(*args, **kwargs)
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """
+    Handles JSON line requests on one connection.
+    """
+
+    server: DaemonServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                logger.debug("Daemon request: %s", request.get("method"))
+                response = {"result": self.server.dispatch(request)}
+            except Exception as error:  # pylint: disable=broad-except
+                response = {"error": str(error), "type": type(error).__name__}
+            payload = json.dumps(response, default=_encode) + "\n"
+            self.wfile.write(payload.encode("utf-8"))
+
+
+def run_daemon(path: Path = SOCKET_PATH, stream: bool = True) -> None:
+    """
+    Serve until stopped. Replaces a stale socket left by a crashed daemon.
+    With `stream`, filter changes are pushed by the server.
+    """
+    client = DaemonClient.open(path)
+    if client is not None:
+        client.close()
+        raise ValueError(f"Daemon is already running on {path}")
+    if path.exists():
+        path.unlink()
+    server = DaemonServer(path, stream=stream)
+    logger.info("Daemon listening on %s", path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        logger.info("Daemon stopped.")
+
+
+def invalidate_daemon(path: Path = SOCKET_PATH) -> None:
+    """
+    Drop the cache of a running daemon, after a write that bypassed it.
+    """
+    client = DaemonClient.open(path)
+    if client is None:
+        return
+    try:
+        client.call("invalidate")
+    except (OSError, ValueError) as error:
+        logger.warning("Could not invalidate the daemon cache: %s", error)
+    finally:
+        client.close()
+
+
+def record_direct_write(filter_id: str, filter_item: Optional[dict]) -> None:
+    """
+    Write hook of clients other than the daemon's: keep the search index
+    up to date and the daemon from serving filters as they were.
+    """
+    record_write(filter_id, filter_item)
+    invalidate_daemon()
+
+
+def stop_daemon(path: Path = SOCKET_PATH) -> bool:
+    """
+    Ask a running daemon to stop. Returns False if none is running.
+    """
+    client = DaemonClient.open(path)
+    if client is None:
+        return False
+    try:
+        client.call("shutdown")
+    finally:
+        client.close()
+    return True
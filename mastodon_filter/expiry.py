@@ -0,0 +1,124 @@
+"""
+Filter expiry: time left, renewal and extension.
+
+Renewals are metadata-only updates, only `expires_in` is sent and the
+keywords stay as they are on the server.
+"""
+import re
+from typing import Iterable, Iterator, Optional
+
+from mastodon_filter.backup import remaining_seconds
+from mastodon_filter.bulk import MAX_WORKERS, run_concurrently
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+DURATION_PATTERN = re.compile(r"(\d+)\s*([smhdw]?)")
+
+
+def parse_duration(value: str) -> int:
+    """
+    Seconds in a duration such as `90`, `30m`, `12h`, `1d` or `1d12h`.
+    Plain numbers are seconds.
+    """
+    text = str(value).strip().lower()
+    seconds = 0
+    position = 0
+    for match in DURATION_PATTERN.finditer(text):
+        if match.start() != position:
+            break
+        seconds += int(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+        position = match.end()
+    if not text or position != len(text):
+        raise ValueError(f"Invalid duration: {value}, expected e.g. 90, 30m, 12h, 1d")
+    if seconds <= 0:
+        raise ValueError(f"Duration must be positive: {value}")
+    return seconds
+
+
+def format_duration(seconds: Optional[int]) -> str:
+    """
+    Time left in its two largest units, e.g. `1d 4h`.
+    """
+    if seconds is None:
+        return "never expires"
+    if seconds <= 0:
+        return "expired"
+    parts = []
+    for unit in ("d", "h", "m", "s"):
+        count, seconds = divmod(seconds, DURATION_UNITS[unit])
+        if count or (unit == "s" and not parts):
+            parts.append(f"{count}{unit}")
+    return " ".join(parts[:2])
+
+
+def time_left(filter_item: dict) -> Optional[int]:
+    """
+    Seconds until a filter expires, None if it never does.
+    """
+    return remaining_seconds(filter_item.get("expires_at"))
+
+
+def by_time_left(filters: Iterable[dict]) -> list[dict]:
+    """
+    Filters expiring soonest first, filters that never expire last.
+    """
+
+    def key(filter_item: dict) -> tuple:
+        left = time_left(filter_item)
+        return (left is None, left or 0, filter_item["title"].casefold())
+
+    return sorted(filters, key=key)
+
+
+def expiring_within(filters: Iterable[dict], within: int) -> list[dict]:
+    """
+    Filters expiring in `within` seconds or less, expired ones included.
+    """
+    expiring = []
+    for filter_item in filters:
+        left = time_left(filter_item)
+        if left is not None and left <= within:
+            expiring.append(filter_item)
+    return expiring
+
+
+def renew_filters(
+    client,
+    filters: Iterable[dict],
+    expires_in: Optional[int] = None,
+    extend_by: Optional[int] = None,
+    max_workers: int = MAX_WORKERS,
+) -> Iterator[dict]:
+    """
+    Set filters to expire `expires_in` seconds from now, or `extend_by`
+    seconds after their current expiry. Filters that never expire are
+    skipped when extending, expired ones are extended from now.
+    Yields one result per filter as it finishes.
+    """
+    if (expires_in is None) == (extend_by is None):
+        raise ValueError("Give either expires_in or extend_by.")
+    planned = []
+    for filter_item in filters:
+        if expires_in is not None:
+            planned.append((filter_item, expires_in))
+            continue
+        left = time_left(filter_item)
+        if left is None:
+            yield {"title": filter_item["title"], "status": "skipped"}
+            continue
+        planned.append((filter_item, max(left, 0) + extend_by))
+
+    def apply(plan: tuple) -> dict:
+        filter_item, seconds = plan
+        return client.update(filter_item["id"], expires_in=seconds)
+
+    for (filter_item, _), response, error in run_concurrently(
+        apply, planned, max_workers
+    ):
+        if error is not None:
+            yield {"title": filter_item["title"], "status": "failed", "error": error}
+            continue
+        yield {
+            "title": filter_item["title"],
+            "status": "renewed",
+            "expires_at": response.get("expires_at"),
+        }
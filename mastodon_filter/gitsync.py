@@ -0,0 +1,240 @@
+"""
+Incremental sync of wordlists kept in a git repository.
+
+Instead of reconciling a whole wordlist with its filter, only the lines
+changed since the revision last applied are read, from `git diff -U0`,
+and sent as keyword additions and removals. Wordlists in the wordlist
+language are compiled at both revisions and compared, their includes
+are read from the working tree. The applied revision is recorded per
+filter in the sync state.
+"""
+import subprocess
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from mastodon_filter.bulk import MAX_WORKERS, run_concurrently
+from mastodon_filter.logging import get_logger
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.state import filter_state, record_sync, update_filter_state
+from mastodon_filter.wordlist import compile_text, is_wordlist_language
+
+logger = get_logger(__name__)
+
+GIT = "git"
+
+
+def run_git(repo: Path, *args: str) -> str:
+    """
+    Output of a git command run in `repo`.
+    """
+    try:
+        result = subprocess.run(
+            [GIT, "-C", str(repo), *args],
+            capture_output=True,
+            check=False,
+            text=True,
+            encoding="utf-8",
+        )
+    except OSError as error:
+        raise ValueError(f"Could not run git: {error}") from error
+    if result.returncode != 0:
+        message = result.stderr.strip().splitlines()
+        raise ValueError(message[-1] if message else f"git {args[0]} failed.")
+    return result.stdout
+
+
+def repo_path(path: Path) -> tuple[Path, str]:
+    """
+    Root of the repository containing a file, and the file's path in it.
+    """
+    path = Path(path).resolve()
+    root = Path(run_git(path.parent, "rev-parse", "--show-toplevel").strip())
+    return root, path.relative_to(root.resolve()).as_posix()
+
+
+def resolve_revision(repo: Path, revision: str) -> str:
+    """
+    Commit id of a revision.
+    """
+    return run_git(repo, "rev-parse", "--verify", f"{revision}^{{commit}}").strip()
+
+
+def changed_files(repo: Path, since: str, until: str, paths: Iterable[str]) -> set[str]:
+    """
+    Which of `paths` changed between two revisions.
+    """
+    paths = list(paths)
+    if not paths:
+        return set()
+    output = run_git(repo, "diff", "--name-only", since, until, "--", *paths)
+    return set(output.splitlines())
+
+
+def show_file(repo: Path, revision: str, path: str) -> Optional[str]:
+    """
+    Content of a file at a revision, None if it did not exist.
+    """
+    try:
+        return run_git(repo, "show", f"{revision}:{path}")
+    except ValueError:
+        return None
+
+
+def diff_lines(repo: Path, since: str, until: str, path: str) -> tuple[list, list]:
+    """
+    Lines added and removed between two revisions, without context.
+    """
+    output = run_git(
+        repo, "diff", "-U0", "--no-color", "--no-ext-diff", since, until, "--", path
+    )
+    added, removed = [], []
+    in_hunk = False
+    for line in output.splitlines():
+        if line.startswith("@@"):
+            in_hunk = True
+        elif line.startswith("diff "):
+            # Header of the next file, its `---`/`+++` lines are not content.
+            in_hunk = False
+        elif not in_hunk:
+            continue
+        elif line.startswith("+"):
+            added.append(line[1:])
+        elif line.startswith("-"):
+            removed.append(line[1:])
+    return added, removed
+
+
+def keywords_of(text: Optional[str], directory: Path) -> KeywordSet:
+    """
+    Keywords of wordlist text, compiled if it uses the wordlist language.
+    """
+    if not text:
+        return KeywordSet()
+    if is_wordlist_language(text):
+        return compile_text(text, directory)[0]
+    return KeywordSet(text.splitlines())
+
+
+def wordlist_changes(
+    repo: Path, since: str, until: str, path: str
+) -> tuple[KeywordSet, KeywordSet, KeywordSet]:
+    """
+    Keywords added to and removed from a wordlist between two revisions,
+    and its keywords at `until`.
+    """
+    directory = (repo / path).parent
+    new_text = show_file(repo, until, path)
+    keywords = keywords_of(new_text, directory)
+    if new_text is None or is_wordlist_language(new_text):
+        old_keywords = keywords_of(show_file(repo, since, path), directory)
+        return keywords - old_keywords, old_keywords - keywords, keywords
+    added_lines, removed_lines = diff_lines(repo, since, until, path)
+    added, removed = KeywordSet(added_lines), KeywordSet(removed_lines)
+    # Lines moved, or removed while still listed elsewhere, are unchanged.
+    return added - removed, removed - keywords, keywords
+
+
+def sync_since(
+    client,
+    title: str,
+    repo: Path,
+    path: str,
+    since: str,
+    until: str = "HEAD",
+    **options,
+) -> tuple[dict, KeywordSet]:
+    """
+    Apply the changes of a wordlist between two revisions to its filter.
+    Keywords already on the server are not added again, keywords no
+    longer there are not deleted. Returns the filter with `added` and
+    `deleted` keywords and the `revision` applied, and the keywords of
+    the wordlist at that revision.
+    """
+    revision = resolve_revision(repo, until)
+    since = resolve_revision(repo, since)
+    added, removed, keywords = wordlist_changes(repo, since, revision, path)
+    filter_item = client.filter(title)
+    remote = KeywordSet(filter_item["keywords"])
+    add_keywords = (added - remote).to_keywords()
+    delete_keywords = (remote & removed).to_keywords(
+        delete=True,
+        ids={keyword["keyword"]: keyword["id"] for keyword in filter_item["keywords"]},
+    )
+    logger.debug("Add keywords: %s", add_keywords)
+    logger.debug("Delete keywords: %s", delete_keywords)
+    if add_keywords or delete_keywords:
+        filter_item = client.update(
+            filter_item["id"], keywords=add_keywords + delete_keywords, **options
+        )
+    response = dict(filter_item)
+    response["added"] = add_keywords
+    response["deleted"] = delete_keywords
+    response["revision"] = revision
+    return response, keywords
+
+
+def sync_repo(
+    client,
+    mappings: dict[str, Path],
+    since: Optional[str] = None,
+    max_workers: int = MAX_WORKERS,
+) -> Iterator[dict]:
+    """
+    Sync wordlists in git repositories with their filters, from `since`
+    or else the revision last applied to each filter, up to HEAD.
+    Filters never synced from a revision get a full sync. Files that did
+    not change cost no request. Yields one result per title.
+    """
+    jobs = {}
+    pending: dict[tuple, list[tuple[str, str]]] = {}
+    for title, wordlist in mappings.items():
+        try:
+            repo, path = repo_path(wordlist)
+            head = resolve_revision(repo, "HEAD")
+            start = since or (filter_state(title) or {}).get("revision")
+            if start is None:
+                jobs[title] = (full_sync, repo, path, head)
+                continue
+            start = resolve_revision(repo, start)
+        except ValueError as error:
+            yield {"title": title, "status": "failed", "error": error}
+            continue
+        pending.setdefault((repo, start, head), []).append((path, title))
+    for (repo, start, head), wordlists in pending.items():
+        try:
+            changed = changed_files(repo, start, head, {path for path, _ in wordlists})
+        except ValueError as error:
+            for _, title in wordlists:
+                yield {"title": title, "status": "failed", "error": error}
+            continue
+        for path, title in wordlists:
+            if path in changed:
+                jobs[title] = (sync_since, repo, path, start, head)
+                continue
+            update_filter_state(title, revision=head)
+            yield {"title": title, "status": "unchanged"}
+
+    def run(title: str) -> tuple[dict, KeywordSet]:
+        func, *args = jobs[title]
+        return func(client, title, *args)
+
+    for title, result, error in run_concurrently(run, list(jobs), max_workers):
+        if error is not None:
+            yield {"title": title, "status": "failed", "error": error}
+            continue
+        response, keywords = result
+        record_sync(title, keywords, response, revision=response["revision"])
+        yield {"title": title, "status": "synced", "response": response}
+
+
+def full_sync(
+    client, title: str, repo: Path, path: str, until: str = "HEAD"
+) -> tuple[dict, KeywordSet]:
+    """
+    Sync a filter with a wordlist as of a revision.
+    """
+    revision = resolve_revision(repo, until)
+    keywords = keywords_of(show_file(repo, revision, path), (repo / path).parent)
+    response = client.sync(title, keywords)
+    response["revision"] = revision
+    return response, keywords
@@ -6,10 +6,17 @@ import tkinter as tk
 import customtkinter as ctk
 from tkinter import messagebox
 
+from mastodon_filter.api import MastodonFilters
+from mastodon_filter.cache import write_filters_cache
 from mastodon_filter.config import get_config, save_config
+from mastodon_filter.daemon import record_direct_write
 from mastodon_filter.errors import extract_error_message
 from mastodon_filter.gui.filter_list import FilterList
 from mastodon_filter.gui.filter_editor import FilterEditor
+from mastodon_filter.gui.model import FilterModel
+from mastodon_filter.gui.status_bar import StatusBar
+from mastodon_filter.gui.worker import Worker
+from mastodon_filter.stream import FiltersStream
 
 
 class MastodonFilterGUI(ctk.CTk):
@@ -18,7 +25,62 @@ class MastodonFilterGUI(ctk.CTk):
     def __init__(self):
         """Initialize Frame."""
         super().__init__()
+        self.model = FilterModel()
+        self.worker = Worker(self)
+        self._client = None
+        self.stream = None
         self.init_ui()
+        self.listen()
+
+    def client(self) -> MastodonFilters:
+        """
+        API client shared by all background jobs.
+        Only call from the worker thread.
+        """
+        if self._client is None:
+            config = get_config()
+            if not config.api_base_url or not config.access_token:
+                raise ValueError("Instance is not configured.")
+            self._client = MastodonFilters(config, on_write=record_direct_write)
+        return self._client
+
+    def reset_client(self):
+        """Drop the API client after the configuration changed."""
+        self.worker.submit(setattr, self, "_client", None)
+        self.listen()
+
+    def listen(self):
+        """Reload filters when the server reports they changed."""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+        config = get_config()
+        if not config.api_base_url or not config.access_token:
+            return
+        self.stream = FiltersStream(
+            config,
+            on_change=self.stream_changed,
+            on_reconnect=lambda: self.worker.call_soon(self.filters_changed),
+        ).start()
+
+    def stream_changed(self):
+        """Filters were edited, reload unless only by this app's own saves."""
+        client = self._client
+        if client is not None and not client.external_change():
+            return
+        self.worker.call_soon(self.filters_changed)
+
+    def filters_changed(self, _=None):
+        """Filters were edited elsewhere."""
+        self.filter_list.load_filters()
+
+    def save_cache(self):
+        """Write the model to the local filters cache in background."""
+        self.worker.submit(write_filters_cache, self.model.snapshot())
+
+    def show_error(self, err):
+        """Show a background job's error."""
+        messagebox.showerror("Error", extract_error_message(err))
 
     def init_ui(self):
         """Initialize App UI."""
@@ -27,6 +89,8 @@ class MastodonFilterGUI(ctk.CTk):
         self.grid_columnconfigure(0, weight=0)
         self.grid_columnconfigure(1, weight=50)
         self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=0)
+        self.init_status_bar()
         self.init_filter_editor()
         self.init_filter_list()
         self.init_menu_bar()
@@ -63,6 +127,11 @@ class MastodonFilterGUI(ctk.CTk):
         )
         self.menu_bar.add_cascade(label="Filter", menu=self.filter_menu)
 
+    def init_status_bar(self):
+        """Initialize the status bar."""
+        self.status_bar = StatusBar(self)
+        self.status_bar.grid(row=1, column=0, columnspan=4, sticky="ew")
+
     def init_filter_list(self):
         """Initialize the filter list."""
         self.filter_list = FilterList(self)
@@ -83,6 +152,7 @@ class MastodonFilterGUI(ctk.CTk):
             return
         config.api_base_url = instance_url
         save_config(config)
+        self.reset_client()
 
         if not config.access_token:
             self.config_instance_access_token()
@@ -99,6 +169,7 @@ class MastodonFilterGUI(ctk.CTk):
             return
         config.access_token = access_token
         save_config(config)
+        self.reset_client()
 
         if not config.api_base_url:
             self.config_instance_url()
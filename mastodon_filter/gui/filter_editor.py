@@ -3,20 +3,24 @@ Mastodon FilterEditor.
 """
 # pylint: disable=attribute-defined-outside-init
 import platform
-import json
-import threading
-import tkinter as tk
-from tkinter import messagebox
+from pathlib import Path
+from tkinter import filedialog
+from typing import Optional
 
 import customtkinter as ctk
 
-from mastodon_filter.api import MastodonFilters
-from mastodon_filter.config import get_config
+from mastodon_filter.gui.keyword_view import KeywordView
+from mastodon_filter.gui.model import REMOVED, UPDATED
 from mastodon_filter.logging import get_logger
-from mastodon_filter.errors import extract_error_message
+from mastodon_filter.progress import OperationCancelled
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.wordlist import read_wordlist
 
 logger = get_logger(__name__)
 
+AUTOSAVE_DELAY_MS = 2000
+AUTOSAVE_BATCH = 50
+
 
 class FilterEditor(ctk.CTkFrame):
     """Mastodon FilterList."""
@@ -25,7 +29,17 @@ class FilterEditor(ctk.CTkFrame):
         """Initialize Frame."""
         ctk.CTkFrame.__init__(self, parent, **kwargs)
         self.parent = parent
-        self.cached_filters_path = tk.StringVar()
+        self.current_title = None
+        # Keyword ids of the loaded snapshot, and edits not yet saved.
+        self.keyword_ids: dict[str, str] = {}
+        # Added keywords map to their whole_word flag.
+        self.pending_added: dict[str, bool] = {}
+        self.pending_removed: dict[str, Optional[str]] = {}
+        # Keywords added by saves in flight, their ids are not known yet.
+        self.saving_added: set[str] = set()
+        self.saving = 0
+        self.autosave_job = None
+        self.parent.model.subscribe(self.model_changed)
         self.init_ui()
 
     def init_ui(self):
@@ -49,16 +63,11 @@ class FilterEditor(ctk.CTkFrame):
 
     def init_editor(self):
         """Initialize editor."""
-        self.editor = ctk.CTkTextbox(
-            self,
-            undo=True,
-            autoseparators=True,
-            maxundo=-1,
-        )
+        self.editor = KeywordView(self, on_change=self.keywords_changed)
         if platform.system() == "Darwin":
-            self.editor.bind("<Command-Key-s>", lambda event: self.save_filter())
+            self.parent.bind("<Command-Key-s>", lambda event: self.save_filter())
         else:
-            self.editor.bind("<Control-Key-s>", lambda event: self.save_filter())
+            self.parent.bind("<Control-Key-s>", lambda event: self.save_filter())
         self.editor.grid(row=1, column=0, columnspan=5, sticky="nsew", padx=5, pady=5)
 
     def init_buttons(self):
@@ -69,60 +78,205 @@ class FilterEditor(ctk.CTkFrame):
             command=self.save_filter,
         )
         self.button_save.grid(row=2, column=4, sticky="nsew", padx=5, pady=5)
+        self.button_import = ctk.CTkButton(
+            self,
+            text="Import...",
+            command=self.import_keywords,
+        )
+        self.button_import.grid(row=2, column=3, sticky="nsew", padx=5, pady=5)
 
-    def load_filter(self, cached_filters_path, title):
+    def load_filter(self, title):
         """Load filter."""
-        self.cached_filters_path = cached_filters_path
-        with open(cached_filters_path, "r", encoding="utf-8") as file:
-            filters = json.load(file)
-        for filter in filters:  # pylint: disable=redefined-builtin
-            if filter["title"] == title:
-                current_filter = filter
-                break
-        else:
+        current_filter = self.parent.model.get(title)
+        if current_filter is None:
             logger.error("Filter %s not found.", title)
             return
+        if self.has_pending() and title != self.current_title:
+            # Keep edits made to the previously shown filter.
+            self.save_filter(force=True)
         logger.debug("Loading filter %s.", title)
-        keywords_list = [kw["keyword"] for kw in current_filter.get("keywords", [])]
-        keywords = "\n".join(keywords_list)
-        self.editor.delete("1.0", tk.END)
-        self.editor.insert(tk.END, keywords)
-        self.editor.edit_reset()
-
-    def save_filter(self):
-        """Save filter."""
-        title = self.parent.filter_list.current_filter.get()
-        keywords = self.editor.get("1.0", tk.END)
-        keywords_list = keywords.split("\n")
-        keywords_list = [kw for kw in keywords_list if kw]
+        self.current_title = title
+        self.show_keywords(current_filter)
+
+    def show_keywords(self, current_filter):
+        """Show a filter's keywords and take them as the saved snapshot."""
+        keywords = current_filter.get("keywords", [])
+        self.keyword_ids = {kw["keyword"]: kw["id"] for kw in keywords}
+        self.pending_added = {}
+        self.pending_removed = {}
+        self.editor.set_keywords(KeywordSet(keywords))
+        self.update_save_button()
 
+    def clear(self):
+        """Clear editor."""
+        self.current_title = None
+        self.keyword_ids = {}
+        self.pending_added = {}
+        self.pending_removed = {}
+        self.editor.set_keywords([])
+        self.update_save_button()
+
+    def model_changed(self, change, title):
+        """Reload the shown filter if it changed and has no local edits."""
+        if title != self.current_title:
+            return
+        if change == REMOVED:
+            self.clear()
+        elif change == UPDATED and not self.has_pending() and not self.saving:
+            self.show_keywords(self.parent.model.get(title))
+
+    def has_pending(self) -> bool:
+        """Whether there are unsaved edits."""
+        return bool(self.pending_added or self.pending_removed)
+
+    def keywords_changed(self, added, removed):
+        """Record edits against the loaded snapshot."""
+        for keyword in added:
+            if keyword in self.pending_removed:
+                del self.pending_removed[keyword]
+            else:
+                self.pending_added[keyword] = added.whole_word(keyword)
+        for keyword in removed:
+            if keyword in self.pending_added:
+                del self.pending_added[keyword]
+            elif keyword in self.keyword_ids:
+                self.pending_removed[keyword] = self.keyword_ids[keyword]
+            elif keyword in self.saving_added:
+                self.pending_removed[keyword] = None
+        self.update_save_button()
+        self.schedule_autosave()
+
+    def import_keywords(self):
+        """
+        Add the keywords of a wordlist file, saved in batches like any
+        other edit.
+        """
+        if self.current_title is None:
+            return
+        path = filedialog.askopenfilename(parent=self, title="Import keywords")
+        if not path:
+            return
+        title = self.current_title
+        self.parent.worker.submit(
+            read_wordlist,
+            Path(path),
+            on_done=lambda keywords: self.keywords_imported(title, keywords),
+            on_error=self.parent.show_error,
+        )
+
+    def keywords_imported(self, title, keywords):
+        """Add imported keywords if their filter is still shown."""
+        if title == self.current_title:
+            self.editor.add(keywords)
+
+    def update_save_button(self):
+        """Show the number of unsaved edits on the Save button."""
+        if self.saving:
+            return
+        pending = len(self.pending_added) + len(self.pending_removed)
+        self.button_save.configure(text=f"Save ({pending})" if pending else "Save")
+
+    def schedule_autosave(self):
+        """Save once edits pause, or right away when a batch is full."""
+        if self.autosave_job is not None:
+            self.after_cancel(self.autosave_job)
+            self.autosave_job = None
+        if not self.has_pending():
+            return
+        if len(self.pending_added) + len(self.pending_removed) >= AUTOSAVE_BATCH:
+            self.save_filter()
+            return
+        self.autosave_job = self.after(AUTOSAVE_DELAY_MS, self.save_filter)
+
+    def save_filter(self, force=False):
+        """
+        Send unsaved edits to the server.
+        Unless forced, waits for the save in flight, which reschedules it.
+        """
+        self.autosave_job = None
+        if (self.saving and not force) or not self.has_pending():
+            return
+        filter_item = self.parent.model.get(self.current_title)
+        if filter_item is None:
+            return
+        added = self.pending_added
+        removed = {
+            keyword: keyword_id
+            for keyword, keyword_id in self.pending_removed.items()
+            if keyword_id is not None
+        }
+        keywords = KeywordSet(added.items()).to_keywords()
+        keywords += KeywordSet(removed).to_keywords(delete=True, ids=removed)
+        self.pending_added = {}
+        self.pending_removed = {
+            keyword: keyword_id
+            for keyword, keyword_id in self.pending_removed.items()
+            if keyword_id is None
+        }
+        self.saving_added.update(added)
+        self.saving += 1
         self.button_save.configure(text="Saving...", state="disabled")
-        self.editor.configure(state="disabled")
-        logger.debug("Saving filter %s in background.", title)
-        thread = threading.Thread(
-            target=self.save_filter_thread, args=(title, keywords_list)
+        logger.debug(
+            "Saving filter %s: %s added, %s removed.",
+            filter_item["title"],
+            len(added),
+            len(removed),
         )
-        thread.daemon = True
-        thread.start()
-
-    def save_filter_thread(self, title: str, keywords: list):
-        """Save filter in background."""
-
-        config = get_config()
-
-        logger.debug("Saving filter %s with %s keywords.", title, len(keywords))
-        try:
-            if not config.api_base_url or not config.access_token:
-                raise ValueError("Instance is not configured.")
-            filters = MastodonFilters(config)
-            filters.sync(title=title, keywords=keywords)
-            self.parent.filter_list.load_filters()
-            self.editor.configure(state="normal")
-            self.load_filter(self.cached_filters_path, title)
-        except Exception as err:  # pylint: disable=broad-except
-            error_message = extract_error_message(err)
-            messagebox.showerror("Error", error_message)
-            logger.error(error_message)
-        finally:
-            self.button_save.configure(text="Save", state="normal")
-            logger.debug("Done.")
+        status_bar = self.parent.status_bar
+        cancel = status_bar.start()
+        self.parent.worker.submit(
+            lambda: self.parent.client().update(
+                filter_item["id"],
+                keywords=keywords,
+                on_event=status_bar.report,
+                cancel=cancel,
+            ),
+            on_done=lambda response: self.filter_saved(added, response, cancel),
+            on_error=lambda err: self.filter_save_failed(
+                filter_item["id"], added, removed, err, cancel
+            ),
+        )
+
+    def filter_saved(self, added, filter_item, cancel):
+        """Update the model with the saved filter."""
+        self.parent.status_bar.done(cancel, f"Saved {filter_item['title']}.")
+        self.saving_added.difference_update(added)
+        if filter_item["title"] == self.current_title:
+            self.keyword_ids = {
+                kw["keyword"]: kw["id"] for kw in filter_item.get("keywords", [])
+            }
+            # Removals of keywords that were still being added.
+            for keyword, keyword_id in self.pending_removed.items():
+                if keyword_id is None and keyword in self.keyword_ids:
+                    self.pending_removed[keyword] = self.keyword_ids[keyword]
+        # Still counted as saving, so the view is not reloaded from the model.
+        self.parent.model.upsert(filter_item)
+        self.parent.save_cache()
+        self.saving -= 1
+        self.button_save.configure(state="normal")
+        self.update_save_button()
+        self.schedule_autosave()
+        logger.debug("Saved filter %s.", filter_item["title"])
+
+    def filter_save_failed(self, filter_id, added, removed, err, cancel):
+        """Put the edits back so that the next save retries them."""
+        cancelled = isinstance(err, OperationCancelled)
+        self.parent.status_bar.done(cancel, "Save cancelled." if cancelled else "")
+        self.saving -= 1
+        self.saving_added.difference_update(added)
+        self.button_save.configure(state="normal")
+        current_filter = self.parent.model.get(self.current_title)
+        if current_filter is not None and current_filter["id"] == filter_id:
+            for keyword in list(added):
+                # Added and removed again while the save was in flight.
+                if (
+                    keyword in self.pending_removed
+                    and not self.pending_removed[keyword]
+                ):
+                    del self.pending_removed[keyword]
+                    del added[keyword]
+            self.pending_added = {**added, **self.pending_added}
+            self.pending_removed = {**removed, **self.pending_removed}
+        self.update_save_button()
+        if not cancelled:
+            self.parent.show_error(err)
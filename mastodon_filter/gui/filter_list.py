@@ -2,18 +2,16 @@
 Mastodon FilterList.
 """
 # pylint: disable=attribute-defined-outside-init
-import json
-import threading
 import tkinter as tk
 from tkinter import messagebox
 
 import customtkinter as ctk
 from darkdetect import isDark
 
-from mastodon_filter.api import MastodonFilters
-from mastodon_filter.config import APP_DIR, get_config
+from mastodon_filter.cache import FILTERS_CACHE, read_filters_cache
+from mastodon_filter.config import get_config
+from mastodon_filter.gui.model import ADDED, REMOVED
 from mastodon_filter.logging import get_logger
-from mastodon_filter.errors import extract_error_message
 
 logger = get_logger(__name__)
 
@@ -25,8 +23,9 @@ class FilterList(ctk.CTkFrame):
         """Initialize Frame."""
         ctk.CTkFrame.__init__(self, parent, **kwargs)
         self.parent = parent
-        self.cached_filters_path = APP_DIR / "filters.json"
+        self.cached_filters_path = FILTERS_CACHE
         self.current_filter = tk.StringVar()
+        self.parent.model.subscribe(self.model_changed)
         self.init_ui()
         self.grid(row=0, column=0, sticky="nsew")
 
@@ -69,26 +68,44 @@ class FilterList(ctk.CTkFrame):
         self.load_filters()
 
     def load_filters(self):
-        """Load filters."""
+        """Show cached filters right away, then refresh them in background."""
+        if not self.parent.model.titles:
+            cached_filters = read_filters_cache(self.cached_filters_path)
+            if cached_filters:
+                self.parent.model.replace_all(cached_filters)
         config = get_config()
         if not config.api_base_url or not config.access_token:
             return
-        try:
-            filters = MastodonFilters(config)
-            filters.export(self.cached_filters_path)
-            self.update_filters()
-        except Exception as err:  # pylint: disable=broad-except
-            error_message = extract_error_message(err)
-            messagebox.showerror("Error", error_message)
-
-    def update_filters(self):
-        """Update filters."""
-        with open(self.cached_filters_path, "r", encoding="utf-8") as file:
-            filters = json.load(file)
-        self.filters.delete(0, tk.END)
-        filter_titles = sorted([filter["title"] for filter in filters])
-        for title in filter_titles:  # pylint: disable=redefined-builtin
-            self.filters.insert(tk.END, title)
+        self.parent.worker.submit(
+            lambda: self.parent.client().filters(),
+            on_done=self.filters_loaded,
+            on_error=self.parent.show_error,
+        )
+
+    def filters_loaded(self, filters):
+        """Apply filters fetched from the server."""
+        self.parent.model.replace_all(filters)
+        self.parent.save_cache()
+
+    def model_changed(self, change, title):
+        """Update only the row of the changed filter."""
+        if change == ADDED:
+            self.filters.insert(self.parent.model.index(title), title)
+        elif change == REMOVED:
+            self.filters.delete(self.parent.model.index(title))
+            if self.current_filter.get() == title:
+                self.current_filter.set("")
+
+    def select(self, title):
+        """Select filter by title and show it in the editor."""
+        self.filters.select_clear(0, tk.END)
+        if title not in self.parent.model:
+            return
+        index = self.parent.model.index(title)
+        self.filters.select_set(index)
+        self.filters.see(index)
+        self.current_filter.set(title)
+        self.parent.filter_editor.load_filter(title)
 
     def filter_selected(self, event):
         """Handle filter selection."""
@@ -98,7 +115,7 @@ class FilterList(ctk.CTkFrame):
             title = widget.get(selection[0])
             logger.debug("Filter selected: %s", title)
             self.current_filter.set(title)
-            self.parent.filter_editor.load_filter(self.cached_filters_path, title)
+            self.parent.filter_editor.load_filter(title)
         except IndexError:
             logger.debug("No filter selected")
 
@@ -112,36 +129,24 @@ class FilterList(ctk.CTkFrame):
         if not title:
             return
         self.current_filter.set(title)
-        thread = threading.Thread(
-            target=self.create_filter_thread,
-            args=(title,),
-        )
-        thread.start()
-
-    def create_filter_thread(self, title):
-        """Create filter thread."""
-        config = get_config()
-        if not config.api_base_url or not config.access_token:
-            return
-        print(f"Creating filter: {title}")
-        try:
-            filters = MastodonFilters(config)
-            filters.create(
+        logger.info("Creating filter: %s", title)
+        self.parent.worker.submit(
+            lambda: self.parent.client().create(
                 title=title,
                 context=["home", "public", "thread"],
                 action="warn",
                 keywords=["example-keyword"],
-            )
-            self.load_filters()
-            self.filters.select_clear(0, tk.END)
-            # get index of title
-            index = self.filters.get(0, tk.END).index(title)
-            self.filters.select_set(index)
-            self.parent.filter_editor.load_filter(self.cached_filters_path, title)
-            print(f"Created filter: {title}")
-        except Exception as err:  # pylint: disable=broad-except
-            error_message = extract_error_message(err)
-            messagebox.showerror("Error", error_message)
+            ),
+            on_done=self.filter_created,
+            on_error=self.parent.show_error,
+        )
+
+    def filter_created(self, filter_item):
+        """Add the created filter and select it."""
+        logger.info("Created filter: %s", filter_item["title"])
+        self.parent.model.upsert(filter_item)
+        self.parent.save_cache()
+        self.select(filter_item["title"])
 
     def delete_filter(self):
         """Delete filter."""
@@ -154,34 +159,29 @@ class FilterList(ctk.CTkFrame):
         ):
             return
         title = self.current_filter.get()
-        if not title:
+        filter_item = self.parent.model.get(title)
+        if not filter_item:
             return
         self.button_delete.configure(state="disabled")
         self.filters.configure(state="disabled")
         logger.info("Starting background task to delete filter: %s ", title)
-        thread = threading.Thread(
-            target=self.delete_filter_thread,
-            args=(title,),
+        self.parent.worker.submit(
+            lambda: self.parent.client().delete_by_id(filter_item["id"]),
+            on_done=lambda _: self.filter_deleted(title),
+            on_error=self.filter_delete_failed,
         )
-        thread.start()
 
-    def delete_filter_thread(self, title):
-        """Delete filter thread."""
-        config = get_config()
-        if not config.api_base_url or not config.access_token:
-            return
-        logger.info("Deleting filter: %s", title)
-        try:
-            filters = MastodonFilters(config)
-            filters.delete(title)
-            self.filters.configure(state="normal")
-            self.load_filters()
-            self.parent.filter_editor.editor.delete("1.0", tk.END)
-            self.parent.filter_editor.editor.edit_reset()
-            logger.info("Deleted filter: %s", title)
-        except Exception as err:  # pylint: disable=broad-except
-            error_message = extract_error_message(err)
-            messagebox.showerror("Error", error_message)
-        finally:
-            # enable delete button and filters listbox
-            self.button_delete.configure(state="normal")
+    def filter_deleted(self, title):
+        """Remove the deleted filter."""
+        self.filters.configure(state="normal")
+        self.button_delete.configure(state="normal")
+        self.parent.model.remove(title)
+        self.parent.save_cache()
+        self.parent.filter_editor.clear()
+        logger.info("Deleted filter: %s", title)
+
+    def filter_delete_failed(self, err):
+        """Re-enable the list after a failed delete."""
+        self.filters.configure(state="normal")
+        self.button_delete.configure(state="normal")
+        self.parent.show_error(err)
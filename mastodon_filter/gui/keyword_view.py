@@ -0,0 +1,332 @@
+"""
+Mastodon KeywordView.
+"""
+# pylint: disable=attribute-defined-outside-init
+import io
+import platform
+import tkinter as tk
+from typing import Callable, Iterable, Optional, Union
+
+import customtkinter as ctk
+from darkdetect import isDark
+
+from mastodon_filter.logging import get_logger
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.wordlist import load_wordlist
+
+logger = get_logger(__name__)
+
+ROW_HEIGHT = 22
+SEARCH_DELAY_MS = 100
+
+
+class KeywordView(ctk.CTkFrame):
+    """
+    Virtualized keyword list.
+
+    Only the rows that fit in the canvas exist as canvas items; scrolling
+    re-labels them. Search runs over an in-memory index of case-folded
+    keywords, so large filters stay responsive.
+    """
+
+    def __init__(
+        self,
+        parent,
+        on_change: Optional[Callable[[KeywordSet, list[str]], None]] = None,
+        **kwargs,
+    ):
+        """Initialize Frame."""
+        ctk.CTkFrame.__init__(self, parent, **kwargs)
+        self.on_change = on_change
+        # keyword -> case-folded keyword, in insertion order.
+        self.index: dict[str, str] = {}
+        # Keywords matching the current query, in display order.
+        self.rows: list[str] = []
+        self.query = ""
+        self.selected: set[str] = set()
+        self.anchor: Optional[int] = None
+        self.top = 0
+        self.pool: list[tuple[int, int]] = []
+        self.search_job = None
+        self.init_ui()
+
+    def init_ui(self):
+        """Initialize UI."""
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.search_text = tk.StringVar()
+        self.search_text.trace_add("write", lambda *_: self.schedule_search())
+        self.search = ctk.CTkEntry(
+            self, textvariable=self.search_text, placeholder_text="Search"
+        )
+        self.search.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+
+        dark = isDark()
+        self.colors = {
+            "bg": "#2f2f2f" if dark else "#dadada",
+            "fg": "#dce4ee" if dark else "#1a1a1a",
+            "selected": "#1f6aa5",
+        }
+        self.canvas = tk.Canvas(
+            self, bd=0, highlightthickness=0, bg=self.colors["bg"], takefocus=1
+        )
+        self.canvas.grid(row=1, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self.canvas.bind("<Configure>", lambda event: self.render())
+        self.canvas.bind("<Button-1>", self.clicked)
+        self.canvas.bind("<Shift-Button-1>", self.shift_clicked)
+        if platform.system() == "Darwin":
+            self.canvas.bind("<Command-Button-1>", self.toggle_clicked)
+        else:
+            self.canvas.bind("<Control-Button-1>", self.toggle_clicked)
+        self.canvas.bind("<MouseWheel>", self.wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+        self.canvas.bind("<Up>", lambda event: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Down>", lambda event: self.yview("scroll", 1, "units"))
+        self.canvas.bind("<Prior>", lambda event: self.yview("scroll", -1, "pages"))
+        self.canvas.bind("<Next>", lambda event: self.yview("scroll", 1, "pages"))
+        self.canvas.bind("<Delete>", lambda event: self.remove_selected())
+        self.canvas.bind("<BackSpace>", lambda event: self.remove_selected())
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 5), pady=5)
+
+        self.actions = ctk.CTkFrame(self, fg_color="transparent")
+        self.actions.grid(row=2, column=0, columnspan=2, sticky="ew")
+        self.actions.grid_columnconfigure(0, weight=1)
+        self.new_keyword = ctk.CTkEntry(self.actions, placeholder_text="New keyword")
+        self.new_keyword.bind("<Return>", lambda event: self.add_entered())
+        self.new_keyword.bind("<<Paste>>", self.paste)
+        self.new_keyword.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+        self.button_add = ctk.CTkButton(
+            self.actions, text="Add", width=70, command=self.add_entered
+        )
+        self.button_add.grid(row=0, column=1, padx=5, pady=5)
+        self.button_remove = ctk.CTkButton(
+            self.actions,
+            text="Remove",
+            width=70,
+            command=self.remove_selected,
+            fg_color="#ff8888",
+        )
+        self.button_remove.grid(row=0, column=2, padx=5, pady=5)
+        self.status = ctk.CTkLabel(self.actions, text="")
+        self.status.grid(row=1, column=0, columnspan=3, sticky="w", padx=5)
+
+    def set_keywords(self, keywords: Iterable[str]):
+        """Replace all keywords."""
+        self.index = {keyword: keyword.casefold() for keyword in keywords}
+        self.query = ""
+        self.selected.clear()
+        self.anchor = None
+        self.top = 0
+        self.apply_search(self.search_text.get())
+
+    @property
+    def keywords(self) -> list[str]:
+        """All keywords, in order."""
+        return list(self.index)
+
+    # Search
+
+    def schedule_search(self):
+        """Search once typing pauses."""
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(
+            SEARCH_DELAY_MS, lambda: self.apply_search(self.search_text.get())
+        )
+
+    def apply_search(self, query: str):
+        """Show keywords containing query."""
+        self.search_job = None
+        query = query.strip().casefold()
+        if not query:
+            self.rows = list(self.index)
+        elif self.query and self.query in query:
+            # Narrowing the previous query: only previous matches can match.
+            self.rows = [kw for kw in self.rows if query in self.index[kw]]
+        else:
+            self.rows = [kw for kw, folded in self.index.items() if query in folded]
+        self.query = query
+        self.top = 0
+        self.render()
+
+    def matches(self, keyword: str) -> bool:
+        """Whether keyword matches the current query."""
+        return not self.query or self.query in self.index[keyword]
+
+    # Add / remove
+
+    def add_entered(self):
+        """Add the keyword typed in the entry."""
+        keyword = self.new_keyword.get().strip()
+        if not keyword:
+            return
+        self.new_keyword.delete(0, tk.END)
+        self.add([keyword])
+        if keyword in self.rows:
+            self.selected = {keyword}
+            self.see(self.rows.index(keyword))
+
+    def paste(self, event=None):
+        """
+        Add every line of a multi-line paste as a keyword, compact
+        wordlists included. A single line is pasted in the entry.
+        """
+        try:
+            text = self.clipboard_get()
+        except tk.TclError:
+            return None
+        if "\n" not in text.strip():
+            return None
+        self.add(load_wordlist(io.StringIO(text)))
+        return "break"
+
+    def add(self, keywords: Union[Iterable[str], KeywordSet]):
+        """Add keywords, with their whole_word flag if given."""
+        added = KeywordSet(
+            item for item in KeywordSet(keywords).items() if item[0] not in self.index
+        )
+        for keyword in added:
+            self.index[keyword] = keyword.casefold()
+            if self.matches(keyword):
+                self.rows.append(keyword)
+        if added:
+            self.changed(added, [])
+
+    def remove_selected(self):
+        """Remove selected keywords."""
+        self.remove(list(self.selected))
+
+    def remove(self, keywords: Iterable[str]):
+        """Remove keywords."""
+        removed = [keyword for keyword in keywords if keyword in self.index]
+        if not removed:
+            return
+        for keyword in removed:
+            del self.index[keyword]
+        gone = set(removed)
+        self.rows = [kw for kw in self.rows if kw not in gone]
+        self.selected -= gone
+        self.anchor = None
+        self.changed(KeywordSet(), removed)
+
+    def changed(self, added: KeywordSet, removed: list[str]):
+        """Record an edit and notify the listener."""
+        self.render()
+        if self.on_change:
+            self.on_change(added, removed)
+
+    # Selection
+
+    def row_at(self, event) -> Optional[int]:
+        """Row index under the pointer."""
+        row = self.top + event.y // ROW_HEIGHT
+        if row >= len(self.rows):
+            return None
+        return row
+
+    def clicked(self, event):
+        """Select one row."""
+        self.canvas.focus_set()
+        row = self.row_at(event)
+        self.selected = {self.rows[row]} if row is not None else set()
+        self.anchor = row
+        self.render()
+
+    def shift_clicked(self, event):
+        """Select a range of rows."""
+        row = self.row_at(event)
+        if row is None:
+            return
+        if self.anchor is None:
+            self.anchor = row
+        first, last = sorted((self.anchor, row))
+        self.selected = set(self.rows[first : last + 1])
+        self.render()
+
+    def toggle_clicked(self, event):
+        """Add or remove one row from the selection."""
+        row = self.row_at(event)
+        if row is None:
+            return
+        self.selected ^= {self.rows[row]}
+        self.anchor = row
+        self.render()
+
+    # Scrolling and rendering
+
+    def page_size(self) -> int:
+        """Number of rows that fit in the canvas."""
+        return max(1, self.canvas.winfo_height() // ROW_HEIGHT)
+
+    def see(self, row: int):
+        """Scroll row into view."""
+        page = self.page_size()
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + page:
+            self.top = row - page + 1
+        self.render()
+
+    def wheel(self, event):
+        """Scroll with the mouse wheel."""
+        if platform.system() == "Darwin":
+            steps = -event.delta
+        else:
+            steps = -event.delta // 120 * 3
+        self.yview("scroll", steps, "units")
+
+    def yview(self, *args):
+        """Scrollbar protocol: report or change the visible fraction."""
+        total = len(self.rows)
+        page = self.page_size()
+        if args:
+            if args[0] == "moveto":
+                self.top = int(float(args[1]) * total)
+            elif args[0] == "scroll":
+                amount = int(float(args[1]))
+                self.top += amount * (page if args[2] == "pages" else 1)
+            self.render()
+            return None
+        if not total:
+            return 0.0, 1.0
+        return self.top / total, min(1.0, (self.top + page) / total)
+
+    def render(self):
+        """Draw the visible rows."""
+        page = self.page_size()
+        self.top = max(0, min(self.top, len(self.rows) - page))
+        width = self.canvas.winfo_width()
+        while len(self.pool) < page + 1:
+            y = len(self.pool) * ROW_HEIGHT
+            rect = self.canvas.create_rectangle(
+                0, y, width, y + ROW_HEIGHT, fill=self.colors["selected"], width=0
+            )
+            text = self.canvas.create_text(
+                8, y + ROW_HEIGHT // 2, anchor="w", fill=self.colors["fg"]
+            )
+            self.pool.append((rect, text))
+        for offset, (rect, text) in enumerate(self.pool):
+            row = self.top + offset
+            if offset > page or row >= len(self.rows):
+                self.canvas.itemconfigure(text, state="hidden")
+                self.canvas.itemconfigure(rect, state="hidden")
+                continue
+            keyword = self.rows[row]
+            self.canvas.itemconfigure(text, text=keyword, state="normal")
+            self.canvas.itemconfigure(
+                rect, state="normal" if keyword in self.selected else "hidden"
+            )
+            self.canvas.coords(
+                rect, 0, offset * ROW_HEIGHT, width, (offset + 1) * ROW_HEIGHT
+            )
+        self.scrollbar.set(*self.yview())
+        if self.query:
+            self.status.configure(
+                text=f"{len(self.rows)} of {len(self.index)} keywords"
+            )
+        else:
+            self.status.configure(text=f"{len(self.index)} keywords")
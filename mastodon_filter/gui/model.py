@@ -0,0 +1,96 @@
+"""
+In-memory filters model for the GUI.
+"""
+from bisect import bisect_left
+from typing import Callable, Optional
+
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+
+
+class FilterModel:
+    """
+    Filters indexed by title, with listeners notified per changed title.
+
+    Listeners are called as `listener(change, title)` where change is one of
+    ADDED, UPDATED or REMOVED, so views can update only the affected rows.
+    """
+
+    def __init__(self) -> None:
+        self.filters: dict[str, dict] = {}
+        self.titles: list[str] = []
+        self.ids: dict[str, str] = {}
+        self.listeners: list[Callable[[str, str], None]] = []
+
+    def subscribe(self, listener: Callable[[str, str], None]) -> None:
+        """
+        Register a change listener.
+        """
+        self.listeners.append(listener)
+
+    def _notify(self, change: str, title: str) -> None:
+        for listener in self.listeners:
+            listener(change, title)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.filters
+
+    def get(self, title: str) -> Optional[dict]:
+        """
+        Get filter by title.
+        """
+        return self.filters.get(title)
+
+    def index(self, title: str) -> int:
+        """
+        Position of title in the sorted titles.
+        """
+        return bisect_left(self.titles, title)
+
+    def snapshot(self) -> list[dict]:
+        """
+        Filters as a list, as returned by the API.
+        """
+        return list(self.filters.values())
+
+    def upsert(self, filter_item: dict) -> None:
+        """
+        Add or replace one filter.
+        """
+        title = filter_item["title"]
+        old_title = self.ids.get(filter_item["id"])
+        if old_title is not None and old_title != title:
+            # Renamed on the server.
+            self.remove(old_title)
+        self.ids[filter_item["id"]] = title
+        if title in self.filters:
+            if self.filters[title] == filter_item:
+                return
+            self.filters[title] = filter_item
+            self._notify(UPDATED, title)
+            return
+        self.filters[title] = filter_item
+        self.titles.insert(self.index(title), title)
+        self._notify(ADDED, title)
+
+    def remove(self, title: str) -> None:
+        """
+        Remove one filter.
+        """
+        if title not in self.filters:
+            return
+        filter_item = self.filters.pop(title)
+        self.ids.pop(filter_item["id"], None)
+        del self.titles[self.index(title)]
+        self._notify(REMOVED, title)
+
+    def replace_all(self, filters: list[dict]) -> None:
+        """
+        Replace every filter, notifying only titles that changed.
+        """
+        incoming = {filter_item["title"]: filter_item for filter_item in filters}
+        for title in [title for title in self.titles if title not in incoming]:
+            self.remove(title)
+        for filter_item in incoming.values():
+            self.upsert(filter_item)
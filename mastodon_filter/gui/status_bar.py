@@ -0,0 +1,63 @@
+"""
+Mastodon StatusBar.
+"""
+# pylint: disable=attribute-defined-outside-init
+import customtkinter as ctk
+
+from mastodon_filter.progress import DONE, CancelToken, OperationEvent, describe
+
+
+class StatusBar(ctk.CTkFrame):
+    """Progress of background operations, with a Cancel button."""
+
+    def __init__(self, parent, **kwargs):
+        """Initialize Frame."""
+        ctk.CTkFrame.__init__(self, parent, **kwargs)
+        self.parent = parent
+        self.tokens: set[CancelToken] = set()
+        self.init_ui()
+
+    def init_ui(self):
+        """Initialize UI."""
+        self.grid_columnconfigure(0, weight=1)
+        self.label = ctk.CTkLabel(self, text="", anchor="w")
+        self.label.grid(row=0, column=0, sticky="ew", padx=10)
+        self.progress = ctk.CTkProgressBar(self, width=160)
+        self.progress.set(0)
+        self.progress.grid(row=0, column=1, padx=5, pady=5)
+        self.button_cancel = ctk.CTkButton(
+            self, text="Cancel", width=70, command=self.cancel, state="disabled"
+        )
+        self.button_cancel.grid(row=0, column=2, padx=5, pady=5)
+
+    def start(self) -> CancelToken:
+        """Track a new operation, returning its cancellation token."""
+        token = CancelToken()
+        self.tokens.add(token)
+        self.button_cancel.configure(state="normal")
+        return token
+
+    def done(self, token: CancelToken, message: str = ""):
+        """Stop tracking an operation."""
+        self.tokens.discard(token)
+        if not self.tokens:
+            self.button_cancel.configure(state="disabled")
+            self.progress.set(0)
+        self.label.configure(text=message)
+
+    def cancel(self):
+        """Cancel all tracked operations."""
+        for token in self.tokens:
+            token.cancel()
+        self.label.configure(text="Cancelling...")
+
+    def report(self, event: OperationEvent):
+        """Show an event. Safe to call from the worker thread."""
+        self.parent.worker.call_soon(self.show_event, event)
+
+    def show_event(self, event: OperationEvent):
+        """Show an event."""
+        if event.phase == DONE:
+            return
+        self.label.configure(text=describe(event))
+        self.progress.set(event.done / event.total if event.total else 0)
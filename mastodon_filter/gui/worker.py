@@ -0,0 +1,90 @@
+"""
+Background worker for the GUI.
+"""
+import queue
+import threading
+from typing import Callable, Optional
+
+from mastodon_filter.logging import get_logger
+
+logger = get_logger(__name__)
+
+POLL_INTERVAL_MS = 50
+
+
+class Worker:
+    """
+    Runs jobs one at a time on a single background thread.
+
+    Tk widgets must only be touched from the main thread, so results are
+    queued and handed to their callbacks by `poll()`, which reschedules
+    itself on the Tk event loop with `after()`.
+    """
+
+    def __init__(self, root) -> None:
+        self.root = root
+        self.jobs: queue.Queue = queue.Queue()
+        self.results: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def submit(
+        self,
+        func: Callable,
+        *args,
+        on_done: Optional[Callable] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Queue `func(*args, **kwargs)`.
+        `on_done(result)` or `on_error(error)` is called on the main thread.
+        """
+        self.jobs.put((func, args, kwargs, on_done, on_error))
+
+    def call_soon(self, callback: Callable, value=None) -> None:
+        """
+        Call `callback(value)` on the main thread. Safe from any thread.
+        """
+        self.results.put((callback, value))
+
+    def run(self) -> None:
+        """
+        Worker thread loop.
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            func, args, kwargs, on_done, on_error = job
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error("Background job %s failed: %s", func.__name__, err)
+                if on_error:
+                    self.results.put((on_error, err))
+                continue
+            if on_done:
+                self.results.put((on_done, result))
+
+    def poll(self) -> None:
+        """
+        Deliver finished jobs' results on the main thread.
+        """
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(value)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error("Callback %s failed: %s", callback.__name__, err)
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def stop(self) -> None:
+        """
+        Stop the worker thread once queued jobs are done.
+        """
+        self.jobs.put(None)
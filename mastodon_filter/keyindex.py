@@ -0,0 +1,308 @@
+"""
+Sorted binary keyword index, memory-mapped for membership queries.
+
+Checking a term against a large wordlist would otherwise mean reading
+and splitting the whole file. The index is built once per wordlist and
+per template, in APP_DIR like compiled wordlists, named after the
+wordlist's path: wordlist directories may be read-only, and are often
+git checkouts where index files would show up as untracked. It is
+memory-mapped and searched in place, so a lookup reads a few pages
+instead of the file.
+
+Layout, little-endian:
+
+    header      magic, version, manifest length, keyword count, digest
+    manifest    JSON, files the keywords were read from: [mtime_ns, size]
+    offsets     count + 1 offsets of records, u64
+    records     per keyword: whole_word byte, key in UTF-8, sorted by key
+
+Keys are casefolded with whitespace normalized, as Mastodon matches
+keywords case-insensitively. An index is used while the files in its
+manifest are unchanged. Otherwise it is rebuilt, unless the content
+digest shows the wordlist only got a new modification time.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from mastodon_filter.config import APP_DIR
+from mastodon_filter.wordlist import (
+    compile_file,
+    is_wordlist_language,
+    keywords_digest,
+    manifest_changed,
+)
+
+KEYWORD_INDEX_DIR = APP_DIR / "keyword-index"
+INDEX_SUFFIX = ".idx"
+MAGIC = b"MFKWIDX\0"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<8sIIQ32s")
+OFFSET = struct.Struct("<Q")
+
+
+def index_key(keyword: str) -> str:
+    """
+    Form of a keyword or term compared in the index.
+    """
+    return " ".join(keyword.split()).casefold()
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class KeywordIndex:
+    """
+    Read-only view of an index file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self) -> None:
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"Not a keyword index: {self.path}")
+        magic, version, manifest_length, count, digest = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Not a keyword index: {self.path}")
+        self.digest = digest.hex()
+        self.count = count
+        self._offsets = HEADER.size + manifest_length
+        self._records = self._offsets + OFFSET.size * (count + 1)
+        if self._records > len(self._map):
+            raise ValueError(f"Truncated keyword index: {self.path}")
+        end = self._records + self._offset(count)
+        if end != len(self._map):
+            raise ValueError(f"Truncated keyword index: {self.path}")
+        try:
+            self.manifest = json.loads(self._map[HEADER.size : self._offsets])
+        except ValueError as error:
+            raise ValueError(f"Corrupt keyword index: {self.path}") from error
+
+    def close(self) -> None:
+        """
+        Unmap the index.
+        """
+        self._map.close()
+
+    def __enter__(self) -> "KeywordIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _offset(self, position: int) -> int:
+        return OFFSET.unpack_from(self._map, self._offsets + OFFSET.size * position)[0]
+
+    def _record(self, position: int) -> bytes:
+        start = self._records + self._offset(position)
+        return self._map[start : self._records + self._offset(position + 1)]
+
+    def _key(self, position: int) -> bytes:
+        return self._record(position)[1:]
+
+    def _lower_bound(self, key: bytes, low: int, high: int) -> int:
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, key: bytes) -> Optional[int]:
+        position = self._lower_bound(key, 0, self.count)
+        if position < self.count and self._key(position) == key:
+            return position
+        return None
+
+    def lookup(self, keyword: str) -> Optional[bool]:
+        """
+        whole_word flag of a keyword in the index, None if it is not.
+        """
+        position = self._find(index_key(keyword).encode("utf-8"))
+        if position is None:
+            return None
+        return bool(self._record(position)[0])
+
+    def __contains__(self, keyword: object) -> bool:
+        return isinstance(keyword, str) and self.lookup(keyword) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self.count):
+            yield self._key(position).decode("utf-8")
+
+    def matches(self, term: str) -> list[str]:
+        """
+        Keywords that would match text containing the term: keywords
+        found in it at word boundaries, or anywhere if not whole_word.
+        """
+        term = index_key(term)
+        found = []
+        for start in range(len(term)):
+            # Keys starting with term[start:end], narrowed as end grows,
+            # until no key does. UTF-8 never contains 0xff.
+            low, high = 0, self.count
+            for end in range(start + 1, len(term) + 1):
+                prefix = term[start:end].encode("utf-8")
+                low = self._lower_bound(prefix, low, high)
+                high = self._lower_bound(prefix + b"\xff", low, high)
+                if low == high:
+                    break
+                if self._key(low) != prefix:
+                    continue
+                whole_word = bool(self._record(low)[0])
+                if whole_word and (
+                    (start > 0 and _is_word_char(term[start - 1]))
+                    or (end < len(term) and _is_word_char(term[end]))
+                ):
+                    continue
+                found.append(term[start:end])
+        return found
+
+
+def write_index(
+    path: Path,
+    keywords: Iterable[tuple[str, bool]],
+    digest: str,
+    manifest: dict[str, list[int]],
+) -> None:
+    """
+    Write the index of keywords with their whole_word flag, replacing
+    any previous one at once.
+    """
+    entries: dict[bytes, bool] = {}
+    for keyword, whole_word in keywords:
+        key = index_key(keyword).encode("utf-8")
+        if not key:
+            continue
+        # Of keywords equal but for case, the one matching more wins.
+        entries[key] = entries.get(key, True) and whole_word
+    manifest_data = json.dumps(manifest).encode("utf-8")
+    header = HEADER.pack(
+        MAGIC, INDEX_VERSION, len(manifest_data), len(entries), bytes.fromhex(digest)
+    )
+    keys = sorted(entries)
+    offsets = [0]
+    offsets.extend(accumulate(len(key) + 1 for key in keys))
+    flags = {True: b"\1", False: b"\0"}
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("wb") as file:
+        file.write(header)
+        file.write(manifest_data)
+        file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        file.write(b"".join(flags[entries[key]] + key for key in keys))
+    os.replace(temp_path, path)
+
+
+def _reuse_index(index: KeywordIndex, path: Path, manifest: dict) -> None:
+    """
+    Write an index again with a new manifest and the same keywords.
+    """
+    manifest_data = json.dumps(manifest).encode("utf-8")
+    header = HEADER.pack(
+        MAGIC,
+        INDEX_VERSION,
+        len(manifest_data),
+        index.count,
+        bytes.fromhex(index.digest),
+    )
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("wb") as file:
+        file.write(header)
+        file.write(manifest_data)
+        file.write(index._map[index._offsets :])  # pylint: disable=protected-access
+    os.replace(temp_path, path)
+
+
+def index_path(source: Path, index_dir: Path = KEYWORD_INDEX_DIR) -> Path:
+    """
+    Cache file of a wordlist's index, named after its resolved path.
+    """
+    name = hashlib.sha256(str(Path(source).resolve()).encode("utf-8")).hexdigest()
+    return index_dir / f"{name[:32]}{INDEX_SUFFIX}"
+
+
+def _open(path: Path) -> Optional[KeywordIndex]:
+    try:
+        return KeywordIndex(path)
+    except (OSError, ValueError):
+        return None
+
+
+def open_wordlist_index(
+    source: Path, index_dir: Path = KEYWORD_INDEX_DIR
+) -> KeywordIndex:
+    """
+    Index of a wordlist file, built or refreshed if the wordlist changed.
+    """
+    source = Path(source).resolve()
+    path = index_path(source, index_dir)
+    index = _open(path)
+    if index is not None and str(source) not in index.manifest:
+        # Another wordlist with the same name hash.
+        index.close()
+        index = None
+    if index is not None and not manifest_changed(index.manifest):
+        return index
+    stat = source.stat()
+    data = source.read_bytes()
+    text = data.decode("utf-8")
+    index_dir.mkdir(parents=True, exist_ok=True)
+    if is_wordlist_language(text):
+        compiled, manifest = compile_file(source)
+        digest = keywords_digest(compiled)
+        keywords = compiled.items()
+    else:
+        manifest = {str(source): [stat.st_mtime_ns, stat.st_size]}
+        digest = hashlib.sha256(data).hexdigest()
+        if index is not None and index.digest == digest:
+            # Touched but not changed, the keywords are still right.
+            _reuse_index(index, path, manifest)
+            index.close()
+            return KeywordIndex(path)
+        keywords = ((line, True) for line in text.splitlines())
+    if index is not None:
+        index.close()
+    write_index(path, keywords, digest, manifest)
+    return KeywordIndex(path)
+
+
+def open_template_index(
+    name: str, registry=None, index_dir: Path = KEYWORD_INDEX_DIR
+) -> KeywordIndex:
+    """
+    Index of a template with its includes, built again when the template
+    or one of its includes changed.
+    """
+    if registry is None:
+        # pylint: disable=import-outside-toplevel
+        from mastodon_filter.templates import get_registry
+
+        registry = get_registry()
+    digest = registry.key(name)
+    path = index_dir / f"template-{name}{INDEX_SUFFIX}"
+    index = _open(path)
+    if index is not None:
+        if index.digest == digest:
+            return index
+        index.close()
+    index_dir.mkdir(parents=True, exist_ok=True)
+    write_index(path, registry.keywords(name).items(), digest, {})
+    return KeywordIndex(path)
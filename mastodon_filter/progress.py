@@ -0,0 +1,161 @@
+"""
+Progress events and cancellation for long-running operations.
+
+Operations report an `OperationEvent` whenever they enter a phase or
+finish a step, and check a `CancelToken` between requests. A cancelled
+operation undoes what it already applied before raising
+`OperationCancelled`, so a filter is never left half-updated.
+"""
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+# Phases, in the order operations go through them.
+FETCH = "fetch"
+DIFF = "diff"
+APPLY = "apply"
+WRITE = "write"
+ROLLBACK = "rollback"
+DONE = "done"
+
+
+class OperationCancelled(Exception):
+    """
+    Raised by an operation that stopped because it was cancelled.
+    """
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Ask the operation to stop at the next check.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Whether cancellation was requested.
+        """
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Raise OperationCancelled if cancellation was requested.
+        """
+        if self._event.is_set():
+            raise OperationCancelled("Operation cancelled.")
+
+
+@dataclass
+class OperationEvent:
+    """
+    Progress of one phase of an operation.
+    """
+
+    operation: str
+    phase: str
+    done: int = 0
+    total: Optional[int] = None
+    bytes: int = 0
+    elapsed: float = 0.0
+    eta: Optional[float] = None
+    title: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        """
+        Event as a JSON-serializable dict.
+        """
+        return asdict(self)
+
+
+class Progress:
+    """
+    Tracks an operation, reporting events to a callback.
+    Without callback or token, every method is a cheap no-op.
+    """
+
+    def __init__(
+        self,
+        operation: str,
+        on_event: Optional[Callable[[OperationEvent], None]] = None,
+        cancel: Optional[CancelToken] = None,
+        title: Optional[str] = None,
+    ) -> None:
+        self.on_event = on_event
+        self.cancel = cancel
+        self.event = OperationEvent(operation, FETCH, title=title)
+        self.started = time.monotonic()
+        self.phase_started = self.started
+
+    def _emit(self) -> None:
+        if self.on_event is None:
+            return
+        now = time.monotonic()
+        event = self.event
+        event.elapsed = now - self.started
+        event.eta = None
+        if event.total and event.done:
+            rate = event.done / max(now - self.phase_started, 1e-9)
+            event.eta = (event.total - event.done) / rate
+        self.on_event(OperationEvent(**asdict(event)))
+
+    def phase(self, name: str, total: Optional[int] = None) -> None:
+        """
+        Enter a phase of `total` steps.
+        """
+        self.event.phase = name
+        self.event.done = 0
+        self.event.total = total
+        self.phase_started = time.monotonic()
+        self._emit()
+
+    def advance(self, steps: int = 1) -> None:
+        """
+        Record finished steps of the current phase.
+        """
+        self.event.done += steps
+        self._emit()
+
+    def add_bytes(self, count: int) -> None:
+        """
+        Record bytes transferred.
+        """
+        self.event.bytes += count
+
+    def check(self) -> None:
+        """
+        Raise OperationCancelled if the operation was cancelled.
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def finish(self) -> None:
+        """
+        Report the operation as done.
+        """
+        self.phase(DONE)
+
+
+def describe(event: OperationEvent) -> str:
+    """
+    One-line summary of an event.
+    """
+    parts = [event.title or event.operation, event.phase]
+    if event.total:
+        parts.append(f"{event.done}/{event.total}")
+    if event.done and event.elapsed:
+        parts.append(f"{event.done / event.elapsed:.0f}/s")
+    if event.bytes:
+        parts.append(f"{event.bytes / 1024:.0f} KiB")
+    if event.eta is not None:
+        parts.append(f"ETA {event.eta:.0f}s")
+    return " ".join(parts)
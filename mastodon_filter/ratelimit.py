@@ -0,0 +1,194 @@
+"""
+Request budget shared by every process on this machine.
+
+Mastodon limits requests per account, 300 per five minutes by default,
+and reports what is left in `X-RateLimit-*` response headers. Each
+account gets a token bucket in APP_DIR, locked with fcntl while it is
+read and updated, so concurrent processes draw from one allowance
+instead of each assuming the whole of it.
+
+Before sending, a client takes a token, waiting while there is none.
+Responses correct the bucket: it never holds more tokens than the
+server reports remaining, and it stays empty until the reset time once
+the server reports none. Until an instance has sent rate limit headers,
+requests are not held back.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, limited to this process.
+    fcntl = None
+
+from mastodon_filter.config import APP_DIR, Config
+from mastodon_filter.logging import get_logger
+
+logger = get_logger(__name__)
+
+RATE_LIMIT_FILE = APP_DIR / "ratelimit.json"
+# Mastodon's default limit and window, the window is learnt from the
+# time left until resets as the server does not report it.
+RATE_LIMIT = 300
+RATE_LIMIT_WINDOW = 300.0
+# Wait after a 429 response without a usable reset time.
+RATE_LIMITED_BACKOFF = 60.0
+
+# Reset times may be rounded down to the second.
+RESET_MARGIN = 1.0
+
+_process_lock = threading.Lock()
+
+
+def account_key(config: Config) -> str:
+    """
+    Bucket name of an account, without revealing its token.
+    """
+    account = f"{config.api_base_url}\n{config.access_token}"
+    return hashlib.sha256(account.encode("utf-8")).hexdigest()[:16]
+
+
+def _reset_in(headers: Mapping[str, str]) -> Optional[float]:
+    reset = headers.get("X-RateLimit-Reset")
+    if not reset:
+        return None
+    try:
+        reset_at = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return (reset_at - datetime.now(timezone.utc)).total_seconds()
+
+
+class RateLimiter:
+    """
+    Token bucket of one account, shared through a locked file.
+    """
+
+    def __init__(self, key: str, path: Path = RATE_LIMIT_FILE) -> None:
+        self.key = key
+        self.path = path
+
+    @classmethod
+    def for_config(cls, config: Config) -> "RateLimiter":
+        """
+        Bucket of the configured account.
+        """
+        return cls(account_key(config))
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        """
+        Bucket state, written back on exit, with the file locked throughout.
+        """
+        with _process_lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), "r+", encoding="utf-8") as file:
+                    try:
+                        buckets = json.load(file)
+                    except ValueError:
+                        buckets = {}
+                    if not isinstance(buckets, dict):
+                        buckets = {}
+                    state = buckets.setdefault(self.key, {})
+                    yield state
+                    file.seek(0)
+                    file.truncate()
+                    json.dump(buckets, file)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _rate(state: dict) -> float:
+        return state["limit"] / state["window"]
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = now - state["updated"]
+        if elapsed <= 0:
+            return
+        rate = self._rate(state)
+        state["tokens"] = min(state["limit"], state["tokens"] + elapsed * rate)
+        state["updated"] = now
+
+    def _take(self) -> float:
+        """
+        Take a token, or return the seconds to wait for one.
+        """
+        with self._state() as state:
+            if "limit" not in state:
+                return 0.0
+            now = time.time()
+            self._refill(state, now)
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0.0
+            rate = self._rate(state)
+            return max(state["updated"] - now, 0.0) + (1 - state["tokens"]) / rate
+
+    def acquire(self, check: Optional[Callable[[], None]] = None) -> None:
+        """
+        Wait for a token. `check` is called between waits, it may raise
+        to give up, e.g. on cancellation.
+        """
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            logger.debug("Rate limit budget spent, waiting %.1fs.", wait)
+            # Spread out processes woken for the same token.
+            time.sleep(min(wait, 1.0) + random.uniform(0, 0.1))
+            if check is not None:
+                check()
+
+    def update(self, headers: Mapping[str, str], status_code: int = 200) -> None:
+        """
+        Correct the bucket from a response.
+        """
+        limited = status_code == 429
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+        except (KeyError, ValueError):
+            if not limited:
+                return
+            limit, remaining = None, 0
+        reset_in = _reset_in(headers)
+        with self._state() as state:
+            now = time.time()
+            if "limit" in state:
+                self._refill(state, now)
+            else:
+                state.update(
+                    {
+                        "limit": RATE_LIMIT,
+                        "window": (
+                            RATE_LIMIT_WINDOW if reset_in is None else max(reset_in, 1)
+                        ),
+                        "tokens": remaining,
+                        "updated": now,
+                    }
+                )
+            if limit:
+                state["limit"] = limit
+            if reset_in and reset_in > 0:
+                # The longest time to a reset seen is about the window.
+                state["window"] = max(state["window"], reset_in)
+            state["tokens"] = min(state["tokens"], remaining)
+            if remaining == 0:
+                if reset_in is not None:
+                    reset_in = max(reset_in, 0) + RESET_MARGIN
+                elif limited:
+                    reset_in = RATE_LIMITED_BACKOFF
+                state["updated"] = max(state["updated"], now + (reset_in or 0))
@@ -1,19 +1,185 @@
+import sys
 from dataclasses import dataclass, asdict
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
 
 
-@dataclass
+@dataclass(init=False, eq=False)
 class Keyword:
+    __slots__ = ("keyword", "whole_word", "delete", "id")
+
     keyword: str
-    whole_word: bool = True
-    delete: bool = False
-    id: Optional[str] = None
+    whole_word: bool
+    delete: bool
+    id: Optional[str]
 
-    def __post_init__(self):
-        self.keyword = self.keyword.strip()
+    def __init__(
+        self,
+        keyword: str,
+        whole_word: bool = True,
+        delete: bool = False,
+        id: Optional[str] = None,  # pylint: disable=redefined-builtin
+    ):
+        self.keyword = sys.intern(keyword.strip())
+        self.whole_word = whole_word
+        self.delete = delete
+        self.id = id
 
     def __str__(self):
         return self.keyword
 
     def __eq__(self, o):
         return self.keyword == o.keyword
+
+    def __hash__(self):
+        return hash(self.keyword)
+
+
+KeywordLike = Union[str, Keyword, dict, tuple]
+
+
+class KeywordSet:
+    """
+    Ordered, immutable set of keywords with their whole_word flags.
+
+    Keywords are kept as a tuple of interned strings and flags as bytes,
+    the lookup table used for membership and set algebra is built on
+    first use. Iterating yields the keyword strings as stored. Set
+    operations compare keywords only and keep the flags of the left
+    operand, like `Keyword` equality.
+    """
+
+    __slots__ = ("_keywords", "_flags", "_positions", "_hash")
+
+    def __init__(
+        self,
+        keywords: Union[str, Iterable[KeywordLike], "KeywordSet"] = (),
+        whole_word: bool = True,
+    ):
+        self._positions: Optional[dict[str, int]] = None
+        self._hash: Optional[int] = None
+        if isinstance(keywords, KeywordSet):
+            self._keywords = keywords._keywords
+            self._flags = keywords._flags
+            self._positions = keywords._positions
+            return
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        flags: dict[str, bool] = {}
+        for item in keywords:
+            if isinstance(item, str):
+                text, flag = item, whole_word
+            elif isinstance(item, Keyword):
+                text, flag = item.keyword, item.whole_word
+            elif isinstance(item, dict):
+                text, flag = item["keyword"], item.get("whole_word", whole_word)
+            else:
+                text, flag = item
+            text = text.strip()
+            if text and text not in flags:
+                flags[sys.intern(text)] = bool(flag)
+        self._keywords = tuple(flags)
+        self._flags = bytes(flags.values())
+
+    @classmethod
+    def _from_parts(cls, keywords: tuple, flags: bytes) -> "KeywordSet":
+        keyword_set = cls.__new__(cls)
+        keyword_set._keywords = keywords
+        keyword_set._flags = flags
+        keyword_set._positions = None
+        keyword_set._hash = None
+        return keyword_set
+
+    @property
+    def positions(self) -> dict[str, int]:
+        """
+        Position of each keyword.
+        """
+        if self._positions is None:
+            self._positions = {keyword: i for i, keyword in enumerate(self._keywords)}
+        return self._positions
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keywords)
+
+    def __contains__(self, keyword) -> bool:
+        if isinstance(keyword, Keyword):
+            keyword = keyword.keyword
+        return keyword in self.positions
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._from_parts(self._keywords[index], self._flags[index])
+        return Keyword(self._keywords[index], whole_word=bool(self._flags[index]))
+
+    def whole_word(self, keyword: str) -> bool:
+        """
+        Whole word flag of a keyword.
+        """
+        return bool(self._flags[self.positions[keyword]])
+
+    def items(self) -> Iterator[tuple[str, bool]]:
+        """
+        Keywords with their whole_word flags.
+        """
+        return zip(self._keywords, map(bool, self._flags))
+
+    def to_keywords(
+        self, delete: bool = False, ids: Optional[dict[str, str]] = None
+    ) -> list[Keyword]:
+        """
+        Keywords as `Keyword` instances for the API, with ids looked up
+        in `ids`.
+        """
+        ids = ids or {}
+        return [
+            Keyword(keyword, whole_word=bool(flag), delete=delete, id=ids.get(keyword))
+            for keyword, flag in zip(self._keywords, self._flags)
+        ]
+
+    def _select(self, keep) -> "KeywordSet":
+        indexes = [i for i, keyword in enumerate(self._keywords) if keep(keyword)]
+        if len(indexes) == len(self._keywords):
+            return self
+        return self._from_parts(
+            tuple(self._keywords[i] for i in indexes),
+            bytes(self._flags[i] for i in indexes),
+        )
+
+    def __sub__(self, other: "KeywordSet") -> "KeywordSet":
+        other = other.positions
+        return self._select(lambda keyword: keyword not in other)
+
+    def __and__(self, other: "KeywordSet") -> "KeywordSet":
+        other = other.positions
+        return self._select(lambda keyword: keyword in other)
+
+    def __or__(self, other: "KeywordSet") -> "KeywordSet":
+        extra = other - self
+        if not extra:
+            return self
+        return self._from_parts(
+            self._keywords + extra._keywords, self._flags + extra._flags
+        )
+
+    def __xor__(self, other: "KeywordSet") -> "KeywordSet":
+        return (self - other) | (other - self)
+
+    def __le__(self, other: "KeywordSet") -> bool:
+        other = other.positions
+        return all(keyword in other for keyword in self._keywords)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, KeywordSet):
+            return NotImplemented
+        return len(self) == len(other) and set(self.items()) == set(other.items())
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(frozenset(self.items()))
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"KeywordSet({list(self._keywords)!r})"
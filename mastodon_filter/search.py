@@ -0,0 +1,395 @@
+"""
+Search keywords across filters and templates.
+
+The index in APP_DIR keeps the keywords of every filter and template
+along with a content hash, so only sources that changed are re-indexed.
+Filters are updated as this tool writes them, and refetched on request.
+
+Each source is stored in its own file, so a write touches only the
+sources that changed. Processes take a lock on the index directory,
+shared to read and exclusive to write, so the GUI, daemon, watch and
+other commands do not lose each other's updates.
+
+Every save bumps a generation number. The inverted index, keywords by
+case-folded form in sorted order, is saved along with the generation it
+was built at and loaded instead of the sources while that is current.
+After a change it is built again from the sources on the next search.
+The trigrams of substring searches are built in memory when needed.
+"""
+import bisect
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, limited to this process.
+    fcntl = None
+
+from mastodon_filter.backup import filter_digest
+from mastodon_filter.config import APP_DIR
+
+SEARCH_INDEX = APP_DIR / "search"
+LOCK_FILE = ".lock"
+GENERATION_FILE = "generation"
+POSTINGS_FILE = "postings"
+MATCH_MODES = ("exact", "prefix", "substring")
+INDEX_VERSION = 2
+
+# flock does not exclude threads of one process.
+_index_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(directory: Path, exclusive: bool) -> Iterator[None]:
+    """
+    Hold the lock of an index directory.
+    """
+    with _index_lock:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(directory / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+
+def _source_file(directory: Path, source_id: str) -> Path:
+    kind = source_id.partition(":")[0]
+    digest = hashlib.sha256(source_id.encode("utf-8")).hexdigest()
+    return directory / f"{kind}-{digest[:24]}.json"
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return None
+    return data
+
+
+def _write_json(path: Path, data: dict) -> None:
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+
+def _read_generation(directory: Path) -> int:
+    try:
+        return int((directory / GENERATION_FILE).read_text(encoding="ascii"))
+    except (OSError, ValueError):
+        return 0
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Keywords by source, with an inverted index.
+
+    Sources are `filter:<id>` and `template:<name>`. When the saved
+    inverted index is current, sources are loaded without their
+    keywords, which are read only if the inverted index is rebuilt.
+    """
+
+    def __init__(self, path: Optional[Path] = SEARCH_INDEX) -> None:
+        """
+        Without `path`, nothing is persisted.
+        """
+        self.path = path
+        self.sources: dict[str, dict] = {}
+        # Sources to write and to delete on save.
+        self._written: set[str] = set()
+        self._removed: set[str] = set()
+        self._postings: Optional[dict[str, list[tuple[str, str]]]] = None
+        self._terms: list[str] = []
+        self._trigrams: Optional[dict[str, set[str]]] = None
+        # Generation of the saved index this one matches, None if unknown.
+        self._generation: Optional[int] = None
+        self._postings_saved = False
+
+    def load(self) -> "SearchIndex":
+        """
+        Read the index, starting empty if there is none.
+        """
+        if self.path is None:
+            return self
+        if not self.path.is_dir():
+            self._generation = 0
+            return self
+        with _locked(self.path, exclusive=False):
+            self._generation = _read_generation(self.path)
+            saved = _read_json(self.path / POSTINGS_FILE)
+            if saved is not None and saved["generation"] == self._generation:
+                self.sources = saved["sources"]
+                self._postings = {
+                    term: [tuple(posting) for posting in postings]
+                    for term, postings in saved["postings"].items()
+                }
+                self._terms = list(self._postings)
+                self._postings_saved = True
+                return self
+            for source_path in self.path.glob("*.json"):
+                source = _read_json(source_path)
+                if source is not None:
+                    source_id = source.pop("id")
+                    del source["version"]
+                    self.sources[source_id] = source
+        return self
+
+    def _read_keywords(self) -> None:
+        """
+        Read the keywords of sources loaded without them.
+        """
+        missing = [
+            source_id
+            for source_id, source in self.sources.items()
+            if "keywords" not in source
+        ]
+        if not missing:
+            return
+        with _locked(self.path, exclusive=False):
+            for source_id in missing:
+                source = _read_json(_source_file(self.path, source_id))
+                self.sources[source_id]["keywords"] = (
+                    source["keywords"] if source is not None else []
+                )
+
+    def save(self) -> None:
+        """
+        Write the sources that changed.
+        """
+        if self.path is None or not (self._written or self._removed):
+            return
+        with _locked(self.path, exclusive=True):
+            for source_id in self._removed:
+                try:
+                    _source_file(self.path, source_id).unlink()
+                except FileNotFoundError:
+                    pass
+            for source_id in self._written:
+                _write_json(
+                    _source_file(self.path, source_id),
+                    dict(self.sources[source_id], id=source_id, version=INDEX_VERSION),
+                )
+            generation = _read_generation(self.path)
+            (self.path / GENERATION_FILE).write_text(
+                str(generation + 1), encoding="ascii"
+            )
+            # Saved by another process since this index was loaded.
+            matches = self._generation == generation
+            self._generation = generation + 1 if matches else None
+        self._written.clear()
+        self._removed.clear()
+
+    def _save_postings(self) -> None:
+        """
+        Save the inverted index, if it matches the saved sources.
+        """
+        if self.path is None or self._written or self._removed:
+            return
+        with _locked(self.path, exclusive=True):
+            if self._generation is None or (
+                _read_generation(self.path) != self._generation
+            ):
+                return
+            _write_json(
+                self.path / POSTINGS_FILE,
+                {
+                    "version": INDEX_VERSION,
+                    "generation": self._generation,
+                    "sources": {
+                        source_id: {
+                            key: value
+                            for key, value in source.items()
+                            if key != "keywords"
+                        }
+                        for source_id, source in self.sources.items()
+                    },
+                    "postings": self._postings,
+                },
+            )
+        self._postings_saved = True
+
+    def has_indexed_filters(self) -> bool:
+        """
+        Whether filters are indexed on disk, without loading the index.
+        """
+        return self.path is not None and any(self.path.glob("filter-*.json"))
+
+    def set_source(
+        self, source_id: str, kind: str, name: str, digest: str, keywords: list[str]
+    ) -> bool:
+        """
+        Index a source, unless its content hash is unchanged.
+        """
+        source = self.sources.get(source_id)
+        if source and source["hash"] == digest and source["name"] == name:
+            return False
+        self.sources[source_id] = {
+            "kind": kind,
+            "name": name,
+            "hash": digest,
+            "keywords": keywords,
+        }
+        self._written.add(source_id)
+        self._removed.discard(source_id)
+        self._changed()
+        return True
+
+    def remove_source(self, source_id: str) -> None:
+        """
+        Drop a source from the index.
+        """
+        self.sources.pop(source_id, None)
+        self._written.discard(source_id)
+        self._removed.add(source_id)
+        self._changed()
+
+    def _changed(self) -> None:
+        self._postings = None
+        self._trigrams = None
+        self._postings_saved = False
+
+    @property
+    def has_filters(self) -> bool:
+        """
+        Whether filters were ever indexed.
+        """
+        return any(source["kind"] == "filter" for source in self.sources.values())
+
+    def update_filter(self, filter_item: dict) -> None:
+        """
+        Index one filter.
+        """
+        self.set_source(
+            f"filter:{filter_item['id']}",
+            "filter",
+            filter_item["title"],
+            filter_digest(filter_item),
+            [keyword["keyword"] for keyword in filter_item["keywords"]],
+        )
+
+    def update_filters(self, filters: Iterable[dict]) -> None:
+        """
+        Index the complete set of filters, dropping filters not in it.
+        """
+        seen = set()
+        for filter_item in filters:
+            seen.add(f"filter:{filter_item['id']}")
+            self.update_filter(filter_item)
+        for source_id, source in list(self.sources.items()):
+            if source["kind"] == "filter" and source_id not in seen:
+                self.remove_source(source_id)
+
+    def update_templates(self, registry) -> None:
+        """
+        Index all templates of a TemplateRegistry.
+        """
+        seen = set()
+        for name in registry.names():
+            source_id = f"template:{name}"
+            seen.add(source_id)
+            try:
+                info = registry.info(name)
+            except ValueError:
+                continue
+            source = self.sources.get(source_id)
+            if source and source["hash"] == info["hash"]:
+                continue
+            self.set_source(
+                source_id,
+                "template",
+                name,
+                info["hash"],
+                list(registry.keywords(name)),
+            )
+        for source_id, source in list(self.sources.items()):
+            if source["kind"] == "template" and source_id not in seen:
+                self.remove_source(source_id)
+
+    def _build(self) -> None:
+        self._read_keywords()
+        postings: dict[str, list[tuple[str, str]]] = {}
+        for source_id, source in self.sources.items():
+            for keyword in source["keywords"]:
+                postings.setdefault(keyword.casefold(), []).append((source_id, keyword))
+        self._terms = sorted(postings)
+        self._postings = {term: postings[term] for term in self._terms}
+
+    def _candidates(self, term: str, mode: str) -> list[str]:
+        if mode == "exact":
+            return [term] if term in self._postings else []
+        if mode == "prefix":
+            start = bisect.bisect_left(self._terms, term)
+            end = bisect.bisect_left(self._terms, term + "\U0010ffff", start)
+            return self._terms[start:end]
+        if len(term) < 3:
+            return [candidate for candidate in self._terms if term in candidate]
+        if self._trigrams is None:
+            self._trigrams = {}
+            for candidate in self._terms:
+                for trigram in _trigrams(candidate):
+                    self._trigrams.setdefault(trigram, set()).add(candidate)
+        candidates = None
+        for trigram in _trigrams(term):
+            matches = self._trigrams.get(trigram, set())
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return []
+        return sorted(candidate for candidate in candidates if term in candidate)
+
+    def search(self, term: str, mode: str = "prefix") -> list[dict]:
+        """
+        Keywords matching term, case-insensitively, with the filter or
+        template they belong to.
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(
+                f"Invalid match mode: {mode}, must be one of: {', '.join(MATCH_MODES)}"
+            )
+        term = term.strip().casefold()
+        if not term:
+            raise ValueError("Search term must not be empty.")
+        if self._postings is None:
+            self._build()
+        if not self._postings_saved:
+            self._save_postings()
+        results = []
+        for candidate in self._candidates(term, mode):
+            for source_id, keyword in self._postings[candidate]:
+                source = self.sources[source_id]
+                results.append(
+                    {"kind": source["kind"], "name": source["name"], "keyword": keyword}
+                )
+        results.sort(key=lambda result: (result["kind"], result["name"].casefold()))
+        return results
+
+
+def record_write(
+    filter_id: str, filter_item: Optional[dict], path: Path = SEARCH_INDEX
+) -> None:
+    """
+    Keep the index in step with a filter written by this tool.
+    `filter_item` is None when the filter was deleted.
+    Only that filter's entry is written, the index is not loaded.
+    """
+    index = SearchIndex(path)
+    if filter_item is None:
+        index.remove_source(f"filter:{filter_id}")
+    elif index.has_indexed_filters():
+        # Without a full set of filters the index is refetched anyway.
+        index.update_filter(filter_item)
+    index.save()
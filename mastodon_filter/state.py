@@ -0,0 +1,74 @@
+"""
+Per-filter sync state kept between runs.
+
+For each filter title, the state records the filter id, the keywords
+last applied from the local wordlist, the base of three-way merges, and
+the git revision they were read from.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from mastodon_filter.config import APP_DIR
+from mastodon_filter.schema import KeywordSet
+
+STATE_FILE = APP_DIR / "state.json"
+
+_state_lock = threading.Lock()
+
+
+def read_state(path: Path = STATE_FILE) -> dict[str, dict]:
+    """
+    State of all filters, by title.
+    """
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def write_state(state: dict[str, dict], path: Path = STATE_FILE) -> None:
+    """
+    Write the state of all filters.
+    Writes to a temporary file first, so readers never see a partial state.
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(temp_path, path)
+
+
+def filter_state(title: str, path: Path = STATE_FILE) -> Optional[dict]:
+    """
+    State of one filter, None if it was never synced.
+    """
+    return read_state(path).get(title)
+
+
+def update_filter_state(title: str, path: Path = STATE_FILE, **fields) -> None:
+    """
+    Set fields of a filter's state, keeping the others.
+    """
+    with _state_lock:
+        state = read_state(path)
+        state.setdefault(title, {}).update(fields)
+        write_state(state, path)
+
+
+def record_sync(
+    title: str,
+    keywords: KeywordSet,
+    filter_item: dict,
+    path: Path = STATE_FILE,
+    **fields,
+) -> None:
+    """
+    Remember the keywords synced from a wordlist with their whole_word
+    flag, the base of the next merge.
+    """
+    base = dict(keywords.items())
+    update_filter_state(title, path, filter_id=filter_item["id"], base=base, **fields)
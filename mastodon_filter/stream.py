@@ -0,0 +1,168 @@
+"""
+Listen for filter changes on the Mastodon user stream.
+
+The streaming API sends a `filters_changed` event whenever the user's
+filters are edited, from this tool or elsewhere. Listening to it lets
+caches stay valid until something actually changes, instead of
+refetching filters on a timer.
+"""
+import random
+import threading
+from typing import Callable, Optional
+
+import requests
+
+from mastodon_filter.config import Config
+from mastodon_filter.logging import get_logger
+
+logger = get_logger(__name__)
+
+STREAM_PATH = "/api/v1/streaming/user"
+FILTERS_CHANGED = "filters_changed"
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 300.0
+# The server sends a heartbeat comment at least every 15 seconds.
+READ_TIMEOUT = 90
+
+
+class FiltersStream:
+    """
+    Calls `on_change()` on a background thread whenever filters change.
+
+    Reconnects with exponential backoff. Events may have been missed while
+    disconnected, so `on_reconnect()`, by default `on_change()`, is called
+    after every reconnect.
+    `on_status(connected)` reports whether changes are currently being
+    received, callers can fall back to expiring their caches meanwhile.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        on_change: Callable[[], None],
+        on_status: Optional[Callable[[bool], None]] = None,
+        on_reconnect: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.config = config
+        self.on_change = on_change
+        self.on_reconnect = on_reconnect or on_change
+        self.on_status = on_status
+        self.session = requests.Session()
+        self.stopped = threading.Event()
+        self.response: Optional[requests.Response] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FiltersStream":
+        """
+        Start listening.
+        """
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop listening.
+        """
+        self.stopped.set()
+        response = self.response
+        if response is not None:
+            response.close()
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.config.access_token}"}
+
+    def url(self) -> str:
+        """
+        User stream URL. The streaming server may run on another host,
+        instances advertise it in their v2 instance information.
+        """
+        base_url = self.config.api_base_url
+        try:
+            response = self.session.get(
+                f"{base_url}/api/v2/instance", headers=self._headers(), timeout=10
+            )
+            response.raise_for_status()
+            streaming = response.json()["configuration"]["urls"]["streaming"]
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            streaming = None
+        if streaming:
+            base_url = streaming.replace("wss://", "https://", 1).replace(
+                "ws://", "http://", 1
+            )
+        return base_url.rstrip("/") + STREAM_PATH
+
+    def run(self) -> None:
+        """
+        Connect, listen and reconnect until stopped.
+        """
+        delay = RECONNECT_MIN
+        connections = 0
+        url = None
+        while not self.stopped.is_set():
+            try:
+                url = url or self.url()
+                for event in self.events(url):
+                    if event is None:
+                        # Connected.
+                        connections += 1
+                        delay = RECONNECT_MIN
+                        self._status(True)
+                        if connections > 1:
+                            self.on_reconnect()
+                    elif event == FILTERS_CHANGED:
+                        logger.debug("Filters changed.")
+                        self.on_change()
+            except requests.HTTPError as error:
+                if error.response is not None and error.response.status_code in (
+                    401,
+                    403,
+                ):
+                    logger.warning(
+                        "Access token cannot read the streaming API, "
+                        "filter changes will not be pushed."
+                    )
+                    self._status(False)
+                    return
+                logger.warning("Stream failed: %s", error)
+            except Exception as error:  # pylint: disable=broad-except
+                if self.stopped.is_set():
+                    break
+                logger.warning("Stream disconnected: %s", error)
+            self._status(False)
+            # Full jitter, so many clients do not reconnect at once.
+            self.stopped.wait(random.uniform(0, delay))
+            delay = min(delay * 2, RECONNECT_MAX)
+            url = None
+
+    def events(self, url: str):
+        """
+        Yield None once connected, then the name of every event received.
+        """
+        with self.session.get(
+            url,
+            headers={**self._headers(), "Accept": "text/event-stream"},
+            stream=True,
+            timeout=(10, READ_TIMEOUT),
+        ) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            self.response = response
+            logger.info("Listening for filter changes on %s", url)
+            yield None
+            event = None
+            # Events are small and rare, read them as soon as they arrive.
+            for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+                if self.stopped.is_set():
+                    return
+                if line.startswith("event:"):
+                    event = line[len("event:") :].strip()
+                elif not line:
+                    if event:
+                        yield event
+                    event = None
+        raise ConnectionError("Stream closed by server.")
+
+    def _status(self, connected: bool) -> None:
+        if self.on_status:
+            self.on_status(connected)
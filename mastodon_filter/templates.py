@@ -1,25 +1,304 @@
+"""
+Filter templates.
+
+Templates are wordlists, bundled with the package or placed in the user
+templates directory, which takes precedence. A line `include: NAME` pulls
+in the keywords of another template, found by name. Templates in the
+wordlist language are compiled, and may also `#include` files relative
+to themselves; they are read again when such a file changes.
+
+An index in APP_DIR records each template's file stat, content hash,
+includes and keywords, so templates are only read again after they
+change. Compiled templates, with includes resolved and keywords
+de-duplicated, are cached in the index as well.
+"""
+import hashlib
+import json
+import os
 from pathlib import Path
+from typing import Optional
+
+from mastodon_filter.config import APP_DIR
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.wordlist import (
+    compile_text,
+    is_wordlist_language,
+    keywords_digest,
+    manifest_changed,
+)
+
+BUNDLED_TEMPLATES = Path(__file__).parent / "templates"
+USER_TEMPLATES = APP_DIR / "templates"
+TEMPLATES_INDEX = APP_DIR / "templates.json"
+INCLUDE = "include:"
+INDEX_VERSION = 2
+
+
+def parse_template(text: str) -> tuple[list[str], list[str]]:
+    """
+    Split template text into its includes and its own keywords,
+    stripped and de-duplicated.
+    """
+    includes = []
+    keywords = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(INCLUDE):
+            includes.append(line[len(INCLUDE) :].strip())
+        else:
+            keywords.append(line)
+    return list(dict.fromkeys(includes)), list(dict.fromkeys(keywords))
+
+
+def read_source(path: Path, stat: os.stat_result) -> dict:
+    """
+    Index entry of a template file. Templates in the wordlist language
+    are compiled, with the files they read in their manifest.
+    """
+    data = path.read_bytes()
+    text = data.decode("utf-8")
+    source = {
+        "path": str(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": hashlib.sha256(data).hexdigest(),
+    }
+    if is_wordlist_language(text):
+        # `include: NAME` still names templates, blanked to keep line numbers.
+        lines = text.splitlines()
+        includes = [line.strip() for line in lines]
+        includes = [line for line in includes if line.startswith(INCLUDE)]
+        source["includes"] = list(
+            dict.fromkeys(line[len(INCLUDE) :].strip() for line in includes)
+        )
+        lines = ["" if line.strip().startswith(INCLUDE) else line for line in lines]
+        try:
+            keywords, manifest = compile_text("\n".join(lines), path.parent)
+        except ValueError as error:
+            source["keywords"] = []
+            source["error"] = str(error)
+            return source
+        source["hash"] = keywords_digest(keywords)
+        source["keywords"] = list(keywords.items())
+        source["manifest"] = manifest
+        manifest[str(path.resolve())] = [stat.st_mtime_ns, stat.st_size]
+    else:
+        source["includes"], source["keywords"] = parse_template(text)
+    return source
+
+
+class TemplateRegistry:
+    """
+    Index of available templates and their compiled keywords.
+    """
+
+    def __init__(
+        self,
+        directories: Optional[list[Path]] = None,
+        index_path: Optional[Path] = TEMPLATES_INDEX,
+    ) -> None:
+        """
+        Later directories take precedence over earlier ones.
+        Without `index_path`, nothing is persisted.
+        """
+        self.directories = (
+            directories
+            if directories is not None
+            else [BUNDLED_TEMPLATES, USER_TEMPLATES]
+        )
+        self.index_path = index_path
+        self.sources: dict[str, dict] = {}
+        self.compiled: dict[str, dict] = {}
+        # Compiled keywords by name, with the key they were compiled for.
+        self.keyword_sets: dict[str, tuple[str, KeywordSet]] = {}
+        self.loaded = False
+        self.dirty = False
+
+    def _read_index(self) -> None:
+        if self.index_path is None:
+            return
+        try:
+            with self.index_path.open("r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+            return
+        self.sources = index.get("sources", {})
+        self.compiled = index.get("compiled", {})
+
+    def save(self) -> None:
+        """
+        Persist the index if it changed.
+        """
+        if self.index_path is None or not self.dirty:
+            return
+        index = {
+            "version": INDEX_VERSION,
+            "sources": self.sources,
+            "compiled": self.compiled,
+        }
+        temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+    def refresh(self) -> None:
+        """
+        Update the index from the template directories, reading only
+        templates whose size or modification time changed.
+        """
+        if not self.loaded:
+            self._read_index()
+            self.loaded = True
+        found: dict[str, Path] = {}
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+            for path in directory.glob("*.txt"):
+                if path.is_file():
+                    found[path.stem] = path
+        sources = {}
+        for name, path in found.items():
+            stat = path.stat()
+            source = self.sources.get(name)
+            if (
+                source is None
+                or source["path"] != str(path)
+                or source["mtime_ns"] != stat.st_mtime_ns
+                or source["size"] != stat.st_size
+                or manifest_changed(source.get("manifest", {}))
+            ):
+                source = read_source(path, stat)
+                self.dirty = True
+            sources[name] = source
+        if sources.keys() != self.sources.keys():
+            self.dirty = True
+        self.sources = sources
+        self.compiled = {
+            name: compiled
+            for name, compiled in self.compiled.items()
+            if name in sources
+        }
+        self.save()
+
+    def _ensure_loaded(self) -> None:
+        if not self.loaded:
+            self.refresh()
+
+    def names(self) -> list[str]:
+        """
+        Names of all templates, sorted.
+        """
+        self._ensure_loaded()
+        return sorted(self.sources)
+
+    def _source(self, name: str) -> dict:
+        self._ensure_loaded()
+        if name not in self.sources:
+            raise ValueError(f"Template not found: {name}")
+        source = self.sources[name]
+        if "error" in source:
+            raise ValueError(source["error"])
+        return source
+
+    def _key(self, name: str, stack: tuple = ()) -> str:
+        """
+        Hash of a template and everything it includes.
+        """
+        if name in stack:
+            cycle = " -> ".join(stack + (name,))
+            raise ValueError(f"Template includes itself: {cycle}")
+        source = self._source(name)
+        digest = hashlib.sha256(source["hash"].encode("ascii"))
+        for include in source["includes"]:
+            digest.update(self._key(include, stack + (name,)).encode("ascii"))
+        return digest.hexdigest()
+
+    def key(self, name: str) -> str:
+        """
+        Hash of a template and everything it includes, changing whenever
+        its keywords may have.
+        """
+        return self._key(name)
+
+    def _compile(self, name: str) -> KeywordSet:
+        key = self._key(name)
+        cached = self.keyword_sets.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        compiled = self.compiled.get(name)
+        if compiled is not None and compiled["key"] == key:
+            keywords = KeywordSet(compiled["keywords"])
+        else:
+            source = self._source(name)
+            keywords = KeywordSet()
+            for include in source["includes"]:
+                keywords |= self._compile(include)
+            keywords |= KeywordSet(source["keywords"])
+            self.compiled[name] = {"key": key, "keywords": list(keywords.items())}
+            self.dirty = True
+        self.keyword_sets[name] = (key, keywords)
+        return keywords
+
+    def keywords(self, name: str) -> KeywordSet:
+        """
+        Keywords of a template with its includes resolved, de-duplicated.
+        """
+        keywords = self._compile(name)
+        self.save()
+        return keywords
+
+    def info(self, name: str) -> dict:
+        """
+        Name, path, keyword count and content hash of a template.
+        """
+        source = self._source(name)
+        count = len(self._compile(name))
+        self.save()
+        return {
+            "name": name,
+            "path": source["path"],
+            "count": count,
+            "hash": self._key(name),
+        }
+
+    def compose(self, names: list[str]) -> KeywordSet:
+        """
+        Keywords of several templates combined, de-duplicated.
+        """
+        keywords = KeywordSet()
+        for name in names:
+            keywords |= self._compile(name)
+        self.save()
+        return keywords
+
+
+_registry: Optional[TemplateRegistry] = None
+
+
+def get_registry() -> TemplateRegistry:
+    """
+    Registry shared within this process.
+    """
+    global _registry  # pylint: disable=global-statement
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
 
 
 def list_templates() -> list:
     """
     List templates.
     """
-    templates_path = Path(__file__).parent / "templates"
-    return [
-        template.name.removesuffix(".txt")
-        for template in templates_path.iterdir()
-        if template.is_file()
-    ]
+    return get_registry().names()
 
 
-def load_template(template_name: str) -> list[str]:
+def load_template(template_name: str) -> KeywordSet:
     """
     Load template.
     """
-    templates_path = Path(__file__).parent / "templates"
-    template_path = templates_path / (template_name + ".txt")
-    if not template_path.exists():
-        raise ValueError(f"Template not found: {template_name} at {template_path}")
-    with template_path.open("rb") as template_file:
-        return template_file.read().decode("utf-8").splitlines()
+    return get_registry().keywords(template_name)
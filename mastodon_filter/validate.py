@@ -1,8 +1,8 @@
 """
 Validation utilities.
 """
-from typing import Union
-from mastodon_filter.schema import Keyword
+from typing import Iterable, Union
+from mastodon_filter.schema import Keyword, KeywordSet
 
 FILTER_CONTEXTS = ["home", "notifications", "public", "thread", "account"]
 FILTER_ACTIONS = ["warn", "hide"]
@@ -42,21 +42,17 @@ def validate_action(action: str) -> str:
     return action
 
 
-def validate_keywords(keywords: Union[str, list[str]]) -> list[Keyword]:
-    """Validate filter keywords."""
+def validate_keywords(
+    keywords: Union[str, Iterable[Union[str, Keyword]], KeywordSet]
+) -> KeywordSet:
+    """Validate filter keywords, dropping blanks and duplicates."""
     if not keywords:
         raise ValueError("Keywords must not be empty.")
-    if not isinstance(keywords, (str, list)):
+    if isinstance(keywords, KeywordSet):
+        return keywords
+    if not isinstance(keywords, (str, list, tuple)):
         raise TypeError("Keywords must be a string or a list.")
-    if isinstance(keywords, str):
-        keywords = [keywords]
-
-    valid_keywords = []
-    for keyword in set(keywords):
-        if not keyword:
-            continue
-        valid_keywords.append(Keyword(keyword))
-    return valid_keywords
+    return KeywordSet(keywords)
 
 
 def validate_expires_in(expires_in: int) -> int:
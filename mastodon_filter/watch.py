@@ -0,0 +1,344 @@
+"""
+Watch wordlist files and push keyword changes to their filters.
+
+Files are watched with inotify on Linux and kqueue on macOS and BSD,
+falling back to polling elsewhere. Editors often save by writing a new
+file and renaming it over the old one, so the directories holding the
+wordlists are watched rather than the files themselves.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from mastodon_filter.logging import get_logger
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.wordlist import read_wordlist
+from mastodon_filter.stream import FiltersStream
+
+logger = get_logger(__name__)
+
+DEBOUNCE = 1.0
+RETRY_DELAY = 30.0
+POLL_INTERVAL = 1.0
+
+
+def _signature(path: Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class PollingWatcher:
+    """
+    Detects changes by comparing file signatures at an interval.
+    """
+
+    def __init__(self, paths: list[Path]) -> None:
+        self.signatures = {path: _signature(path) for path in paths}
+
+    def changed(self) -> set[Path]:
+        """
+        Paths whose signature changed since the last call.
+        """
+        changed = set()
+        for path, old in self.signatures.items():
+            new = _signature(path)
+            if new != old:
+                self.signatures[path] = new
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: float) -> set[Path]:
+        """
+        Wait up to `timeout` seconds for changes.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            changed = self.changed()
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(POLL_INTERVAL, remaining))
+
+    def close(self) -> None:
+        """
+        Release resources.
+        """
+
+
+class InotifyWatcher:
+    """
+    Linux inotify, through libc.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, paths: list[Path]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = set(paths)
+        self.directories: dict[int, Path] = {}
+        for directory in {path.parent for path in paths}:
+            wd = libc.inotify_add_watch(
+                self.fd,
+                os.fsencode(directory),
+                self.IN_CLOSE_WRITE | self.IN_MOVED_TO,
+            )
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self.directories[wd] = directory
+
+    def wait(self, timeout: float) -> set[Path]:
+        """
+        Wait up to `timeout` seconds for changes.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            path = self.directories.get(wd, Path()) / os.fsdecode(name)
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        """
+        Release resources.
+        """
+        os.close(self.fd)
+
+
+class KqueueWatcher(PollingWatcher):
+    """
+    macOS and BSD kqueue. Events only say that something changed,
+    file signatures tell which wordlists did.
+    """
+
+    def __init__(self, paths: list[Path]) -> None:
+        super().__init__(paths)
+        self.kqueue = select.kqueue()
+        self.fds: dict[Path, int] = {}
+        for directory in {path.parent for path in paths}:
+            self._add(directory, select.KQ_NOTE_WRITE)
+        for path in paths:
+            self._add_file(path)
+
+    def _add(self, path: Path, fflags: int) -> None:
+        try:
+            fd = os.open(path, getattr(os, "O_EVTONLY", os.O_RDONLY))
+        except OSError:
+            return
+        self.fds[path] = fd
+        event = select.kevent(
+            fd,
+            filter=select.KQ_FILTER_VNODE,
+            flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+            fflags=fflags,
+        )
+        self.kqueue.control([event], 0, 0)
+
+    def _add_file(self, path: Path) -> None:
+        fd = self.fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+        self._add(
+            path,
+            select.KQ_NOTE_WRITE
+            | select.KQ_NOTE_EXTEND
+            | select.KQ_NOTE_DELETE
+            | select.KQ_NOTE_RENAME,
+        )
+
+    def wait(self, timeout: float) -> set[Path]:
+        """
+        Wait up to `timeout` seconds for changes.
+        """
+        if not self.kqueue.control(None, 32, timeout):
+            return set()
+        changed = self.changed()
+        for path in changed:
+            # Replaced files are new inodes, watch those instead.
+            self._add_file(path)
+        return changed
+
+    def close(self) -> None:
+        """
+        Release resources.
+        """
+        for fd in self.fds.values():
+            os.close(fd)
+        self.kqueue.close()
+
+
+def make_watcher(paths: list[Path]):
+    """
+    Best watcher available on this platform.
+    """
+    if hasattr(select, "kqueue"):
+        return KqueueWatcher(paths)
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError, TypeError):
+        logger.debug("inotify is not available, polling for changes.")
+    return PollingWatcher(paths)
+
+
+class WatchedWordlist:
+    """
+    A wordlist file, its filter, and the keywords last applied from it.
+    """
+
+    def __init__(self, title: str, path: Path) -> None:
+        self.title = title
+        self.path = path
+        self.filter_id: Optional[str] = None
+        # Keyword -> id on the server, as of the last push.
+        self.applied: dict[str, str] = {}
+
+    def remember(self, filter_item: dict, keywords: Iterable[str]) -> None:
+        """
+        Record the server's ids for the keywords of this wordlist.
+        """
+        wanted = KeywordSet(keywords)
+        self.filter_id = filter_item["id"]
+        self.applied = {
+            keyword["keyword"]: keyword["id"]
+            for keyword in filter_item["keywords"]
+            if keyword["keyword"] in wanted
+        }
+
+    def delta(self, keywords: KeywordSet) -> tuple[KeywordSet, KeywordSet]:
+        """
+        Keywords added and removed since the last push.
+        """
+        applied = KeywordSet(self.applied)
+        return keywords - applied, applied - keywords
+
+
+def watch_wordlists(
+    client,
+    mappings: dict[str, Path],
+    debounce: float = DEBOUNCE,
+    report: Callable[[str], None] = logger.info,
+    stop: Optional[threading.Event] = None,
+    stream: bool = False,
+) -> None:
+    """
+    Sync each wordlist to its filter once, then push only the keywords
+    that changed whenever a file is saved. Saves within `debounce`
+    seconds of each other are sent as one update. Runs until `stop` is set.
+    With `stream`, keyword ids are refreshed when filters are edited elsewhere.
+    """
+    stop = stop or threading.Event()
+    refresh = threading.Event()
+    wordlists = {
+        path.resolve(): WatchedWordlist(title, path.resolve())
+        for title, path in mappings.items()
+    }
+    for wordlist in wordlists.values():
+        keywords = read_wordlist(wordlist.path)
+        response = client.sync(wordlist.title, keywords)
+        wordlist.remember(response, keywords)
+        report(
+            f"Filter synced: {wordlist.title}. Added {len(response['added'])}, "
+            f"deleted {len(response['deleted'])} keywords."
+        )
+
+    watcher = make_watcher(list(wordlists))
+    listener = None
+    if stream:
+
+        def changed() -> None:
+            # Pushes of this watch are already applied to its wordlists.
+            if client.external_change():
+                refresh.set()
+
+        listener = FiltersStream(
+            client.config, on_change=changed, on_reconnect=refresh.set
+        )
+    if listener is not None:
+        listener.start()
+    report(f"Watching {len(wordlists)} wordlists.")
+    # Path -> monotonic time at which to push it.
+    due: dict[Path, float] = {}
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            timeout = min([when - now for when in due.values()] + [POLL_INTERVAL])
+            for path in watcher.wait(max(timeout, 0)):
+                due[path] = time.monotonic() + debounce
+            if refresh.is_set():
+                refresh.clear()
+                try:
+                    reload(client, wordlists.values())
+                except Exception as error:  # pylint: disable=broad-except
+                    report(f"Could not reload filters: {error}")
+            now = time.monotonic()
+            for path in [path for path, when in due.items() if when <= now]:
+                del due[path]
+                try:
+                    push(client, wordlists[path], report)
+                except Exception as error:  # pylint: disable=broad-except
+                    report(f"Could not sync filter: {wordlists[path].title}: {error}")
+                    due[path] = now + RETRY_DELAY
+    finally:
+        watcher.close()
+        if listener is not None:
+            listener.stop()
+
+
+def reload(client, wordlists) -> None:
+    """
+    Refetch filters after they changed elsewhere, so that keyword ids
+    stay valid. Keywords removed elsewhere are added back on the next push.
+    """
+    client.invalidate()
+    filters = {filter_item["id"]: filter_item for filter_item in client.filters()}
+    for wordlist in wordlists:
+        if wordlist.filter_id in filters:
+            wordlist.remember(filters[wordlist.filter_id], list(wordlist.applied))
+
+
+def push(client, wordlist: WatchedWordlist, report: Callable[[str], None]) -> None:
+    """
+    Send the keywords added to and removed from a wordlist since the last push.
+    """
+    keywords = read_wordlist(wordlist.path)
+    added, removed = wordlist.delta(keywords)
+    if not added and not removed:
+        return
+    response = client.update(
+        wordlist.filter_id,
+        keywords=added.to_keywords()
+        + removed.to_keywords(delete=True, ids=wordlist.applied),
+    )
+    wordlist.remember(response, keywords)
+    report(
+        f"Filter synced: {wordlist.title}. "
+        f"Added {len(added)}, deleted {len(removed)} keywords."
+    )
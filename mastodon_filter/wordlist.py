@@ -0,0 +1,288 @@
+"""
+Wordlist language.
+
+A wordlist whose first line is `#!wordlist` is compiled instead of read
+line by line:
+
+    #!wordlist
+    # A comment, "#" followed by a space. Also at the end of a line.
+    #include weapons.txt
+    riot{,s,er,ers}     # riot riots rioter rioters
+    colour|color
+    ~shoot{ing,er}      # "~" matches inside words, whole_word off
+    \\#breaking          # "\\" escapes a special character
+
+Braces nest, and `,` or `|` separate their alternatives. Includes name
+files relative to the including file, `.txt` may be left out. Templates
+add `include: NAME`, which names a template instead of a file.
+Keywords are normalized and de-duplicated. Other wordlists are plain,
+one keyword per line, so `#hashtag` lines stay keywords.
+
+The compiled keywords are cached in APP_DIR along with the size and
+modification time of every file read, so later runs skip parsing until
+one of them changes.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from mastodon_filter.config import APP_DIR
+from mastodon_filter.schema import KeywordSet
+
+PRAGMA = "#!wordlist"
+INCLUDE = "#include"
+PARTIAL = "~"
+WORDLIST_CACHE = APP_DIR / "wordlists"
+ARTIFACT_VERSION = 1
+MAX_EXPANSIONS = 10000
+
+
+def is_wordlist_language(text: str) -> bool:
+    """
+    Whether text starts with the wordlist language pragma.
+    """
+    return text.lstrip("\ufeff").split("\n", 1)[0].strip() == PRAGMA
+
+
+def _strip_comment(line: str) -> str:
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif (
+            char == "#"
+            and (i == 0 or line[i - 1].isspace())
+            and (i + 1 == len(line) or line[i + 1].isspace())
+        ):
+            return line[:i]
+    return line
+
+
+def _expand(line: str, start: int = 0, depth: int = 0) -> tuple[list[str], int]:
+    """
+    Alternatives of a line, or of a brace group from `start` to its
+    closing brace, and the position after it.
+    """
+    alternatives: list[str] = []
+    current = [""]
+    separators = ",|" if depth else "|"
+    pos = start
+    while pos < len(line):
+        char = line[pos]
+        if char == "\\" and pos + 1 < len(line):
+            current = [text + line[pos + 1] for text in current]
+            pos += 2
+            continue
+        if char == "{":
+            inner, pos = _expand(line, pos + 1, depth + 1)
+            current = [text + option for text in current for option in inner]
+            if len(current) > MAX_EXPANSIONS:
+                raise ValueError(f"Expands to more than {MAX_EXPANSIONS} keywords.")
+            continue
+        if char == "}":
+            if not depth:
+                raise ValueError("Unmatched closing brace.")
+            alternatives.extend(current)
+            return alternatives, pos + 1
+        if char in separators:
+            alternatives.extend(current)
+            current = [""]
+        else:
+            current = [text + char for text in current]
+        pos += 1
+    if depth:
+        raise ValueError("Unclosed brace.")
+    alternatives.extend(current)
+    return alternatives, pos
+
+
+def _normalize(keyword: str) -> str:
+    return " ".join(keyword.split())
+
+
+def _resolve_include(name: str, directory: Path) -> Path:
+    path = directory / name
+    if not path.is_file() and not path.suffix:
+        path = path.with_suffix(".txt")
+    if not path.is_file():
+        raise ValueError(f"Included wordlist not found: {name}")
+    return path
+
+
+def _compile_lines(
+    text: str,
+    directory: Path,
+    keywords: list[tuple[str, bool]],
+    manifest: dict[str, list[int]],
+    stack: tuple[str, ...],
+) -> None:
+    text = text.lstrip("\ufeff")
+    for lineno, raw_line in enumerate(text.splitlines(), start=1):
+        line = _strip_comment(raw_line).strip()
+        if not line or (lineno == 1 and line == PRAGMA):
+            continue
+        location = f"{stack[-1]}:{lineno}" if stack else f"line {lineno}"
+        try:
+            if line.startswith(INCLUDE + " "):
+                include = _resolve_include(line[len(INCLUDE) :].strip(), directory)
+            else:
+                include = None
+                whole_word = not line.startswith(PARTIAL)
+                expansions, _ = _expand(line if whole_word else line[len(PARTIAL) :])
+        except ValueError as error:
+            raise ValueError(f"{location}: {error}") from error
+        if include is not None:
+            _compile_file(include, keywords, manifest, stack)
+            continue
+        for keyword in expansions:
+            keyword = _normalize(keyword)
+            if keyword:
+                keywords.append((keyword, whole_word))
+
+
+def _compile_file(
+    path: Path,
+    keywords: list[tuple[str, bool]],
+    manifest: dict[str, list[int]],
+    stack: tuple[str, ...],
+) -> None:
+    path = path.resolve()
+    if str(path) in stack:
+        cycle = " -> ".join(stack + (str(path),))
+        raise ValueError(f"Wordlist includes itself: {cycle}")
+    stat = path.stat()
+    manifest[str(path)] = [stat.st_mtime_ns, stat.st_size]
+    text = path.read_text(encoding="utf-8")
+    _compile_lines(text, path.parent, keywords, manifest, stack + (str(path),))
+
+
+def compile_text(
+    text: str, directory: Optional[Path] = None
+) -> tuple[KeywordSet, dict[str, list[int]]]:
+    """
+    Keywords of wordlist language text, and the files it included
+    with their modification time and size.
+    """
+    keywords: list[tuple[str, bool]] = []
+    manifest: dict[str, list[int]] = {}
+    _compile_lines(text, directory or Path.cwd(), keywords, manifest, ())
+    return KeywordSet(keywords), manifest
+
+
+def compile_file(path: Path) -> tuple[KeywordSet, dict[str, list[int]]]:
+    """
+    Keywords of a wordlist language file, and the files read to compile
+    it with their modification time and size.
+    """
+    keywords: list[tuple[str, bool]] = []
+    manifest: dict[str, list[int]] = {}
+    _compile_file(Path(path), keywords, manifest, ())
+    return KeywordSet(keywords), manifest
+
+
+def manifest_changed(manifest: dict[str, list[int]]) -> bool:
+    """
+    Whether any file of a manifest changed or disappeared.
+    """
+    for name, recorded in manifest.items():
+        try:
+            stat = os.stat(name)
+        except OSError:
+            return True
+        if [stat.st_mtime_ns, stat.st_size] != recorded:
+            return True
+    return False
+
+
+def keywords_digest(keywords: KeywordSet) -> str:
+    """
+    Content hash of compiled keywords.
+    """
+    digest = hashlib.sha256()
+    for keyword, whole_word in keywords.items():
+        digest.update(f"{int(whole_word)}{keyword}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def artifact_path(path: Path, cache_dir: Path = WORDLIST_CACHE) -> Path:
+    """
+    Cache file of a wordlist's compiled keywords.
+    """
+    name = hashlib.sha256(str(Path(path).resolve()).encode("utf-8")).hexdigest()
+    return cache_dir / f"{name[:32]}.json"
+
+
+def _read_artifact(artifact: Path, source: Path) -> Optional[dict]:
+    try:
+        with artifact.open("r", encoding="utf-8") as file:
+            compiled = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(compiled, dict)
+        or compiled.get("version") != ARTIFACT_VERSION
+        or compiled.get("source") != str(source)
+    ):
+        return None
+    return compiled
+
+
+def compile_wordlist(
+    path: Path, cache_dir: Optional[Path] = WORDLIST_CACHE
+) -> KeywordSet:
+    """
+    Keywords of a wordlist language file, from the cache unless one of
+    the files it reads changed. Without `cache_dir`, nothing is cached.
+    """
+    source = Path(path).resolve()
+    if cache_dir is None:
+        return compile_file(source)[0]
+    artifact = artifact_path(source, cache_dir)
+    compiled = _read_artifact(artifact, source)
+    if compiled is not None and not manifest_changed(compiled["manifest"]):
+        return KeywordSet(compiled["keywords"])
+    keywords, manifest = compile_file(source)
+    compiled = {
+        "version": ARTIFACT_VERSION,
+        "source": str(source),
+        "manifest": manifest,
+        "hash": keywords_digest(keywords),
+        "keywords": list(keywords.items()),
+    }
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = artifact.with_name(artifact.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(compiled, file)
+    os.replace(temp_path, artifact)
+    return keywords
+
+
+def read_wordlist(path: Path) -> KeywordSet:
+    """
+    Keywords of a wordlist file, compiled if it uses the wordlist language.
+    """
+    path = Path(path)
+    with path.open("r", encoding="utf-8") as file:
+        first_line = file.readline()
+        if is_wordlist_language(first_line):
+            return compile_wordlist(path)
+        return KeywordSet([first_line] + file.read().splitlines())
+
+
+def load_wordlist(file) -> KeywordSet:
+    """
+    Keywords of a wordlist opened by click, a file or stdin.
+    """
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and Path(name).is_file():
+        return read_wordlist(Path(name))
+    text = file.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    if is_wordlist_language(text):
+        return compile_text(text)[0]
+    return KeywordSet(text.splitlines())
@@ -0,0 +1,94 @@
+"""
+Fixtures shared by the tests: a fake Mastodon server and API clients.
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Keep the config, caches and indexes of the tests out of the user's.
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="mastodon-filter-tests-")
+
+import pytest  # pylint: disable=wrong-import-position
+
+from benchmarks.fake_server import FakeMastodonServer  # noqa: E402
+from mastodon_filter.api import MastodonFilters  # noqa: E402
+from mastodon_filter.config import Config  # noqa: E402
+from mastodon_filter.ratelimit import RateLimiter  # noqa: E402
+
+
+@pytest.fixture
+def start_server():
+    """
+    Start fake servers with the given options, stopped after the test.
+    """
+    servers = []
+
+    def start(**options) -> FakeMastodonServer:
+        server = FakeMastodonServer(("127.0.0.1", 0), **options)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def server(start_server) -> FakeMastodonServer:
+    return start_server()
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """
+    Create clients of a server, each with its own rate limit budget.
+    """
+
+    def make(server: FakeMastodonServer, **options) -> MastodonFilters:
+        limiter = RateLimiter("test", tmp_path / "ratelimit.json")
+        return MastodonFilters(
+            Config(server.url, "token"), rate_limiter=limiter, **options
+        )
+
+    return make
+
+
+@pytest.fixture
+def client(server, make_client) -> MastodonFilters:
+    return make_client(server)
+
+
+@pytest.fixture
+def start_daemon(tmp_path):
+    """
+    Start daemons serving the given client, stopped after the test.
+    """
+    # pylint: disable=import-outside-toplevel
+    from mastodon_filter.daemon import DaemonClient, DaemonServer
+
+    daemons = []
+
+    def start(
+        client: MastodonFilters, stream: bool = False, path: Optional[Path] = None
+    ) -> DaemonClient:
+        path = path or tmp_path / f"daemon-{len(daemons)}.sock"
+        daemon = DaemonServer(path, stream=stream)
+        daemon.client = client
+        daemon.config_mtime = daemon.config_stat()
+        if stream:
+            daemon.listen(client)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        daemons.append(daemon)
+        return DaemonClient.open(path)
+
+    yield start
+    for daemon in daemons:
+        daemon.shutdown()
+        daemon.server_close()
+        daemon.path.unlink(missing_ok=True)
@@ -0,0 +1,63 @@
+"""
+Export and import round trips through backup files.
+"""
+import gzip
+import lzma
+
+import pytest
+
+from mastodon_filter.backup import iter_records, read_backup
+
+
+def keyword_sets(filters) -> dict[str, set[str]]:
+    return {
+        filter_item["title"]: {
+            keyword["keyword"] for keyword in filter_item["keywords"]
+        }
+        for filter_item in filters
+    }
+
+
+@pytest.mark.parametrize("name", ["filters.jsonl", "filters.jsonl.gz", "filters.xz"])
+def test_export_import_round_trip(client, start_server, make_client, tmp_path, name):
+    client.create("Words", "home", "warn", ["one", "two"])
+    client.create("Gone", "public", "hide", ["three"])
+    path = tmp_path / name
+
+    summary = client.export(path)
+    assert summary == {"filters": 2, "written": 2, "removed": 0}
+    assert client.export(path, incremental=True)["written"] == 0
+
+    client.sync("Words", ["one", "four"])
+    client.delete("Gone")
+    client.create("New", "home", "warn", ["five"])
+    summary = client.export(path, incremental=True)
+    assert summary == {"filters": 2, "written": 2, "removed": 1}
+    assert len(list(iter_records(path))) == 5
+
+    opener = {".gz": gzip.open, ".xz": lzma.open}.get(path.suffix)
+    if opener is not None:
+        with opener(path, "rt", encoding="utf-8") as file:
+            assert len(file.read().splitlines()) == 5
+
+    backup = read_backup(path)
+    assert keyword_sets(backup.values()) == {"Words": {"one", "four"}, "New": {"five"}}
+
+    other = make_client(start_server())
+    results = list(other.import_filters(path))
+    assert {result["status"] for result in results} == {"created"}
+    other.invalidate()
+    assert keyword_sets(other.filters()) == keyword_sets(client.filters())
+    assert [result["status"] for result in other.import_filters(path)] == [
+        "skipped",
+        "skipped",
+    ]
+
+
+def test_compress_without_suffix(client, tmp_path):
+    client.create("Words", "home", "warn", ["one"])
+    path = tmp_path / "filters.backup"
+    client.export(path, compress=True)
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        assert '"Words"' in file.read()
+    assert list(read_backup(path, compress=True).values())[0]["title"] == "Words"
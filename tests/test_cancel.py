@@ -0,0 +1,109 @@
+"""
+Cancelled or failed operations leave filters as they were.
+"""
+import threading
+
+import pytest
+import requests
+
+from mastodon_filter.api import KEYWORD_BATCH_SIZE
+from mastodon_filter.progress import APPLY, CancelToken, OperationCancelled
+
+
+def keywords(count: int, prefix: str = "word") -> list[str]:
+    return [f"{prefix}{number}" for number in range(count)]
+
+
+def cancel_after_first_batch(cancel: CancelToken, delay: float = 0.0):
+    """
+    Event handler cancelling once the first batch was applied.
+    """
+
+    def on_event(event) -> None:
+        if event.phase == APPLY and event.done == KEYWORD_BATCH_SIZE:
+            threading.Timer(delay, cancel.cancel).start()
+
+    return on_event
+
+
+def remote_keywords(server, filter_id: str) -> set[str]:
+    filter_item = server.state.filters[filter_id]
+    return {keyword["keyword"] for keyword in filter_item["keywords"]}
+
+
+def test_cancelled_sync_reverts(client, server):
+    created = client.create("Words", "home", "warn", keywords(10))
+    cancel = CancelToken()
+    with pytest.raises(OperationCancelled):
+        client.sync(
+            "Words",
+            keywords(3 * KEYWORD_BATCH_SIZE, "new"),
+            on_event=cancel_after_first_batch(cancel),
+            cancel=cancel,
+        )
+    assert remote_keywords(server, created["id"]) == set(keywords(10))
+
+
+def test_cancelled_create_deletes(client, server):
+    cancel = CancelToken()
+    with pytest.raises(OperationCancelled):
+        client.create(
+            "Words",
+            "home",
+            "warn",
+            keywords(3 * KEYWORD_BATCH_SIZE),
+            on_event=cancel_after_first_batch(cancel),
+            cancel=cancel,
+        )
+    assert server.state.filters == {}
+
+
+def test_cancel_while_rate_limited_reverts(start_server, make_client):
+    # Three requests per window: the listing and two batches, the third
+    # batch waits for budget and is cancelled meanwhile. The rollback
+    # then waits for the next window instead of giving up.
+    server = start_server(rate_limit=3, rate_window=2.0)
+    client = make_client(server)
+    created = client.create("Words", "home", "warn", keywords(10))
+    server.state.window_start -= server.rate_window
+    cancel = CancelToken()
+    with pytest.raises(OperationCancelled):
+        client.sync(
+            "Words",
+            keywords(3 * KEYWORD_BATCH_SIZE, "new"),
+            on_event=cancel_after_first_batch(cancel, delay=0.2),
+            cancel=cancel,
+        )
+    assert remote_keywords(server, created["id"]) == set(keywords(10))
+
+
+def fail_second_batch(client, monkeypatch) -> None:
+    """
+    Make the second keyword batch sent by the client fail.
+    """
+    request = client._request  # pylint: disable=protected-access
+    puts = []
+
+    def failing_request(method, path, *args):
+        if method == "put":
+            puts.append(path)
+            if len(puts) == 2:
+                raise requests.ConnectionError("Connection reset")
+        return request(method, path, *args)
+
+    monkeypatch.setattr(client, "_request", failing_request)
+
+
+def test_failed_sync_reverts(client, server, monkeypatch):
+    created = client.create("Words", "home", "warn", keywords(10))
+    fail_second_batch(client, monkeypatch)
+    with pytest.raises(requests.ConnectionError):
+        client.sync("Words", keywords(3 * KEYWORD_BATCH_SIZE, "new"))
+    assert remote_keywords(server, created["id"]) == set(keywords(10))
+
+
+def test_failed_create_deletes(client, server, monkeypatch):
+    fail_second_batch(client, monkeypatch)
+    with pytest.raises(requests.ConnectionError):
+        client.create("Words", "home", "warn", keywords(4 * KEYWORD_BATCH_SIZE))
+    assert server.state.filters == {}
@@ -0,0 +1,82 @@
+"""
+Commands writing without the daemon keep its cache from going stale.
+"""
+import pytest
+from click.testing import CliRunner
+
+from mastodon_filter import config
+from mastodon_filter.cli import main
+from mastodon_filter.daemon import SOCKET_PATH
+
+
+@pytest.fixture
+def daemon(server, make_client, start_daemon):
+    """
+    Daemon with a warm cache on the configured fake server.
+    """
+    config.save_config(config.Config(server.url, "token"))
+    client = make_client(server, cache=True)
+    daemon = start_daemon(client, path=SOCKET_PATH)
+    yield daemon
+    daemon.close()
+    config.CONFIG_FILE.unlink()
+
+
+def titles(daemon) -> set[str]:
+    return {filter_item["title"] for filter_item in daemon.filters()}
+
+
+def test_bulk_delete_refreshes_daemon(daemon, client):
+    for title in ("event-1", "event-2", "keep"):
+        client.create(title, "home", "warn", ["word"])
+    assert titles(daemon) == {"event-1", "event-2", "keep"}
+    result = CliRunner().invoke(main, ["delete", "--match", "event-*", "--yes"])
+    assert "Deleted 2 filters" in result.output
+    assert titles(daemon) == {"keep"}
+
+
+def test_bulk_update_refreshes_daemon(daemon, client):
+    client.create("event-1", "home", "warn", ["word"])
+    daemon.filters()
+    result = CliRunner().invoke(main, ["update", "event-*", "-a", "hide", "--yes"])
+    assert "Updated 1 filters" in result.output
+    assert [item["filter_action"] for item in daemon.filters()] == ["hide"]
+
+
+def test_expiry_renew_refreshes_daemon(daemon, client):
+    client.create("event-1", "home", "warn", ["word"])
+    runner = CliRunner()
+    assert runner.invoke(main, ["expiry", "list"]).output == "event-1: never expires\n"
+    result = runner.invoke(main, ["expiry", "renew", "event-*", "-e", "1d"])
+    assert "Renewed 1 filters" in result.output
+    output = runner.invoke(main, ["expiry", "list"]).output
+    assert output.startswith("event-1: ")
+    assert "never" not in output
+
+
+@pytest.mark.parametrize(
+    "args", [["delete", "--match", "*"], ["update", "*", "-a", "hide"], ["batch"]]
+)
+def test_jobs_must_be_positive(args):
+    result = CliRunner().invoke(main, args + ["--jobs", "0"])
+    assert result.exit_code == 2
+    assert "0 is not in the range x>=1" in result.output
+
+
+def test_batch_and_import_refresh_daemon(daemon, client, tmp_path):
+    runner = CliRunner()
+    daemon.filters()
+    operations = '{"op": "create", "title": "News", "keywords": ["poll"]}\n'
+    result = runner.invoke(main, ["batch"], input=operations)
+    assert '"ok": true' in result.output
+    assert titles(daemon) == {"News"}
+
+    backup = tmp_path / "backup.jsonl"
+    backup.write_text(
+        '{"id": "9", "title": "Old", "context": ["home"], "expires_at": null,'
+        ' "filter_action": "warn", "keywords": [{"keyword": "riot"}]}\n',
+        encoding="utf-8",
+    )
+    result = runner.invoke(main, ["import", str(backup)])
+    assert "Imported 1 filters" in result.output
+    assert titles(daemon) == {"News", "Old"}
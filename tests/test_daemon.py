@@ -0,0 +1,36 @@
+"""
+Client calls forwarded to a daemon come back as the client returns them.
+"""
+from mastodon_filter.schema import Keyword, KeywordSet
+from mastodon_filter.state import filter_state, record_sync
+
+from test_sync import edit_remote
+
+
+def test_merge_through_daemon(client, server, start_daemon, tmp_path):
+    state_file = tmp_path / "state.json"
+    local = KeywordSet(["one", "two", "three"])
+    created = client.create("Words", "home", "warn", local)
+    record_sync("Words", local, created, path=state_file)
+    edit_remote(server, client, created["id"], three=False, web=True)
+    daemon = start_daemon(client)
+
+    state = filter_state("Words", state_file)
+    try:
+        response = daemon.merge(
+            "Words",
+            KeywordSet([("one", False), ("four", True)]),
+            base=state["base"],
+            base_filter_id=state["filter_id"],
+        )
+    finally:
+        daemon.close()
+    assert response["added"] == [Keyword("four")]
+    assert [(kw.keyword, kw.whole_word) for kw in response["updated"]] == [
+        ("one", False)
+    ]
+    assert [kw.keyword for kw in response["deleted"]] == ["two"]
+    assert response["kept"] == ["web"]
+    assert response["conflicts"] == [
+        {"keyword": "three", "reason": "removed locally, changed remotely"}
+    ]
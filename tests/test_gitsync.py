@@ -0,0 +1,70 @@
+"""
+Incremental sync of wordlists in git.
+"""
+import shutil
+import subprocess
+
+import pytest
+
+from mastodon_filter.gitsync import diff_lines, repo_path, sync_since, wordlist_changes
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def git(repo, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "Test")
+    return tmp_path
+
+
+def commit(repo, name: str, text: str) -> str:
+    (repo / name).write_text(text, encoding="utf-8")
+    git(repo, "add", name)
+    git(repo, "commit", "-q", "-m", f"Edit {name}")
+    return git(repo, "rev-parse", "HEAD")
+
+
+def test_diff_lines_keeps_lines_looking_like_headers(repo):
+    first = commit(repo, "words.txt", "apple\n--minus\n++plus\n")
+    second = commit(repo, "words.txt", "apple\n---dashes\n+++pluses\n")
+    added, removed = diff_lines(repo, first, second, "words.txt")
+    assert added == ["---dashes", "+++pluses"]
+    assert removed == ["--minus", "++plus"]
+
+
+def test_moved_lines_are_unchanged(repo):
+    first = commit(repo, "words.txt", "apple\nbanana\ncherry\n")
+    second = commit(repo, "words.txt", "cherry\napple\ndate\n")
+    added, removed, keywords = wordlist_changes(repo, first, second, "words.txt")
+    assert list(added) == ["date"]
+    assert list(removed) == ["banana"]
+    assert list(keywords) == ["cherry", "apple", "date"]
+
+
+def test_language_wordlists_are_compared_compiled(repo):
+    first = commit(repo, "words.txt", "#!wordlist\nriot{,s}\n")
+    second = commit(repo, "words.txt", "#!wordlist\nriot{,er}\n")
+    added, removed, _ = wordlist_changes(repo, first, second, "words.txt")
+    assert list(added) == ["rioter"]
+    assert list(removed) == ["riots"]
+
+
+def test_sync_since_sends_only_changes(repo, client, server):
+    first = commit(repo, "words.txt", "apple\nbanana\n")
+    client.create("Fruit", "home", "warn", ["apple", "banana", "remote"])
+    commit(repo, "words.txt", "apple\ncherry\n")
+    root, path = repo_path(repo / "words.txt")
+    response, keywords = sync_since(client, "Fruit", root, path, first)
+    assert [keyword.keyword for keyword in response["added"]] == ["cherry"]
+    assert [keyword.keyword for keyword in response["deleted"]] == ["banana"]
+    remote = {keyword["keyword"] for keyword in response["keywords"]}
+    assert remote == {"apple", "cherry", "remote"}
+    assert list(keywords) == ["apple", "cherry"]
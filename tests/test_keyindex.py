@@ -0,0 +1,70 @@
+"""
+Keyword index lookups and its cache.
+"""
+import os
+
+from mastodon_filter.keyindex import index_path, open_wordlist_index
+
+
+def test_lookup_and_matches(tmp_path):
+    wordlist = tmp_path / "words.txt"
+    wordlist.write_text("#!wordlist\nRiot{,s}\n~shoot\n", encoding="utf-8")
+    with open_wordlist_index(wordlist, tmp_path / "index") as index:
+        assert len(index) == 3
+        assert index.lookup("riot") is True
+        assert index.lookup("  RIOTS ") is True
+        assert index.lookup("shoot") is False
+        assert index.lookup("protest") is None
+        assert "riots" in index
+        assert index.matches("riot police") == ["riot"]
+        assert index.matches("rioters") == []
+        assert index.matches("troubleshooting") == ["shoot"]
+
+
+def test_index_cached_outside_the_wordlist_directory(tmp_path):
+    words = tmp_path / "words"
+    words.mkdir()
+    wordlist = words / "plain.txt"
+    wordlist.write_text("one\ntwo\n", encoding="utf-8")
+    index_dir = tmp_path / "index"
+    with open_wordlist_index(wordlist, index_dir) as index:
+        assert list(index) == ["one", "two"]
+    assert [path.name for path in words.iterdir()] == ["plain.txt"]
+    path = index_path(wordlist, index_dir)
+    assert path.exists()
+
+    # Touched only: the index is kept, with the new modification time.
+    stat = wordlist.stat()
+    os.utime(wordlist, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with open_wordlist_index(wordlist, index_dir) as index:
+        assert list(index) == ["one", "two"]
+        assert index.manifest[str(wordlist.resolve())][0] == stat.st_mtime_ns + 10**9
+
+    wordlist.write_text("one\nthree\n", encoding="utf-8")
+    with open_wordlist_index(wordlist, index_dir) as index:
+        assert "three" in index
+        assert "two" not in index
+
+
+def test_matches_agree_with_lookups(tmp_path):
+    wordlist = tmp_path / "words.txt"
+    wordlist.write_text(
+        "#!wordlist\nriot{,s}\n~ri\npolice\n~lice\npol\nélan\n", encoding="utf-8"
+    )
+    with open_wordlist_index(wordlist, tmp_path / "index") as index:
+        for term in ("riot police", "rioters", "polices", "Élan vital", "ri"):
+            key = " ".join(term.split()).casefold()
+            expected = []
+            for start in range(len(key)):
+                for end in range(start + 1, len(key) + 1):
+                    whole_word = index.lookup(key[start:end])
+                    if whole_word is None:
+                        continue
+                    if whole_word and (
+                        (start > 0 and key[start - 1].isalnum())
+                        or (end < len(key) and key[end].isalnum())
+                    ):
+                        continue
+                    expected.append(key[start:end])
+            assert index.matches(term) == expected
+        assert index.matches("riot police") == ["ri", "riot", "police", "lice"]
@@ -0,0 +1,45 @@
+"""
+KeywordSet algebra and conversions.
+"""
+from mastodon_filter.schema import Keyword, KeywordSet
+
+
+def test_construction_deduplicates_and_strips():
+    keywords = KeywordSet([" one ", "two", "one", "", ("three", False)])
+    assert list(keywords) == ["one", "two", "three"]
+    assert keywords.whole_word("one") is True
+    assert keywords.whole_word("three") is False
+    assert KeywordSet("single") == KeywordSet(["single"])
+    assert KeywordSet([{"keyword": "x", "whole_word": False}]).whole_word("x") is False
+    assert KeywordSet([Keyword("y", whole_word=False)]).whole_word("y") is False
+
+
+def test_set_operations_keep_left_flags():
+    left = KeywordSet([("a", True), ("b", False), ("c", True)])
+    right = KeywordSet([("b", True), ("c", False), ("d", True)])
+    assert list(left - right) == ["a"]
+    assert list((left & right).items()) == [("b", False), ("c", True)]
+    assert list((right & left).items()) == [("b", True), ("c", False)]
+    assert list(left | right) == ["a", "b", "c", "d"]
+    assert (left | right).whole_word("b") is False
+    assert list(left ^ right) == ["a", "d"]
+    assert KeywordSet(["b", "c"]) <= left
+    assert not right <= left
+
+
+def test_equality_compares_flags():
+    assert KeywordSet(["a", "b"]) == KeywordSet(["b", "a"])
+    assert KeywordSet([("a", True)]) != KeywordSet([("a", False)])
+    assert hash(KeywordSet(["a", "b"])) == hash(KeywordSet(["b", "a"]))
+
+
+def test_to_keywords_and_slicing():
+    keywords = KeywordSet([("a", True), ("b", False)])
+    assert keywords.to_keywords(delete=True, ids={"b": "7"}) == [
+        Keyword("a", whole_word=True, delete=True),
+        Keyword("b", whole_word=False, delete=True, id="7"),
+    ]
+    converted = keywords.to_keywords(ids={"b": "7"})
+    assert [keyword.id for keyword in converted] == [None, "7"]
+    assert keywords[1].whole_word is False
+    assert list(keywords[:1]) == ["a"]
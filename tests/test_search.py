@@ -0,0 +1,94 @@
+"""
+Search index.
+"""
+import multiprocessing
+
+from mastodon_filter.search import SearchIndex, record_write
+
+
+def filter_item(number: int, *keywords: str) -> dict:
+    return {
+        "id": str(number),
+        "title": f"Filter {number}",
+        "keywords": [{"keyword": keyword, "whole_word": True} for keyword in keywords],
+    }
+
+
+def write_filters(path, numbers) -> None:
+    for number in numbers:
+        record_write(str(number), filter_item(number, f"word{number}"), path)
+
+
+def test_search_modes(tmp_path):
+    index = SearchIndex(tmp_path)
+    index.update_filters(
+        [filter_item(1, "Election", "elector"), filter_item(2, "vote")]
+    )
+    index.save()
+    index = SearchIndex(tmp_path).load()
+    assert [result["keyword"] for result in index.search("elect")] == [
+        "Election",
+        "elector",
+    ]
+    assert [result["keyword"] for result in index.search("ot", "substring")] == ["vote"]
+    assert index.search("vote", "exact")[0]["name"] == "Filter 2"
+
+
+def test_record_write_updates_one_source(tmp_path):
+    record_write("1", filter_item(1, "ignored"), tmp_path)
+    # Not indexed until a full set of filters was.
+    assert SearchIndex(tmp_path).load().sources == {}
+    index = SearchIndex(tmp_path)
+    index.update_filters([filter_item(1, "old"), filter_item(2, "kept")])
+    index.save()
+    record_write("1", filter_item(1, "new"), tmp_path)
+    record_write("2", None, tmp_path)
+    index = SearchIndex(tmp_path).load()
+    assert list(index.sources) == ["filter:1"]
+    assert index.sources["filter:1"]["keywords"] == ["new"]
+
+
+def test_concurrent_writers_keep_all_updates(tmp_path):
+    index = SearchIndex(tmp_path)
+    index.update_filters([filter_item(0, "seed")])
+    index.save()
+    processes = [
+        multiprocessing.Process(
+            target=write_filters, args=(tmp_path, range(start, start + 20))
+        )
+        for start in (1, 21, 41)
+    ]
+    for process in processes:
+        process.start()
+    write_filters(tmp_path, range(61, 81))
+    for process in processes:
+        process.join()
+    index = SearchIndex(tmp_path).load()
+    assert len(index.sources) == 81
+
+
+def test_inverted_index_is_saved(tmp_path):
+    index = SearchIndex(tmp_path).load()
+    index.update_filters([filter_item(1, "Election"), filter_item(2, "vote")])
+    index.save()
+    assert index.search("elect")[0]["keyword"] == "Election"
+
+    # Loaded from the saved inverted index, without reading the sources.
+    index = SearchIndex(tmp_path).load()
+    assert "keywords" not in index.sources["filter:1"]
+    assert index.search("vot")[0]["name"] == "Filter 2"
+
+    # Stale once another process saved a change.
+    record_write("2", filter_item(2, "voter"), tmp_path)
+    index = SearchIndex(tmp_path).load()
+    assert index.sources["filter:2"]["keywords"] == ["voter"]
+    assert [result["keyword"] for result in index.search("vot")] == ["voter"]
+
+    # A change to a source loaded without its keywords rebuilds from all.
+    index = SearchIndex(tmp_path).load()
+    index.update_filter(filter_item(3, "election day"))
+    index.save()
+    assert [result["keyword"] for result in index.search("elect")] == [
+        "Election",
+        "election day",
+    ]
@@ -0,0 +1,102 @@
+"""
+Caches follow filter changes pushed on the user stream.
+"""
+import threading
+import time
+
+import pytest
+
+from mastodon_filter import api
+from mastodon_filter.stream import FiltersStream
+
+
+@pytest.fixture
+def short_window(monkeypatch):
+    monkeypatch.setattr(api, "OWN_WRITE_WINDOW", 0.5)
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_own_writes_expire(client, short_window):
+    assert not client.own_change()
+    client.create("Words", "home", "warn", ["word"])
+    assert client.own_change()
+    time.sleep(0.6)
+    assert not client.own_change()
+
+
+def test_cache_kept_on_own_write_events(start_server, make_client, short_window):
+    # Frequent heartbeats, so that the stream stops quickly.
+    server = start_server(heartbeat=0.2)
+    client = make_client(server, cache=True)
+    other = make_client(server)
+    changed = threading.Event()
+    invalidated = threading.Event()
+    client.invalidate = invalidated.set
+
+    def on_change() -> None:
+        client.filters_changed()
+        changed.set()
+
+    stream = FiltersStream(client.config, on_change=on_change).start()
+    try:
+        assert wait_for(lambda: stream.response is not None)
+        client.filters()
+        client.create("Words", "home", "warn", ["word"])
+        assert changed.wait(5)
+        assert not invalidated.is_set()
+        time.sleep(0.6)
+        changed.clear()
+        other.create("Other", "home", "warn", ["word"])
+        assert changed.wait(5)
+        assert invalidated.is_set()
+    finally:
+        stream.stop()
+
+
+def test_external_write_during_own_write_is_seen(start_server, make_client):
+    server = start_server(heartbeat=0.2)
+    client = make_client(server, cache=True)
+    other = make_client(server)
+    events = []
+    stream = FiltersStream(
+        client.config, on_change=lambda: events.append(client.external_change())
+    ).start()
+    try:
+        assert wait_for(lambda: stream.response is not None)
+        client.filters()
+        client.create("Words", "home", "warn", ["word"])
+        # Within the window of the write above.
+        assert client.own_change()
+        other.create("Other", "home", "warn", ["word"])
+        assert wait_for(lambda: len(events) == 2)
+        assert True in events
+        titles = {filter_item["title"] for filter_item in client.filters()}
+        assert titles == {"Words", "Other"}
+    finally:
+        stream.stop()
+
+
+def test_own_write_events_keep_cache(start_server, make_client):
+    server = start_server(heartbeat=0.2)
+    client = make_client(server, cache=True)
+    events = []
+    stream = FiltersStream(
+        client.config, on_change=lambda: events.append(client.external_change())
+    ).start()
+    try:
+        assert wait_for(lambda: stream.response is not None)
+        client.filters()
+        client.create("Words", "home", "warn", ["word"])
+        assert wait_for(lambda: len(events) == 1)
+        assert events == [False]
+        assert client._cached_filters is not None  # pylint: disable=protected-access
+    finally:
+        stream.stop()
@@ -0,0 +1,114 @@
+"""
+Sync and three-way merge against the fake server.
+"""
+from mastodon_filter.schema import KeywordSet
+from mastodon_filter.state import filter_state, record_sync
+
+
+def remote_flags(server, filter_id: str) -> dict[str, bool]:
+    filter_item = server.state.filters[filter_id]
+    return {
+        keyword["keyword"]: keyword["whole_word"] for keyword in filter_item["keywords"]
+    }
+
+
+def edit_remote(server, client, filter_id: str, **flags) -> None:
+    """
+    Change keywords on the server as the web interface would, a flag of
+    None deletes the keyword.
+    """
+    filter_item = server.state.filters[filter_id]
+    keywords = {keyword["keyword"]: keyword for keyword in filter_item["keywords"]}
+    for text, whole_word in flags.items():
+        if whole_word is None:
+            del keywords[text]
+        elif text in keywords:
+            keywords[text]["whole_word"] = whole_word
+        else:
+            keywords[text] = {
+                "id": f"web-{text}",
+                "keyword": text,
+                "whole_word": whole_word,
+            }
+    filter_item["keywords"] = list(keywords.values())
+    client.invalidate()
+
+
+def test_sync_adds_and_deletes(client, server):
+    created = client.create("Words", "home", "warn", ["one", "two", "three"])
+    response = client.sync("Words", ["two", "three", "four"])
+    assert [keyword.keyword for keyword in response["added"]] == ["four"]
+    assert [keyword.keyword for keyword in response["deleted"]] == ["one"]
+    assert set(remote_flags(server, created["id"])) == {"two", "three", "four"}
+
+
+def test_merge_keeps_remote_additions(client, server, tmp_path):
+    state_file = tmp_path / "state.json"
+    local = KeywordSet(["one", "two"])
+    created = client.create("Words", "home", "warn", local)
+    record_sync("Words", local, created, path=state_file)
+    edit_remote(server, client, created["id"], web=True, one=None)
+
+    state = filter_state("Words", state_file)
+    response = client.merge(
+        "Words",
+        ["two", "three"],
+        base=state["base"],
+        base_filter_id=state["filter_id"],
+    )
+    assert [keyword.keyword for keyword in response["added"]] == ["three"]
+    assert response["deleted"] == []
+    assert response["kept"] == ["web"]
+    assert set(remote_flags(server, created["id"])) == {"two", "three", "web"}
+
+
+def test_merge_sends_local_flag_changes(client, server, tmp_path):
+    state_file = tmp_path / "state.json"
+    local = KeywordSet([("one", True), ("two", True)])
+    created = client.create("Words", "home", "warn", local)
+    record_sync("Words", local, created, path=state_file)
+    edit_remote(server, client, created["id"], two=False)
+
+    state = filter_state("Words", state_file)
+    changed = KeywordSet([("one", False), ("two", True)])
+    response = client.merge(
+        "Words", changed, base=state["base"], base_filter_id=state["filter_id"]
+    )
+    assert [(kw.keyword, kw.whole_word) for kw in response["updated"]] == [
+        ("one", False)
+    ]
+    assert response["conflicts"] == []
+    # Changed locally is sent, changed remotely is kept.
+    assert remote_flags(server, created["id"]) == {"one": False, "two": False}
+
+    record_sync("Words", changed, response, path=state_file)
+    state = filter_state("Words", state_file)
+    response = client.merge(
+        "Words", changed, base=state["base"], base_filter_id=state["filter_id"]
+    )
+    assert response["updated"] == []
+    assert remote_flags(server, created["id"]) == {"one": False, "two": False}
+
+
+def test_merge_reports_flag_conflicts(client, server, tmp_path):
+    state_file = tmp_path / "state.json"
+    local = KeywordSet(["one", "two"])
+    created = client.create("Words", "home", "warn", local)
+    record_sync("Words", local, created, path=state_file)
+    edit_remote(server, client, created["id"], two=False, new=False)
+
+    state = filter_state("Words", state_file)
+    response = client.merge(
+        "Words",
+        KeywordSet([("one", True), ("new", True)]),
+        base=state["base"],
+        base_filter_id=state["filter_id"],
+    )
+    conflicts = {conflict["keyword"] for conflict in response["conflicts"]}
+    assert conflicts == {"two", "new"}
+    assert response["added"] == response["updated"] == response["deleted"] == []
+    assert remote_flags(server, created["id"]) == {
+        "one": True,
+        "two": False,
+        "new": False,
+    }
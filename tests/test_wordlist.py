@@ -0,0 +1,85 @@
+"""
+Wordlist language compilation, includes and templates.
+"""
+import os
+
+import pytest
+
+from mastodon_filter.templates import TemplateRegistry
+from mastodon_filter.wordlist import compile_text, compile_wordlist, read_wordlist
+
+
+def test_compile_expands_variants():
+    keywords, _ = compile_text(
+        "#!wordlist\n"
+        "# a comment\n"
+        "riot{,s,er{,s}}   # trailing comment\n"
+        "colour|color\n"
+        "~shoot{ing,er}\n"
+        "\\#breaking\n"
+        "{gun,rifle}  fire\n"
+        "riots\n"
+    )
+    assert list(keywords.items()) == [
+        ("riot", True),
+        ("riots", True),
+        ("rioter", True),
+        ("rioters", True),
+        ("colour", True),
+        ("color", True),
+        ("shooting", False),
+        ("shooter", False),
+        ("#breaking", True),
+        ("gun fire", True),
+        ("rifle fire", True),
+    ]
+
+
+def test_plain_wordlists_are_read_as_is(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_text("#hashtag\nriot{,s}\n#hashtag\n", encoding="utf-8")
+    assert list(read_wordlist(path)) == ["#hashtag", "riot{,s}"]
+
+
+def test_includes_are_relative_and_cached(tmp_path):
+    (tmp_path / "lists").mkdir()
+    included = tmp_path / "lists" / "weapons.txt"
+    included.write_text("#!wordlist\ngun{,s}\n", encoding="utf-8")
+    main = tmp_path / "main.txt"
+    main.write_text("#!wordlist\n#include lists/weapons\nriot\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    assert list(compile_wordlist(main, cache_dir)) == ["gun", "guns", "riot"]
+    assert len(list(cache_dir.iterdir())) == 1
+
+    included.write_text("#!wordlist\nrifle\n", encoding="utf-8")
+    stat = included.stat()
+    os.utime(included, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert list(compile_wordlist(main, cache_dir)) == ["rifle", "riot"]
+
+
+def test_include_errors(tmp_path):
+    one = tmp_path / "one.txt"
+    one.write_text("#!wordlist\n#include two\n", encoding="utf-8")
+    (tmp_path / "two.txt").write_text("#!wordlist\n#include one\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="includes itself"):
+        compile_wordlist(one, None)
+    with pytest.raises(ValueError, match="line 2: Included wordlist not found"):
+        compile_text("#!wordlist\n#include missing\n", tmp_path)
+
+
+def test_templates_use_both_include_forms(tmp_path):
+    bundled = tmp_path / "bundled"
+    user = tmp_path / "user"
+    bundled.mkdir()
+    user.mkdir()
+    (bundled / "police.txt").write_text("police\ncop\n", encoding="utf-8")
+    (user / "police.txt").write_text("police\n", encoding="utf-8")
+    (user / "local.txt").write_text("riot\n", encoding="utf-8")
+    (user / "news.txt").write_text(
+        "#!wordlist\ninclude: police\n#include local\nelection{,s}\n",
+        encoding="utf-8",
+    )
+    registry = TemplateRegistry([bundled, user], index_path=None)
+    # The user template replaces the bundled one of the same name.
+    assert set(registry.keywords("news")) == {"police", "riot", "election", "elections"}